@@ -0,0 +1,157 @@
+# generators.py
+# Parametric 1-safe Petri nets for benchmarking. Every generator returns the
+# same dict shape main.py works with ({places, transitions, arcs, M0}, arcs
+# carrying "weight"), and write_pnml() emits it in the PNML dialect that
+# src/parser.py reads (<text> children).
+from xml.sax.saxutils import quoteattr, escape
+
+
+class NetBuilder:
+    """Builds a net dict place by place; also used by the tests for hand-made nets."""
+
+    def __init__(self):
+        self.places = []
+        self.transitions = []
+        self.arcs = []
+
+    def place(self, pid, m0=0, name=None):
+        self.places.append({"id": pid, "name": name or pid, "m0": m0})
+
+    def transition(self, tid, inputs, outputs, name=None):
+        """inputs / outputs: places joined to tid by weight-1 arcs."""
+        self.transitions.append({"id": tid, "name": name or tid})
+        for p in inputs:
+            self.arc(p, tid)
+        for p in outputs:
+            self.arc(tid, p)
+
+    def arc(self, src, target, weight=1):
+        self.arcs.append({"id": f"a{len(self.arcs)}", "src": src, "target": target, "weight": weight})
+
+    def build(self):
+        return {
+            "places": self.places,
+            "transitions": self.transitions,
+            "arcs": self.arcs,
+            "M0": [p["m0"] for p in self.places],
+            "Places": len(self.places),
+            "Transitions": len(self.transitions),
+            "Arcs": len(self.arcs),
+        }
+
+
+def production_lines(n):
+    """
+    N independent lines in the style of sample_03, merged into one Collector.
+    Line i: In -> Buf -> Proc1 -> Proc2 -> (QC | Reject -> Buf).
+    Reachable states grow as ~6^n.
+    """
+    b = NetBuilder()
+    for i in range(1, n + 1):
+        L = f"Line{i}"
+        for suffix in ("In", "Buf", "Proc1", "Proc2", "QC", "Reject"):
+            b.place(f"{L}_{suffix}", m0=1 if suffix == "In" else 0)
+    b.place("Collector")
+    for i in range(1, n + 1):
+        L, T = f"Line{i}", f"T{i}"
+        b.transition(f"{T}_Start", [f"{L}_In"], [f"{L}_Buf"])
+        b.transition(f"{T}_A", [f"{L}_Buf"], [f"{L}_Proc1"])
+        b.transition(f"{T}_B", [f"{L}_Proc1"], [f"{L}_Proc2"])
+        b.transition(f"{T}_Pass", [f"{L}_Proc2"], [f"{L}_QC"])
+        b.transition(f"{T}_Reject", [f"{L}_Proc2"], [f"{L}_Reject"])
+        b.transition(f"{T}_Retry", [f"{L}_Reject"], [f"{L}_Buf"])
+    b.transition("T_Collect", [f"Line{i}_QC" for i in range(1, n + 1)], ["Collector"])
+    return b.build()
+
+
+def dining_philosophers(n):
+    """
+    Classic n philosophers taking the left fork, then the right one.
+    Deadlocks when everybody holds their left fork.
+    """
+    b = NetBuilder()
+    for i in range(n):
+        b.place(f"think_{i}", m0=1)
+        b.place(f"hasleft_{i}")
+        b.place(f"eat_{i}")
+        b.place(f"fork_{i}", m0=1)
+    for i in range(n):
+        right = f"fork_{(i + 1) % n}"
+        b.transition(f"takeleft_{i}", [f"think_{i}", f"fork_{i}"], [f"hasleft_{i}"])
+        b.transition(f"takeright_{i}", [f"hasleft_{i}", right], [f"eat_{i}"])
+        b.transition(f"release_{i}", [f"eat_{i}"], [f"think_{i}", f"fork_{i}", right])
+    return b.build()
+
+
+def token_ring(n):
+    """
+    n stations passing a single token; a station holding it works once
+    before passing it on. Deep but narrow state space (2n states).
+    """
+    b = NetBuilder()
+    for i in range(n):
+        b.place(f"idle_{i}", m0=1)
+        b.place(f"busy_{i}")
+        b.place(f"tok_{i}", m0=1 if i == 0 else 0)
+    for i in range(n):
+        nxt = f"tok_{(i + 1) % n}"
+        b.transition(f"work_{i}", [f"idle_{i}", f"tok_{i}"], [f"busy_{i}"])
+        b.transition(f"done_{i}", [f"busy_{i}"], [f"idle_{i}", nxt])
+    return b.build()
+
+
+def shared_resource(n):
+    """
+    n processes alternating local work and a critical section guarded by one
+    mutex place. Reachable states ~ (n + 2) * 2^(n - 1).
+    """
+    b = NetBuilder()
+    b.place("mutex", m0=1)
+    for i in range(n):
+        b.place(f"idle_{i}", m0=1)
+        b.place(f"local_{i}")
+        b.place(f"crit_{i}")
+    for i in range(n):
+        b.transition(f"work_{i}", [f"idle_{i}"], [f"local_{i}"])
+        b.transition(f"finish_{i}", [f"local_{i}"], [f"idle_{i}"])
+        b.transition(f"enter_{i}", [f"idle_{i}", "mutex"], [f"crit_{i}"])
+        b.transition(f"leave_{i}", [f"crit_{i}"], [f"idle_{i}", "mutex"])
+    return b.build()
+
+
+GENERATORS = {
+    "production_lines": production_lines,
+    "dining_philosophers": dining_philosophers,
+    "token_ring": token_ring,
+    "shared_resource": shared_resource,
+}
+
+
+def write_pnml(net, path, net_id="net1"):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
+        "<pnml>",
+        f'  <net id={quoteattr(net_id)} type="P/T net">',
+    ]
+    for p in net["places"]:
+        lines += [
+            f'    <place id={quoteattr(p["id"])}>',
+            f'      <name><text>{escape(p.get("name", p["id"]))}</text></name>',
+            f'      <initialMarking><text>{p["m0"]}</text></initialMarking>',
+            "    </place>",
+        ]
+    for t in net["transitions"]:
+        lines += [
+            f'    <transition id={quoteattr(t["id"])}>',
+            f'      <name><text>{escape(t.get("name", t["id"]))}</text></name>',
+            "    </transition>",
+        ]
+    for a in net["arcs"]:
+        lines += [
+            f'    <arc id={quoteattr(a["id"])} source={quoteattr(a["src"])} target={quoteattr(a["target"])}>',
+            f'      <inscription><text>{a.get("weight", 1)}</text></inscription>',
+            "    </arc>",
+        ]
+    lines += ["  </net>", "</pnml>", ""]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
@@ -0,0 +1,291 @@
+# run.py
+# Benchmark harness: generates the parametric nets as PNML, runs every engine
+# on increasing sizes and compares time / memory / state counts against a
+# stored baseline.
+#
+#   python -m benchmarks.run                      # run + compare with baseline
+#   python -m benchmarks.run --save-baseline      # (re)record the baseline
+#   python -m benchmarks.run --quick --families token_ring
+import argparse
+import contextlib
+import gc
+import importlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+from pathlib import Path
+
+from benchmarks.generators import GENERATORS, write_pnml
+from src.parser import parse_pnml
+from src.bfs import bfs_reachable_markings_with_depth
+from src.reachable_marking_optimization import optimize_over_reachable
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_BASELINE = HERE / "baseline.json"
+DEFAULT_NET_DIR = HERE / "nets"
+
+# Sizes per family; explicit engines blow up first, so exponential families stay small.
+SIZES = {
+    "production_lines": [1, 2, 3, 4, 5],
+    "dining_philosophers": [2, 4, 6, 8],
+    "token_ring": [10, 25, 50, 100],
+    "shared_resource": [2, 4, 8, 10],
+}
+QUICK_SIZES = {k: v[:2] for k, v in SIZES.items()}
+
+REPEAT_BELOW_SEC = 1.0
+
+ENGINES = ["bfs", "optimization", "bdd_reachability", "bdd_deadlock", "ilp", "bitstate"]
+
+
+class EngineUnavailable(Exception):
+    """Optional dependency (dd / pulp / pympler) missing for this engine."""
+
+
+def load_net(pnml_path):
+    net = parse_pnml(str(pnml_path))
+    for arc in net["arcs"]:
+        if "ins" in arc:
+            arc["weight"] = arc.pop("ins")
+    return net
+
+
+# ---- Engine adapters: each returns (state_count, extra_info) ----
+
+def _engine_bfs(net, ctx):
+    out = bfs_reachable_markings_with_depth(net)
+    ctx["markings"] = out["markings"]
+    ctx["max_depth"] = max(out["depth"].values()) if out["depth"] else 0
+    return len(out["markings"]), {"max_depth": ctx["max_depth"]}
+
+def _engine_optimization(net, ctx):
+    markings = ctx.get("markings")
+    if markings is None:
+        markings = bfs_reachable_markings_with_depth(net)["markings"]
+    weights = {p["id"]: 1 for p in net["places"]}
+    out = optimize_over_reachable(net, markings, weights)
+    return out["num_states"], {"best_value": out["best_value"]}
+
+def _engine_bdd_reachability(net, ctx):
+    try:
+        from src.bdd_reachability import run_symbolic_reachability
+    except ImportError as e:
+        raise EngineUnavailable(str(e))
+    out = run_symbolic_reachability(net, ctx["name"])
+    return out["bdd"]["num_reachable_states"], {"bdd_nodes": out["bdd"]["bdd_nodes"]}
+
+def _engine_bdd_deadlock(net, ctx):
+    from src.bdd_deadlock import solve_deadlock_bdd
+    out = solve_deadlock_bdd(net, sample_limit=1)
+    return out["reachable_states_est"], {"mode": out["mode"], "status": out["status"]}
+
+def _engine_ilp(net, ctx):
+    try:
+        from src.ilp_deadlock import solve_deadlock_ilp
+    except ImportError as e:
+        raise EngineUnavailable(str(e))
+    # CBC logs from a subprocess, which redirect_stdout in measure() cannot catch
+    out = solve_deadlock_ilp(net, max_firing_bound=ctx.get("max_depth"), solver_msg=False)
+    return None, {"status": out["status"], "num_constraints": out["num_constraints"]}
+
+def _engine_bitstate(net, ctx):
+    from src.bitstate import approximate_bfs
+    out = approximate_bfs(net, num_bits=1 << 24, deadlock_limit=float("inf"))
+    return out["num_states"], {"estimated_coverage": out["estimated_coverage"]}
+
+ENGINE_FUNCS = {
+    "bfs": _engine_bfs,
+    "optimization": _engine_optimization,
+    "bdd_reachability": _engine_bdd_reachability,
+    "bdd_deadlock": _engine_bdd_deadlock,
+    "ilp": _engine_ilp,
+    "bitstate": _engine_bitstate,
+}
+
+
+# Modules each adapter imports lazily. They are loaded before anything is timed,
+# so a one-shot run (--repeat 1, or one over REPEAT_BELOW_SEC) measures only the
+# engine and not the first import of dd / pulp / pympler.
+ENGINE_MODULES = {
+    "bfs": [],
+    "optimization": [],
+    "bdd_reachability": ["src.bdd_reachability"],
+    "bdd_deadlock": ["src.bdd_deadlock", "dd.autoref"],
+    "ilp": ["src.ilp_deadlock"],
+    "bitstate": ["src.bitstate"],
+}
+
+
+def preload_engines(engines):
+    """Import the modules of the given engines; a missing one is left for the adapter to report."""
+    for engine in engines:
+        for module in ENGINE_MODULES[engine]:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                pass
+
+
+def measure(func, net, ctx, memory=True, repeat=1):
+    """
+    Best time of up to `repeat` engine runs; optionally re-run under tracemalloc for the peak.
+    Runs longer than REPEAT_BELOW_SEC are timed once: their relative noise is small.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed = float("inf")
+        for i in range(repeat):
+            # garbage left by the previous engine (dd managers) must not be collected on our clock
+            gc.collect()
+            start = time.perf_counter()
+            states, info = func(net, ctx if i == 0 else dict(ctx))
+            elapsed = min(elapsed, time.perf_counter() - start)
+            if elapsed > REPEAT_BELOW_SEC:
+                break
+
+        peak = None
+        if memory:
+            # separate run so tracemalloc overhead does not pollute the timing
+            tracemalloc.start()
+            func(net, dict(ctx))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return {"time_sec": round(elapsed, 6), "peak_bytes": peak, "states": states, **info}
+
+
+def run_suite(families, sizes, engines, net_dir, memory=True, repeat=1):
+    net_dir.mkdir(parents=True, exist_ok=True)
+    preload_engines(engines)
+    results = {}
+    for family in families:
+        gen = GENERATORS[family]
+        for n in sizes[family]:
+            name = f"{family}_{n}"
+            pnml_path = net_dir / f"{name}.pnml"
+            write_pnml(gen(n), pnml_path, net_id=name)
+            net = load_net(pnml_path)
+
+            ctx = {"name": name}
+            for engine in engines:
+                key = f"{name}/{engine}"
+                try:
+                    rec = measure(ENGINE_FUNCS[engine], net, ctx, memory=memory, repeat=repeat)
+                except EngineUnavailable as e:
+                    rec = {"skipped": str(e)}
+                results[key] = rec
+                shown = rec.get("skipped") or f"{rec['time_sec']:.4f}s states={rec['states']}"
+                print(f"{key:45s} {shown}")
+    return results
+
+
+def environment():
+    """What absolute times and peaks depend on; a baseline is only comparable on the same one."""
+    env = {"host": platform.node(), "machine": platform.machine(), "python": platform.python_version()}
+    for pkg in ("dd", "pulp"):
+        try:
+            env[pkg] = metadata.version(pkg)
+        except metadata.PackageNotFoundError:
+            env[pkg] = None
+    return env
+
+
+def compare(results, baseline, time_tol, mem_tol, noise_floor, counts_only=False):
+    """
+    Return a list of human-readable regressions (empty list == pass).
+    counts_only: check state counts only (they do not depend on the machine).
+    """
+    problems = []
+    for key, rec in results.items():
+        base = baseline.get(key)
+        if base is None or "skipped" in rec or "skipped" in base:
+            continue
+        if base.get("states") is not None and rec["states"] != base["states"]:
+            problems.append(f"{key}: state count {rec['states']} != baseline {base['states']}")
+        if counts_only:
+            continue
+        bt, t = base["time_sec"], rec["time_sec"]
+        if t > bt * (1 + time_tol) and t - bt > noise_floor:
+            problems.append(f"{key}: time {t:.4f}s > baseline {bt:.4f}s (+{time_tol:.0%} allowed)")
+        bm, m = base.get("peak_bytes"), rec.get("peak_bytes")
+        if m is not None and bm is None:
+            problems.append(f"{key}: baseline has no peak memory to compare with (re-record it without --no-memory)")
+        elif m is not None and m > bm * (1 + mem_tol):
+            problems.append(f"{key}: peak memory {m} B > baseline {bm} B (+{mem_tol:.0%} allowed)")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Petri net engine benchmarks")
+    ap.add_argument("--families", default=",".join(GENERATORS), help="comma-separated generator names")
+    ap.add_argument("--engines", default=",".join(ENGINES), help="comma-separated engine names")
+    ap.add_argument("--quick", action="store_true", help="only the two smallest sizes per family")
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    ap.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    ap.add_argument("--output", help="also write this run's results to a JSON file")
+    ap.add_argument("--net-dir", default=str(DEFAULT_NET_DIR), help="where generated PNMLs go")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    ap.add_argument("--counts-only", action="store_true",
+                    help="only compare state counts, e.g. against a baseline recorded on another machine")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per engine; the fastest one counts")
+    ap.add_argument("--time-tolerance", type=float, default=0.25)
+    ap.add_argument("--memory-tolerance", type=float, default=0.10)
+    ap.add_argument("--noise-floor", type=float, default=0.05,
+                    help="ignore time regressions smaller than this many seconds")
+    args = ap.parse_args(argv)
+
+    families = args.families.split(",")
+    engines = args.engines.split(",")
+    for f in families:
+        if f not in GENERATORS:
+            ap.error(f"unknown family {f!r}; choose from {', '.join(GENERATORS)}")
+    for e in engines:
+        if e not in ENGINE_FUNCS:
+            ap.error(f"unknown engine {e!r}; choose from {', '.join(ENGINES)}")
+
+    baseline_path = Path(args.baseline)
+    if not args.save_baseline:
+        if not baseline_path.exists():
+            print(f"No baseline at {baseline_path}; run with --save-baseline first.", file=sys.stderr)
+            return 2
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        recorded = baseline.get("environment", {})
+        differs = {k: (recorded.get(k), v) for k, v in environment().items() if recorded.get(k) != v}
+        if differs and not args.counts_only:
+            print(f"Baseline {baseline_path} was recorded on another environment; its times and peaks "
+                  "do not apply here. Re-record it with --save-baseline or pass --counts-only.", file=sys.stderr)
+            for k, (old, new) in differs.items():
+                print(f"  {k}: {old} (baseline) != {new}", file=sys.stderr)
+            return 2
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = run_suite(families, sizes, engines, Path(args.net_dir), memory=not args.no_memory,
+                        repeat=args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {baseline_path}")
+        return 0
+
+    problems = compare(results, baseline["results"], args.time_tolerance, args.memory_tolerance,
+                       args.noise_floor, counts_only=args.counts_only)
+    if problems:
+        print("\nREGRESSIONS:")
+        for p in problems:
+            print("  -", p)
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
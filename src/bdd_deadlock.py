@@ -1,5 +1,8 @@
 import time
 from collections import defaultdict, deque
+from src.profiling import get_profiler
+from src.exploration import carry_enabled, dependency_index
+from src.bdd_image import FiringRelation
 
 #Have to install pulp
 # Common helpers (same net as ILP)
@@ -53,66 +56,16 @@ class _BDDSolver:
             raise ImportError("dd not installed")
 
         self.bdd = BDD()
-        order = [f"x_{p}" for p in self.places] + [f"x_{p}_n" for p in self.places]
-        self.bdd.declare(*order)
+        self.bdd.declare(*[f"x_{p}" for p in self.places])
         self.vars = {p: f"x_{p}" for p in self.places}
-        self.vars_n = {p: f"x_{p}_n" for p in self.places}
 
-        self.enabled_t = {}
-        self.rel_t = {}
-        self._build_transitions()
-
-        self.R_any = self.bdd.false
-        for t in self.transitions:
-            self.R_any = self.bdd.apply("or", self.R_any, self.rel_t[t])
-
-        self.rename = {self.vars_n[p]: self.vars[p] for p in self.places}
+        self.relation = FiringRelation(self.bdd, self.pre, self.post, self.vars)
+        self.enabled_t = self.relation.enabled
 
     def lit(self, var, val):
         v = self.bdd.var(var)
         return v if val else self.bdd.apply("not", v)
 
-    def _eq(self, v, w):
-        # v == w  <=> (v & w) | (~v & ~w)
-        a = self.bdd.apply("and", v, w)
-        b = self.bdd.apply("and", self.bdd.apply("not", v), self.bdd.apply("not", w))
-        return self.bdd.apply("or", a, b)
-
-    def _enabled(self, t):
-        if not self.pre[t]:
-            return self.bdd.true
-        node = self.bdd.true
-        for p in self.pre[t]:
-            node = self.bdd.apply("and", node, self.bdd.var(self.vars[p]))
-        return node
-
-    def _frame_place(self, p, t):
-        preP  = p in self.pre[t]
-        postP = p in self.post[t]
-        if preP and not postP:
-            return self.lit(self.vars_n[p], False)      # consume -> 0
-        elif postP and not preP:
-            return self.lit(self.vars_n[p], True)       # produce -> 1
-        else:
-            return self._eq(self.bdd.var(self.vars[p]), self.bdd.var(self.vars_n[p]))
-
-    def _build_transitions(self):
-        for t in self.transitions:
-            en = self._enabled(t)
-            frame = self.bdd.true
-            for p in self.places:
-                frame = self.bdd.apply("and", frame, self._frame_place(p, t))
-            self.enabled_t[t] = en
-            self.rel_t[t] = self.bdd.apply("and", en, frame)
-
-    def _exist_cur(self, node):
-        for p in self.places:
-            node = self.bdd.quantify(node, {self.vars[p]}, forall=False)
-        return node
-
-    def _rename_next_to_cur(self, node):
-        return self.bdd.let(self.rename, node)
-
     def initial_node(self):
         M0 = get_M0(self.net)
         node = self.bdd.true
@@ -120,18 +73,37 @@ class _BDDSolver:
             node = self.bdd.apply("and", node, self.lit(self.vars[p], bool(M0[p])))
         return node
 
-    def post(self, S):
-        conj = self.bdd.apply("and", S, self.R_any)
-        nxt = self._exist_cur(conj)
-        return self._rename_next_to_cur(nxt)
+    # NOTE: not called `post`, which is the post-set dict from build_pre_post
+    def image(self, S):
+        return self.relation.image(S)
 
-    def reachable(self):
+    def pre_image(self, S, transitions=None):
+        """States (any, not only reachable ones) with at least one successor in S."""
+        return self.relation.pre_image(S, transitions)
+
+    def reachable(self, start=None):
+        """
+        Frontier-based fixed point; BFS layers are kept in self.layers.
+        start: a subset of Reach containing M0 to restart from (layers are then unknown).
+        """
+        prof = get_profiler()
         S = self.initial_node()
+        self.layers = [S]
+        if start is not None:
+            S = self.bdd.apply("or", S, start)
+            self.layers = []
+        frontier = S
         while True:
-            newS = self.bdd.apply("or", S, self.post(S))
-            if newS == S:
+            new = self.bdd.apply("and", self.image(frontier), self.bdd.apply("not", S))
+            if new == self.bdd.false:
                 break
-            S = newS
+            S = self.bdd.apply("or", S, new)
+            frontier = new
+            self.bdd.collect_garbage()   # see bdd_image
+            if start is None:
+                self.layers.append(new)
+            if prof.enabled:
+                prof.counter("bdd_deadlock.nodes", reach=S.dag_size, frontier=new.dag_size)
         return S
 
     def deadlock_set(self, Reach):
@@ -142,16 +114,41 @@ class _BDDSolver:
 
     def sample(self, node, limit=10):
         res = []
-        for assign in self.bdd.sat_iter(node):
+        care = set(self.vars.values())
+        for assign in self.bdd.pick_iter(node, care_vars=care):
             m = {p: int(assign.get(self.vars[p], 0)) for p in self.places}
             res.append(m)
             if len(res) >= limit: break
         return res
 
-    def solve(self, sample_limit=10):
-        Reach = self.reachable()
-        Dead  = self.deadlock_set(Reach)
-        listed = self.sample(Dead, sample_limit)
+    def save(self, path, Reach, Dead):
+        from src.bdd_store import dump_bdds
+        from src.incremental import net_signature
+        roots = {"reach": Reach, "dead": Dead}
+        roots.update({f"layer_{i}": L for i, L in enumerate(getattr(self, "layers", []))})
+        dump_bdds(path, self.bdd, roots, meta={
+            "engine": "bdd_deadlock",
+            "places": self.places,
+            "var_of": self.vars,
+            "num_layers": len(getattr(self, "layers", [])),
+            "net": net_signature(self.net),
+        })
+
+    def solve(self, sample_limit=10, save_path=None, start_from=None):
+        prof = get_profiler()
+        start = None
+        if start_from:
+            from src.incremental import restart_set
+            with prof.span("bdd_deadlock.load_reach"):
+                start = restart_set(self.bdd, start_from, self.net, self.vars)
+        with prof.span("bdd_deadlock.reachable"):
+            Reach = self.reachable(start)
+        with prof.span("bdd_deadlock.dead_states"):
+            Dead  = self.deadlock_set(Reach)
+            listed = self.sample(Dead, sample_limit)
+        if save_path:
+            with prof.span("bdd_deadlock.save"):
+                self.save(save_path, Reach, Dead)
         try:
             reach_cnt = int(Reach.count(len(self.places)))
         except Exception:
@@ -161,29 +158,31 @@ class _BDDSolver:
             "deadlock_markings": listed,
             "num_deadlocks_listed": len(listed),
             "reachable_states_est": reach_cnt,
-            "bdd_nodes": self.bdd.dag_size(Reach),
+            "bdd_nodes": Reach.dag_size,
+            "restarted": start is not None,
         }
 
 # 2) FALLBACK EXPLICIT BFS MODE 
 # Works for safe nets (0/1). No external libs needed.
 
-def _enabled_explicit(M, pre_t):
+def _enabled_explicit(tpl, pre_idx):
     # transition enabled iff all its preset places have token==1
-    for p, w in pre_t.items():
-        if w != 1:   # safe net only
-            return False
-        if M.get(p, 0) < 1:
+    # (pre_idx is None for transitions with an arc weight != 1: never enabled, safe net only)
+    if pre_idx is None:
+        return False
+    for i in pre_idx:
+        if tpl[i] < 1:
             return False
     return True
 
-def _fire_explicit(M, pre_t, post_t):
+def _fire_explicit(tpl, pre_idx, post_idx):
     # produce next marking for safe net (0/1)
-    N = dict(M)
-    for p in pre_t:
-        N[p] = 0
-    for p in post_t:
-        N[p] = 1
-    return N
+    N = list(tpl)
+    for i in pre_idx:
+        N[i] = 0
+    for i in post_idx:
+        N[i] = 1
+    return tuple(N)
 
 def _to_tuple(M, places):
     return tuple(int(M.get(p,0)) for p in places)
@@ -191,45 +190,122 @@ def _to_tuple(M, places):
 def _from_tuple(tpl, places):
     return {p: tpl[i] for i,p in enumerate(places)}
 
-def explicit_bfs_deadlocks(net, pre, post, limit=10):
+def explicit_bfs_deadlocks(net, pre, post, limit=10, budget=None, checkpoint=None, resume=False,
+                           symmetry=None):
+    """
+    budget / checkpoint / resume / symmetry: see bfs.bfs_reachable_markings_with_depth.
+    With symmetry one marking per orbit is explored; the result is still concrete:
+    num_seen sums the orbit sizes and every dead representative is expanded to
+    the dead markings of its orbit (at most `limit` listed).
+    Returns (deadlocks, num_seen, {"complete": bool, "stop_reason": str | None,
+    "num_orbits": int | None}); stop_reason "deadlock_limit" means `limit`
+    deadlocks were found first.
+    """
+    if not symmetry:
+        symmetry = None
     places = [p["id"] for p in net["places"]]
     M0 = get_M0(net)
-
-    seen = set()
-    q = deque()
-
-    t0 = _to_tuple(M0, places)
-    q.append(t0)
-    seen.add(t0)
-
-    deadlocks = []
+    prof = get_profiler()
+
+    # index form; each queued marking carries its enabled transitions, and after
+    # firing t only the transitions in affected[t] are re-tested
+    col = {p: i for i, p in enumerate(places)}
+    ts = list(post.keys())
+    pre_idx = [[col[p] for p in pre[t]] if all(w == 1 for w in pre[t].values()) else None for t in ts]
+    post_idx = [[col[p] for p in post[t]] for t in ts]
+    affected = dependency_index([pre[t] for t in ts], [post[t] for t in ts])
+
+    sym_info = symmetry.describe() if symmetry is not None else None
+    saved = checkpoint.load("explicit_deadlock", net) if checkpoint is not None and resume else None
+    if saved is not None:
+        if saved.get("symmetry") != sym_info:
+            raise ValueError("Checkpoint was written with a different symmetry reduction")
+        seen = saved["seen"]
+        q = deque(saved["queue"])
+        deadlocks = saved["deadlocks"]
+        fired = saved["fired"]
+    else:
+        seen = set()
+        q = deque()
+
+        t0 = _to_tuple(M0, places)
+        if symmetry is not None:
+            t0 = symmetry.canonical(t0)
+        q.append((t0, 0, tuple(ti for ti in range(len(ts)) if _enabled_explicit(t0, pre_idx[ti]))))
+        seen.add(t0)
+
+        deadlocks = []
+        fired = 0
+
+    def snapshot():
+        return {"seen": seen, "queue": list(q), "deadlocks": deadlocks, "fired": fired, "symmetry": sym_info}
+
+    if budget is not None:
+        budget.start()
+    stop_reason = None
 
     while q:
-        cur_t = q.popleft()
-        M = _from_tuple(cur_t, places)
+        if budget is not None:
+            stop_reason = budget.exceeded(len(seen))
+            if stop_reason is None and budget.depth_blocked(q[0][1]):
+                stop_reason = "max_depth"
+            if stop_reason is not None:
+                break
+        if checkpoint is not None and checkpoint.due(len(seen)):
+            with prof.span("explicit_deadlock.checkpoint"):
+                checkpoint.save("explicit_deadlock", net, snapshot(), len(seen))
 
-        # successors
-        succ = []
-        for t in post.keys():
-            if _enabled_explicit(M, pre[t]):
-                N = _fire_explicit(M, pre[t], post[t])
-                succ.append(_to_tuple(N, places))
-
-        if not succ:
-            deadlocks.append(M)
+        cur_t, depth, enabled = q.popleft()
+
+        if not enabled:
+            deadlocks.append(_from_tuple(cur_t, places))
             if len(deadlocks) >= limit:
+                stop_reason = "deadlock_limit"
                 break
-        else:
-            for n in succ:
-                if n not in seen:
-                    seen.add(n)
-                    q.append(n)
+            continue
 
-    return deadlocks, len(seen)
+        # successors
+        fired += len(enabled)
+        for ti in enabled:
+            n = _fire_explicit(cur_t, pre_idx[ti], post_idx[ti])
+            c = symmetry.canonical(n) if symmetry is not None else n
+            if c not in seen:
+                seen.add(c)
+                if c is n:
+                    n_enabled = carry_enabled(enabled, affected[ti], lambda u: _enabled_explicit(n, pre_idx[u]))
+                else:
+                    n_enabled = tuple(u for u in range(len(ts)) if _enabled_explicit(c, pre_idx[u]))
+                q.append((c, depth + 1, n_enabled))
+
+    if checkpoint is not None:
+        if stop_reason is not None and stop_reason != "deadlock_limit":
+            with prof.span("explicit_deadlock.checkpoint"):
+                checkpoint.save("explicit_deadlock", net, snapshot(), len(seen))
+        else:
+            checkpoint.clear()
+
+    if prof.enabled:
+        prof.counter("explicit_deadlock.totals", states=len(seen), transitions_fired=fired)
+    run = {"complete": stop_reason is None, "stop_reason": stop_reason, "num_orbits": None}
+    if symmetry is None:
+        return deadlocks, len(seen), run
+    # deadlock is invariant under the symmetry: every member of a dead orbit is dead
+    concrete = []
+    for d in deadlocks:
+        concrete.extend(_from_tuple(c, places) for c in symmetry.expand(_to_tuple(d, places)))
+    run["num_orbits"] = len(seen)
+    return concrete[:limit], sum(symmetry.orbit_size(t) for t in seen), run
 
 # PUBLIC API 
-def solve_deadlock_bdd(net, sample_limit=10):
+def solve_deadlock_bdd(net, sample_limit=10, save_path=None, budget=None, checkpoint=None, resume=False,
+                       symmetry=None, start_from=None):
     """
+    save_path: in BDD mode, dump Reach / dead-state / layer BDDs there (see bdd_store).
+    start_from: in BDD mode, a dump saved for an earlier version of this net; when the
+        edit only added transitions (incremental.diff_nets) the fixed point restarts
+        from its Reach set.
+    budget / checkpoint / resume / symmetry: only used by the explicit fallback
+    (explicit_bfs_deadlocks); the BDD fixed point always runs to completion on the full net.
     Returns:
         {
           "status": "OK" | "NO_DEADLOCK",
@@ -237,31 +313,44 @@ def solve_deadlock_bdd(net, sample_limit=10):
           "num_deadlocks_listed": int,
           "reachable_states_est": int | None,
           "bdd_nodes": int | None,
-          "runtime_sec": float
+          "runtime_sec": float,
+          "complete": bool,
+          "stop_reason": str | None,
+          "num_orbits": int | None,     # explicit search under symmetry: orbits stored
+          "restarted": bool,            # fixed point restarted from start_from
+          "fallback": str | None        # BDD error that forced the explicit search
         }
     """
     start = time.time()
-
-    # Try BDD mode first
-    try:
-        BDD = _try_import_bdd()
-        if BDD is not None and is_safe_net(*build_pre_post(net)[2:4]):
-            solver = _BDDSolver(net)
-            out = solver.solve(sample_limit)
+    run = {"complete": True, "stop_reason": None, "num_orbits": None}
+    restarted = False
+    fallback = None
+    mode = None
+
+    # Try BDD mode first. Only running out of memory or stack inside dd falls
+    # back; errors loading start_from or writing save_path propagate.
+    if _try_import_bdd() is not None and is_safe_net(*build_pre_post(net)[2:4]):
+        try:
+            out = _BDDSolver(net).solve(sample_limit, save_path=save_path, start_from=start_from)
+        except (MemoryError, RecursionError) as e:
+            fallback = f"{type(e).__name__}: {e}"
+        else:
             mode = "BDD"
+            restarted = out["restarted"]
             bdd_nodes = out["bdd_nodes"]
             reach_est = out["reachable_states_est"]
             listed = out["deadlock_markings"]
             status = out["status"]
-        else:
-            raise Exception("Use explicit")
-    except Exception:
+
+    if mode is None:
         # Fallback explicit BFS (safe net assumption)
         places, transitions, pre, post = build_pre_post(net)
         if not is_safe_net(pre, post):
             raise ValueError("Non-safe net (arc weight >1) and 'dd' not available. "
                              "Please install 'dd' or provide a safe net.")
-        listed, reach_cnt = explicit_bfs_deadlocks(net, pre, post, limit=sample_limit)
+        listed, reach_cnt, run = explicit_bfs_deadlocks(net, pre, post, limit=sample_limit, budget=budget,
+                                                        checkpoint=checkpoint, resume=resume,
+                                                        symmetry=symmetry)
         mode = "EXPLICIT"
         bdd_nodes = None
         reach_est = reach_cnt
@@ -276,6 +365,11 @@ def solve_deadlock_bdd(net, sample_limit=10):
         "bdd_nodes": bdd_nodes,
         "runtime_sec": end - start,
         "mode": mode,
+        "complete": run["complete"],
+        "stop_reason": run["stop_reason"],
+        "num_orbits": run["num_orbits"],
+        "restarted": restarted,
+        "fallback": fallback,
     }
 
 # Quick run
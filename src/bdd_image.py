@@ -0,0 +1,61 @@
+# bdd_image.py
+# Image and pre-image of a safe (0/1) net, one transition at a time, shared by
+# bdd_reachability and bdd_deadlock.
+#
+# Firing t only touches its preset and postset: the preset must be marked, and
+# afterwards the postset is marked and the rest of the preset is empty. Both
+# conditions are cubes over pre(t) | post(t), so the image of t is a cofactor by
+# the guard, an existential over the places firing overwrites and a conjunction
+# with the effect. Every other place keeps its value, so there are no
+# next-state variables and no frame constraints.
+#
+# dd.autoref only frees unreferenced nodes (and clears its operation caches)
+# on request, so the fixed points using this call collect_garbage() once per
+# iteration; otherwise every intermediate image stays in the node table.
+
+
+class FiringRelation:
+    """
+    pre / post: {transition: iterable of places}, in transition order.
+    var_of: {place: BDD variable holding its token}.
+    A place in both pre(t) and post(t) is marked before and after firing t.
+    """
+
+    def __init__(self, bdd, pre, post, var_of):
+        self.bdd = bdd
+        self.transitions = list(pre)
+        self.enabled = {}
+        self._fire = {}
+        for t in self.transitions:
+            ins, outs = set(pre[t]), set(post[t])
+            guard = {var_of[p]: True for p in ins}
+            effect = {var_of[p]: p in outs for p in ins | outs}
+            self.enabled[t] = bdd.cube(guard)
+            self._fire[t] = (guard, {var_of[p] for p in outs - ins}, effect, bdd.cube(effect))
+
+    def image(self, S):
+        """Markings reached from S by firing one transition."""
+        bdd = self.bdd
+        res = bdd.false
+        for t in self.transitions:
+            guard, overwritten, _, effect_cube = self._fire[t]
+            part = bdd.let(guard, S)
+            if part == bdd.false:
+                continue
+            if overwritten:
+                part = bdd.quantify(part, overwritten, forall=False)
+            res = bdd.apply("or", res, bdd.apply("and", part, effect_cube))
+        return res
+
+    def pre_image(self, S, transitions=None):
+        """
+        Markings (any, not only reachable ones) with at least one successor in S.
+        transitions: only count successors by these transitions (default: all).
+        """
+        bdd = self.bdd
+        res = bdd.false
+        for t in self.transitions if transitions is None else transitions:
+            _, _, effect, _ = self._fire[t]
+            part = bdd.let(effect, S)
+            res = bdd.apply("or", res, bdd.apply("and", part, self.enabled[t]))
+        return res
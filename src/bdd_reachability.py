@@ -4,13 +4,30 @@ from pympler import asizeof
 import time
 import csv
 import os
+from src.profiling import get_profiler
+from src.bdd_image import FiringRelation
 
-def run_symbolic_reachability(net, fname, csv_file=None):
+def run_symbolic_reachability(net, fname, csv_file=None, save_bdd=None, start_from=None,
+                               reach_path=None, reach_format="csv"):
     """
     Run symbolic reachability using BDD for a given net.
-    Optionally, load explicit markings from CSV to compute memory/state compression.
+    Optionally, load explicit markings to compute memory/state compression.
+    reach_path / reach_format: explicit reachable set written by the bfs stage,
+        "csv" or "rbin" (memory-mapped, see reachability_store).
+    csv_file: same as reach_path=csv_file, reach_format="csv".
+    save_bdd: path to dump Reach and the per-iteration frontier layers (see bdd_store).
+    start_from: Reach dump of an earlier version of this net; if the edit only
+        added transitions (see incremental.diff_nets) the fixed point restarts
+        from that set. Frontier layers are then unknown and not saved.
     Returns a dict with results.
     """
+    if csv_file is not None:
+        if reach_path is not None:
+            raise ValueError("Pass either csv_file or reach_path, not both")
+        reach_path, reach_format = csv_file, "csv"
+    if reach_format not in ("csv", "rbin"):
+        raise ValueError(f"Unknown reach_format {reach_format!r} (expected 'csv' or 'rbin')")
+
     result = {}
 
     print("\n=== Running symbolic reachability on:", fname,"===")
@@ -34,9 +51,7 @@ def run_symbolic_reachability(net, fname, csv_file=None):
 
     # ----- BDD setup -----
     bdd = BDD()
-    for p in places:
-        bdd.declare(p)
-        bdd.declare(p + "'")
+    bdd.declare(*places)
 
     def encode_marking(m):
         node = bdd.true
@@ -45,47 +60,37 @@ def run_symbolic_reachability(net, fname, csv_file=None):
         return node
 
     Reach = encode_marking(initial_marking)
+    restarted = False
+    if start_from:
+        from src.incremental import restart_set
+        old_reach = restart_set(bdd, start_from, net, {p: p for p in places})
+        if old_reach is not None:
+            Reach, restarted = old_reach | Reach, True
     Frontier = Reach
 
-    # Build transition relations
-    def build_transition_relation(pre, post):
-        R = bdd.true
-        for p in pre:
-            R &= bdd.var(p)
-        for p in pre:
-            R &= ~bdd.var(p + "'")
-        for p in post:
-            R &= bdd.var(p + "'")
-        for p in places:
-            if p not in pre and p not in post:
-                same = (bdd.var(p) & bdd.var(p+"'")) | (~bdd.var(p) & ~bdd.var(p+"'"))
-                R &= same
-        return R
-
-    transition_relations = [build_transition_relation(defs["pre"], defs["post"])
-                            for t, defs in transitions.items()]
-
-    # Image operator
-    current_vars = set(places)
-    rename_map = {p+"'": p for p in places}
-
-    def image(X):
-        res = bdd.false
-        for R in transition_relations:
-            part = bdd.exist(current_vars, X & R)
-            res |= part
-        res = bdd.let(rename_map, res)
-        return res
+    # Image operator (see bdd_image)
+    relation = FiringRelation(bdd, {t: defs["pre"] for t, defs in transitions.items()},
+                              {t: defs["post"] for t, defs in transitions.items()}, {p: p for p in places})
+    image = relation.image
 
     # ----- Fixed-point iteration -----
+    prof = get_profiler()
     start_time = time.time()
     iteration = 0
-    while Frontier != bdd.false:
-        print(f"[Iteration {iteration}] Frontier BDD nodes = {Frontier.dag_size}")
-        New = image(Frontier) & ~Reach
-        Reach |= New
-        Frontier = New
-        iteration += 1
+    layers = None if restarted else [Frontier]
+    with prof.span("bdd_reachability.fixed_point") as span:
+        while Frontier != bdd.false:
+            print(f"[Iteration {iteration}] Frontier BDD nodes = {Frontier.dag_size}")
+            New = image(Frontier) & ~Reach
+            Reach |= New
+            Frontier = New
+            bdd.collect_garbage()   # see bdd_image
+            iteration += 1
+            if New != bdd.false and layers is not None:
+                layers.append(New)
+            if prof.enabled:
+                prof.counter("bdd_reachability.nodes", frontier=Frontier.dag_size, reach=Reach.dag_size)
+        span.set(iterations=iteration)
     end_time = time.time()
     bdd_time = end_time - start_time
 
@@ -95,22 +100,55 @@ def run_symbolic_reachability(net, fname, csv_file=None):
     except Exception:
         total_bdd = None
 
-    bdd_mem = asizeof.asizeof(Reach)
+    # asizeof(Reach) would walk the whole manager through Reach's reference to it,
+    # which takes minutes on large nets. Only backends that track their memory
+    # (dd.cudd) report bytes; dd's pure-Python manager reports node counts only.
+    bdd_mem = bdd.statistics().get("mem")
 
     result["bdd"] = {
         "num_reachable_states": int(total_bdd) if total_bdd is not None else None,
         "bdd_memory_bytes": bdd_mem,
         "execution_time_sec": round(bdd_time, 6),
-        "bdd_nodes": Reach.dag_size
+        "bdd_nodes": Reach.dag_size,
+        "manager_nodes": len(bdd),
+        "restarted": restarted
     }
 
-    # ----- Optional explicit CSV -----
-    if csv_file and os.path.exists(csv_file):
+    if save_bdd:
+        from src.bdd_store import dump_bdds
+        from src.incremental import net_signature
+        roots = {"reach": Reach}
+        roots.update({f"layer_{i}": L for i, L in enumerate(layers or [])})
+        dump_bdds(save_bdd, bdd, roots, meta={
+            "engine": "bdd_reachability",
+            "places": places,
+            "var_of": {p: p for p in places},
+            "num_layers": len(layers or []),
+            "net": net_signature(net),
+        })
+        result["bdd"]["saved_to"] = str(save_bdd)
+
+    # ----- Optional explicit states (.rbin binary or CSV) -----
+    if reach_path and os.path.exists(reach_path) and reach_format == "rbin":
+        from src.reachability_store import open_reachability
+        with prof.span("bdd_reachability.explicit_rbin"):
+            rf = open_reachability(reach_path)
+            explicit_total = len(rf)
+            explicit_mem = rf.nbytes
+
+        result["explicit"] = {
+            "num_reachable_states": explicit_total,
+            "memory_bytes": explicit_mem,
+            "format": "rbin",
+            "state_compression_ratio": explicit_total / total_bdd if total_bdd else None,
+            "memory_compression_ratio": explicit_mem / bdd_mem if bdd_mem else None
+        }
+    elif reach_path and os.path.exists(reach_path):
         explicit_states = []
-        with open(csv_file, newline='') as f:
+        with prof.span("bdd_reachability.explicit_csv"), open(reach_path, newline='') as f:
             reader = csv.DictReader(f, delimiter=',')
             if reader.fieldnames is None:
-                raise ValueError(f"CSV header not found in {csv_file}")
+                raise ValueError(f"CSV header not found in {reach_path}")
             token_columns = [p for p in reader.fieldnames if p not in ["State_ID", "Depth"]]
             for row in reader:
                 explicit_states.append([int(row[p]) for p in token_columns])
@@ -121,6 +159,7 @@ def run_symbolic_reachability(net, fname, csv_file=None):
         result["explicit"] = {
             "num_reachable_states": explicit_total,
             "memory_bytes": explicit_mem,
+            "format": "csv",
             "state_compression_ratio": explicit_total / total_bdd if total_bdd else None,
             "memory_compression_ratio": explicit_mem / bdd_mem if bdd_mem else None
         }
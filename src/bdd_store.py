@@ -0,0 +1,127 @@
+# bdd_store.py
+# Save / reload BDDs (Reach, dead states, frontier layers...) together with
+# the variable order, so later queries can skip the fixed-point computation.
+#
+# File format (JSON):
+#   {
+#     "format": "pn-bdd", "version": 1,
+#     "vars":  [var names in level order],
+#     "nodes": [[var_index, low_ref, high_ref], ...],   # children first
+#     "roots": {name: ref},
+#     "meta":  {...}                                      # caller data (places, scheme, ...)
+#   }
+# A ref is 1 for TRUE, -1 for FALSE, +/-(k + 2) for nodes[k]; a negative
+# ref is the complement, matching dd's complemented edges.
+import json
+
+FORMAT = "pn-bdd"
+VERSION = 1
+
+
+def _var_order(bdd):
+    return [v for v, _ in sorted(bdd.var_levels.items(), key=lambda kv: kv[1])]
+
+
+def dump_bdds(path, bdd, roots, meta=None):
+    """
+    roots: {name: BDD node}. All roots must belong to `bdd`.
+    """
+    order = _var_order(bdd)
+    var_index = {v: i for i, v in enumerate(order)}
+    true_id = int(bdd.true)
+
+    nodes = []
+    ref_of = {}  # abs(int(node)) -> serialized ref of the regular node
+
+    def regular(u):
+        return ~u if u.negated else u
+
+    def ref(u):
+        if u == bdd.true:
+            return 1
+        if u == bdd.false:
+            return -1
+        r = ref_of[abs(int(u))]
+        return -r if u.negated else r
+
+    # iterative post-order so deep BDDs do not hit the recursion limit
+    for u in roots.values():
+        stack = [(regular(u), False)]
+        while stack:
+            node, expanded = stack.pop()
+            key = abs(int(node))
+            if key == true_id or key in ref_of:
+                continue
+            if expanded:
+                nodes.append([var_index[node.var], ref(node.low), ref(node.high)])
+                ref_of[key] = len(nodes) + 1
+                continue
+            stack.append((node, True))
+            for child in (node.high, node.low):
+                c = regular(child)
+                if abs(int(c)) != true_id and abs(int(c)) not in ref_of:
+                    stack.append((c, False))
+
+    data = {
+        "format": FORMAT,
+        "version": VERSION,
+        "vars": order,
+        "nodes": nodes,
+        "roots": {name: ref(u) for name, u in roots.items()},
+        "meta": meta or {},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+def load_bdds(path, bdd=None, accept=None):
+    """
+    Rebuild the saved roots. With bdd=None a fresh dd manager is created and
+    the saved variable order declared; otherwise missing variables are added
+    to the given manager.
+    accept: optional predicate on meta; when it returns False nothing is built
+    and the roots are None.
+    Returns (bdd, {name: node}, meta).
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != FORMAT:
+        raise ValueError(f"Not a saved BDD file: {path}")
+    if data.get("version") != VERSION:
+        raise ValueError(f"Unsupported BDD file version {data.get('version')}")
+    if accept is not None and not accept(data.get("meta", {})):
+        return bdd, None, data.get("meta", {})
+
+    if bdd is None:
+        from dd.autoref import BDD
+        bdd = BDD()
+    order = data["vars"]
+    missing = [v for v in order if v not in bdd.vars]
+    if missing:
+        bdd.declare(*missing)
+    var_nodes = [bdd.var(v) for v in order]
+
+    built = []
+
+    def get(r):
+        if r == 1:
+            return bdd.true
+        if r == -1:
+            return bdd.false
+        u = built[abs(r) - 2]
+        return ~u if r < 0 else u
+
+    for vi, lo, hi in data["nodes"]:
+        built.append(bdd.ite(var_nodes[vi], get(hi), get(lo)))
+
+    roots = {name: get(r) for name, r in data["roots"].items()}
+    return bdd, roots, data.get("meta", {})
+
+
+def marking_in(bdd, node, marking, var_of):
+    """
+    Membership test for one 0/1 marking.
+    var_of: {place: BDD variable name} (e.g. {p: p} or {p: f"x_{p}"}).
+    """
+    assign = {var_of[p]: bool(v) for p, v in marking.items() if p in var_of}
+    return bdd.let(assign, node) == bdd.true
@@ -1,16 +1,40 @@
 # bfs.py
 from collections import deque
 import json
+import time
+from src.profiling import get_profiler
+from src.exploration import carry_enabled, dependency_index
 
-def bfs_reachable_markings_with_depth(petri_net, initial_marking=None):
+def bfs_reachable_markings_with_depth(petri_net, initial_marking=None, build_graph=False,
+                                      budget=None, checkpoint=None, resume=False, symmetry=None):
     """
     BFS + trả về depth của mỗi trạng thái.
+    build_graph=True also records every edge (see reachability_graph.py);
+    state i of the graph is markings[i].
+    budget: optional exploration.Budget. When a limit is hit the markings found so far
+        are returned with complete=False; unexpanded markings get no outgoing edges.
+    checkpoint: optional exploration.Checkpointer, saved periodically and when a limit
+        is hit. resume=True continues from it (same net, same build_graph) and yields
+        exactly the result of an uninterrupted run.
+    symmetry: optional symmetry.Symmetry; only one canonical marking per orbit is
+        stored (markings/depth hold representatives, see symmetry.expand_markings).
+        Cannot be combined with build_graph.
     Output:
         {
             "markings": [dict, ...],
-            "depth": {marking_json_str: depth}
+            "depths": [int, ...],             # depth of markings[i]
+            "depth": {marking_json_str: depth},
+            "complete": bool,
+            "stop_reason": None | "max_states" | "max_depth" | "max_seconds" | "max_memory",
+            "graph": ReachabilityGraph,       # only with build_graph=True
+            "num_concrete_states": int        # only with symmetry: sum of orbit sizes
         }
     """
+    if symmetry and build_graph:
+        raise ValueError("Symmetry reduction does not record a reachability graph")
+    if not symmetry:
+        symmetry = None
+
     if initial_marking is None:
         initial_marking = {p["id"]: p["m0"] for p in petri_net["places"]}
     
@@ -28,44 +52,168 @@ def bfs_reachable_markings_with_depth(petri_net, initial_marking=None):
         else:
             trans_outputs.setdefault(src, {})[tgt] = w
     
-    # BFS
-    reachable = set()
-    depth_map = {}
-    queue = deque()
-    
-    init_mark = initial_marking.copy()
-    init_key = json.dumps(init_mark, sort_keys=True)
-    queue.append(init_mark)
-    reachable.add(init_key)
-    depth_map[init_key] = 0
+    # each queued marking carries its enabled transitions (indices, in net order);
+    # after firing t only the transitions in affected[t] are re-tested
+    transitions = [t["id"] for t in petri_net.get("transitions", [])]
+    t_inputs = [trans_inputs.get(t, {}) for t in transitions]
+    t_outputs = [trans_outputs.get(t, {}) for t in transitions]
+    affected = dependency_index(t_inputs, t_outputs)
+
+    graph = None
+    if build_graph:
+        from src.reachability_graph import ReachabilityGraph
+
+    prof = get_profiler()
+    fired = 0
+    checks = 0
+    level, level_size = 0, 0
+
+    sym_info = symmetry.describe() if symmetry is not None else None
+    saved = checkpoint.load("bfs", petri_net) if checkpoint is not None and resume else None
+    if saved is not None:
+        if saved["build_graph"] != build_graph:
+            raise ValueError("Checkpoint was written with build_graph=%s" % saved["build_graph"])
+        if saved.get("symmetry") != sym_info:
+            raise ValueError("Checkpoint was written with a different symmetry reduction")
+        depth_map = saved["depth"]
+        reachable = set(depth_map)
+        markings_list = saved["markings"]
+        depths_list = saved.get("depths") or [depth_map[json.dumps(m, sort_keys=True)] for m in markings_list]
+        queue = deque(saved["queue"])
+        fired = saved["fired"]
+        if build_graph:
+            graph = saved["graph"]
+            index_of = saved["index_of"]
+        if queue:
+            level = queue[0][1]
+    else:
+        # BFS
+        reachable = set()
+        depth_map = {}
+        queue = deque()
+
+        init_mark = initial_marking.copy()
+        if symmetry is not None:
+            init_mark = symmetry.canonical_marking(init_mark)
+        init_key = json.dumps(init_mark, sort_keys=True)
+        init_enabled = tuple(ti for ti, inputs in enumerate(t_inputs)
+                             if all(init_mark.get(p, 0) >= w for p, w in inputs.items()))
+        queue.append((init_mark, 0, init_enabled))
+        reachable.add(init_key)
+        depth_map[init_key] = 0
+
+        markings_list = [init_mark]
+        depths_list = [0]
+
+        if build_graph:
+            graph = ReachabilityGraph(transitions)
+            index_of = {init_key: 0}
 
-    markings_list = [init_mark]
+    def snapshot():
+        state = {"depth": depth_map, "markings": markings_list, "depths": depths_list, "queue": list(queue),
+                 "fired": fired, "build_graph": build_graph, "symmetry": sym_info}
+        if build_graph:
+            state.update(graph=graph, index_of=index_of)
+        return state
+
+    if budget is not None:
+        budget.start()
+    stop_reason = None
+    t_start = time.perf_counter()
+
+    def rate_counter():
+        # markings stored so far and the rate since this call started, once per BFS level
+        elapsed = time.perf_counter() - t_start
+        prof.counter("bfs.rate", level=level, states=len(markings_list),
+                     states_per_sec=len(markings_list) / elapsed if elapsed else None)
 
     while queue:
-        current = queue.popleft()
-        curr_key = json.dumps(current, sort_keys=True)
-        curr_depth = depth_map[curr_key]
+        # limits are checked between states, so a checkpoint never holds a half-expanded one
+        if budget is not None:
+            stop_reason = budget.exceeded(len(markings_list))
+            if stop_reason is None and budget.depth_blocked(queue[0][1]):
+                stop_reason = "max_depth"
+            if stop_reason is not None:
+                break
+        if checkpoint is not None and checkpoint.due(len(markings_list)):
+            with prof.span("bfs.checkpoint"):
+                checkpoint.save("bfs", petri_net, snapshot(), len(markings_list))
 
-        for t in petri_net.get("transitions", []):
-            trans_id = t["id"]
-            inputs = trans_inputs.get(trans_id, {})
-            if not all(current.get(p, 0) >= w for p, w in inputs.items()):
-                continue
+        current, curr_depth, enabled = queue.popleft()
 
+        if prof.enabled:
+            if curr_depth != level:
+                prof.counter("bfs.frontier", level=level, size=level_size)
+                rate_counter()
+                level, level_size = curr_depth, 0
+            level_size += 1
+
+        for ti in enabled:
+            fired += 1
             new_mark = current.copy()
-            for p, w in inputs.items():
+            for p, w in t_inputs[ti].items():
                 new_mark[p] -= w
-            for p, w in trans_outputs.get(trans_id, {}).items():
+            for p, w in t_outputs[ti].items():
                 new_mark[p] = new_mark.get(p, 0) + w
+            moved = False
+            if symmetry is not None:
+                canon = symmetry.canonical_marking(new_mark)
+                moved, new_mark = canon is not new_mark, canon
 
             new_key = json.dumps(new_mark, sort_keys=True)
             if new_key not in reachable:
                 reachable.add(new_key)
                 depth_map[new_key] = curr_depth + 1
-                queue.append(new_mark)
+                if moved:
+                    # the representative is a permuted marking: test everything
+                    checks += len(t_inputs)
+                    new_enabled = tuple(u for u, inputs in enumerate(t_inputs)
+                                        if all(new_mark.get(p, 0) >= w for p, w in inputs.items()))
+                else:
+                    checks += len(affected[ti][0])
+                    new_enabled = carry_enabled(enabled, affected[ti], lambda u: all(
+                        new_mark.get(p, 0) >= w for p, w in t_inputs[u].items()))
+                queue.append((new_mark, curr_depth + 1, new_enabled))
+                if graph is not None:
+                    index_of[new_key] = len(markings_list)
                 markings_list.append(new_mark)
+                depths_list.append(curr_depth + 1)
+            if graph is not None:
+                graph.add_edge(index_of[new_key], ti)
+
+        # states leave the FIFO queue in index order, so this closes state i
+        if graph is not None:
+            graph.close_state()
+
+    if checkpoint is not None:
+        if stop_reason is not None:
+            with prof.span("bfs.checkpoint"):
+                checkpoint.save("bfs", petri_net, snapshot(), len(markings_list))
+        else:
+            checkpoint.clear()
+
+    if graph is not None and stop_reason is not None:
+        # unexpanded markings keep an empty edge list so state ids stay valid
+        for _ in range(len(markings_list) - graph.num_states):
+            graph.close_state()
+    if graph is not None:
+        graph.finalize()
+
+    if prof.enabled:
+        prof.counter("bfs.frontier", level=level, size=level_size)
+        rate_counter()
+        prof.counter("bfs.totals", states=len(markings_list), transitions_fired=fired, enabling_checks=checks)
 
-    return {
+    out = {
         "markings": markings_list,
-        "depth": depth_map
-    }
\ No newline at end of file
+        "depths": depths_list,
+        "depth": depth_map,
+        "complete": stop_reason is None,
+        "stop_reason": stop_reason,
+    }
+    if graph is not None:
+        out["graph"] = graph
+    if symmetry is not None:
+        out["num_concrete_states"] = sum(symmetry.orbit_size(tuple(m.get(p, 0) for p in symmetry.places))
+                                         for m in markings_list)
+    return out
@@ -0,0 +1,299 @@
+# bitstate.py
+# Approximate explicit exploration in a fixed memory footprint (supertrace style).
+#
+# The visited set is not stored exactly:
+#   "bitstate"     m-bit array, k bit positions per marking (double hashing)
+#   "hashcompact"  set of 64-bit marking hashes
+# A marking whose bits are all already set (or whose hash collides) is wrongly
+# taken as visited and its successors may be missed, so the reachable count is
+# a lower bound. Every reported deadlock is still a real one. With
+# keep_traces it also carries the firing sequence that leads to it, and that
+# sequence is replayed from M0 before the deadlock is returned.
+#
+# The BFS queue is capped at max_queue markings: successors that do not fit
+# are left out of the visited set (they may still be reached later by another
+# path) and the run is reported as incomplete.
+import hashlib
+import math
+import sys
+import time
+from array import array
+from collections import deque
+from src.profiling import get_profiler
+
+
+def _digest(tpl):
+    return hashlib.blake2b(array("q", tpl).tobytes(), digest_size=16).digest()
+
+
+class BitstateSet:
+    """Bloom-filter visited set: num_bits bits, k positions per marking."""
+
+    def __init__(self, num_bits=1 << 27, k=3):
+        self.num_bits = num_bits
+        self.k = k
+        self.bits = bytearray((num_bits + 7) // 8)
+        self.bits_set = 0
+        self.num_stored = 0
+        self.expected_omissions = 0.0
+
+    def _positions(self, tpl):
+        d = _digest(tpl)
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        for i in range(self.k):
+            pos = (h1 + i * h2) % self.num_bits
+            yield pos >> 3, 1 << (pos & 7)
+
+    def __contains__(self, tpl):
+        bits = self.bits
+        return all(bits[byte] & mask for byte, mask in self._positions(tpl))
+
+    def add(self, tpl):
+        """Insert; returns False when the marking is (possibly wrongly) already present."""
+        m, bits = self.num_bits, self.bits
+        new = False
+        for byte, mask in self._positions(tpl):
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                self.bits_set += 1
+                new = True
+        if new:
+            # chance that this insertion would already have found all k bits set
+            self.expected_omissions += (self.bits_set / m) ** self.k
+            self.num_stored += 1
+        return new
+
+    def nbytes(self):
+        return len(self.bits)
+
+    def report(self):
+        return {
+            "store": "bitstate",
+            "num_bits": self.num_bits,
+            "num_hashes": self.k,
+            "fill_ratio": self.bits_set / self.num_bits,
+            "memory_bytes": self.nbytes(),
+        }
+
+
+class HashCompactSet:
+    """Exact set of 64-bit marking hashes (one Python int per marking plus set overhead)."""
+
+    def __init__(self):
+        self.hashes = set()
+        self.num_stored = 0
+        self.key_bytes = 0
+
+    def __contains__(self, tpl):
+        return int.from_bytes(_digest(tpl)[:8], "little") in self.hashes
+
+    def add(self, tpl):
+        h = int.from_bytes(_digest(tpl)[:8], "little")
+        if h in self.hashes:
+            return False
+        self.hashes.add(h)
+        self.num_stored += 1
+        self.key_bytes += sys.getsizeof(h)
+        return True
+
+    @property
+    def expected_omissions(self):
+        # the i-th insertion collides with probability i / 2^64
+        n = self.num_stored
+        return n * (n - 1) / 2.0 ** 65
+
+    def nbytes(self):
+        # the set table only holds pointers; the int objects are counted separately
+        return sys.getsizeof(self.hashes) + self.key_bytes
+
+    def report(self):
+        return {"store": "hashcompact", "hash_bits": 64, "memory_bytes": self.nbytes()}
+
+
+def _index_net(net):
+    places = [p["id"] for p in net["places"]]
+    col = {p: i for i, p in enumerate(places)}
+    transitions = [t["id"] for t in net["transitions"]]
+    pre = {t: [] for t in transitions}
+    post = {t: [] for t in transitions}
+    for arc in net["arcs"]:
+        w = arc.get("weight", 1)
+        if arc["src"] in col and arc["target"] in pre:
+            pre[arc["target"]].append((col[arc["src"]], w))
+        elif arc["src"] in post and arc["target"] in col:
+            post[arc["src"]].append((col[arc["target"]], w))
+    return places, transitions, [pre[t] for t in transitions], [post[t] for t in transitions]
+
+
+def _successors(tpl, pre, post):
+    for ti in range(len(pre)):
+        if all(tpl[i] >= w for i, w in pre[ti]):
+            nxt = list(tpl)
+            for i, w in pre[ti]:
+                nxt[i] -= w
+            for i, w in post[ti]:
+                nxt[i] += w
+            yield ti, tuple(nxt)
+
+
+def _fire_sequence(tpl, trace_idx, pre, post):
+    cur = list(tpl)
+    for step, ti in enumerate(trace_idx):
+        if not all(cur[i] >= w for i, w in pre[ti]):
+            raise ValueError(f"Transition #{ti} is not enabled at step {step}")
+        for i, w in pre[ti]:
+            cur[i] -= w
+        for i, w in post[ti]:
+            cur[i] += w
+    return tuple(cur)
+
+
+def replay(net, trace, initial_marking=None):
+    """Fire `trace` (transition ids) from M0; returns the final marking or raises ValueError."""
+    places, transitions, pre, post = _index_net(net)
+    t_index = {t: i for i, t in enumerate(transitions)}
+    if initial_marking is None:
+        initial_marking = {p["id"]: int(p.get("m0", 0)) for p in net["places"]}
+    M0 = tuple(initial_marking.get(p, 0) for p in places)
+    return dict(zip(places, _fire_sequence(M0, [t_index[t] for t in trace], pre, post)))
+
+
+def approximate_bfs(net, store="bitstate", num_bits=1 << 27, k=3, deadlock_limit=10,
+                    keep_traces=False, max_queue=1 << 20, budget=None):
+    """
+    BFS with an approximate visited set (see module docstring).
+    keep_traces: record a parent pointer per stored marking (6 bytes each) so
+        deadlocks come with a replayed firing sequence; without it only the
+        deadlock markings are returned (trace None). This is the one part of
+        the footprint that grows with the number of stored markings.
+    max_queue: most markings held in the BFS queue at once; None for no cap.
+    budget: optional exploration.Budget (max_states counts stored markings).
+    Returns:
+        {
+          "num_states": int,                  # stored markings (lower bound on |Reach|)
+          "max_depth": int,
+          "transitions_fired": int,
+          "expected_omissions": float,
+          "omission_probability": float,      # P(at least one marking was skipped)
+          "estimated_coverage": float,        # stored / (stored + expected omissions)
+          "deadlocks": [{"marking": dict, "depth": int, "trace": [t_id, ...] | None}, ...],
+          "complete": bool,                   # False if a budget, deadlock_limit or max_queue cut the search
+          "stop_reason": str | None,          # ... | "deadlock_limit" | "max_queue"
+          "queue_dropped": int,               # new successors left out because the queue was full
+          "visited_set": {...},               # store parameters, fill ratio, bytes
+          "memory": {"visited_set_bytes": int, "queue_peak_bytes": int,
+                     "trace_bytes": int, "total_bytes": int},
+          "runtime_sec": float
+        }
+    """
+    start = time.time()
+    prof = get_profiler()
+    places, transitions, pre, post = _index_net(net)
+
+    if store == "bitstate":
+        seen = BitstateSet(num_bits, k)
+    elif store == "hashcompact":
+        seen = HashCompactSet()
+    else:
+        raise ValueError(f"Unknown store {store!r} (expected 'bitstate' or 'hashcompact')")
+
+    M0 = tuple(int(p.get("m0", 0)) for p in net["places"])
+    seen.add(M0)
+    parent = array("I", [0]) if keep_traces else None
+    via = array("H" if len(transitions) <= 0xFFFF else "I", [0]) if keep_traces else None
+
+    # queue entries: (marking, depth, state id for trace reconstruction)
+    queue = deque([(M0, 0, 0)])
+    queue_peak = 1
+    dropped = 0
+    deadlocks = []
+    fired = 0
+    max_depth = 0
+    stop_reason = None
+    if budget is not None:
+        budget.start()
+
+    def trace_of(sid):
+        path = []
+        while sid:
+            path.append(via[sid])
+            sid = parent[sid]
+        return path[::-1]
+
+    with prof.span("bitstate.explore", store=store):
+        while queue:
+            if budget is not None:
+                stop_reason = budget.exceeded(seen.num_stored)
+                if stop_reason is None and budget.depth_blocked(queue[0][1]):
+                    stop_reason = "max_depth"
+                if stop_reason is not None:
+                    break
+
+            cur, depth, sid = queue.popleft()
+            max_depth = max(max_depth, depth)
+            has_succ = False
+            for ti, nxt in _successors(cur, pre, post):
+                has_succ = True
+                fired += 1
+                if max_queue is not None and len(queue) >= max_queue:
+                    # only a new marking is lost; it is not marked as visited,
+                    # so another path may still store it
+                    if nxt not in seen:
+                        dropped += 1
+                    continue
+                if seen.add(nxt):
+                    nid = 0
+                    if keep_traces:
+                        nid = len(parent)
+                        parent.append(sid)
+                        via.append(ti)
+                    queue.append((nxt, depth + 1, nid))
+            queue_peak = max(queue_peak, len(queue))
+
+            if not has_succ:
+                marking = dict(zip(places, cur))
+                trace = None
+                if keep_traces:
+                    trace_idx = trace_of(sid)
+                    if _fire_sequence(M0, trace_idx, pre, post) != cur:
+                        raise RuntimeError("deadlock witness does not replay to the dead marking")
+                    trace = [transitions[ti] for ti in trace_idx]
+                deadlocks.append({"marking": marking, "depth": depth, "trace": trace})
+                if len(deadlocks) >= deadlock_limit:
+                    stop_reason = "deadlock_limit"
+                    break
+
+    if stop_reason is None and dropped:
+        stop_reason = "max_queue"
+
+    n = seen.num_stored
+    omissions = seen.expected_omissions
+    # one queue entry: deque slot + (marking, depth, sid) tuple + marking tuple
+    # (+ the sid int, which is outside the small-int cache); token counts and
+    # depths are small ints shared by the interpreter
+    entry_bytes = 8 + sys.getsizeof((M0, 0, 0)) + sys.getsizeof(M0) + (sys.getsizeof(1 << 20) if keep_traces else 0)
+    memory = {
+        "visited_set_bytes": seen.nbytes(),
+        "queue_peak_bytes": queue_peak * entry_bytes,
+        "trace_bytes": parent.itemsize * len(parent) + via.itemsize * len(via) if keep_traces else 0,
+    }
+    memory["total_bytes"] = sum(memory.values())
+    if prof.enabled:
+        prof.counter("bitstate.totals", states=n, transitions_fired=fired, expected_omissions=omissions,
+                     queue_peak=queue_peak, queue_dropped=dropped)
+    return {
+        "num_states": n,
+        "max_depth": max_depth,
+        "transitions_fired": fired,
+        "expected_omissions": omissions,
+        "omission_probability": -math.expm1(-omissions),
+        "estimated_coverage": n / (n + omissions) if n else 1.0,
+        "deadlocks": deadlocks,
+        "complete": stop_reason is None,
+        "stop_reason": stop_reason,
+        "queue_dropped": dropped,
+        "visited_set": seen.report(),
+        "memory": memory,
+        "runtime_sec": time.time() - start,
+    }
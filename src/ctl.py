@@ -0,0 +1,268 @@
+# ctl.py
+# Symbolic CTL model checking for 1-safe nets, on top of bdd_deadlock._BDDSolver.
+#
+# Syntax (place names are atomic propositions "place is marked"):
+#   true | false | place | "odd place-name" | !f | f & g | f | g | f -> g | (f)
+#   EX f | AX f | EF f | AF f | EG f | AG f | E[f U g] | A[f U g]
+# e.g.  AG(Line1_Buf -> AF Collector)
+#
+# Semantics are over maximal paths: a dead marking has no successor, so
+# EX f is false and AX f true there, and EG f holds at a dead marking where f holds.
+# All satisfying sets are restricted to the reachable markings.
+import re
+import time
+from src.profiling import get_profiler
+
+UNARY_TEMPORAL = ("EX", "AX", "EF", "AF", "EG", "AG")
+
+_TOKEN = re.compile(r'\s*(->|[()\[\]!&|]|"[^"]*"|[A-Za-z_][\w.]*)')
+
+
+class CTLSyntaxError(ValueError):
+    pass
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m:
+            raise CTLSyntaxError(f"Unexpected character at {pos}: {text[pos:pos + 10]!r}")
+        tokens.append(m.group(1))
+        pos = m.end()
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.i = 0
+
+    def peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else None
+
+    def take(self, expected=None):
+        tok = self.peek()
+        if tok is None or (expected is not None and tok != expected):
+            raise CTLSyntaxError(f"Expected {expected or 'a token'}, got {tok!r}")
+        self.i += 1
+        return tok
+
+    def parse(self):
+        f = self.implication()
+        if self.peek() is not None:
+            raise CTLSyntaxError(f"Unexpected token {self.peek()!r}")
+        return f
+
+    def implication(self):
+        left = self.disjunction()
+        if self.peek() == "->":
+            self.take()
+            return ("or", ("not", left), self.implication())
+        return left
+
+    def disjunction(self):
+        f = self.conjunction()
+        while self.peek() == "|":
+            self.take()
+            f = ("or", f, self.conjunction())
+        return f
+
+    def conjunction(self):
+        f = self.unary()
+        while self.peek() == "&":
+            self.take()
+            f = ("and", f, self.unary())
+        return f
+
+    def unary(self):
+        tok = self.peek()
+        if tok == "!":
+            self.take()
+            return ("not", self.unary())
+        if tok in UNARY_TEMPORAL:
+            self.take()
+            return (tok, self.unary())
+        if tok in ("E", "A") and self.tokens[self.i + 1:self.i + 2] == ["["]:
+            self.take()
+            self.take("[")
+            left = self.implication()
+            self.take("U")
+            right = self.implication()
+            self.take("]")
+            return (tok + "U", left, right)
+        if tok == "(":
+            self.take()
+            f = self.implication()
+            self.take(")")
+            return f
+        tok = self.take()
+        if tok in ("true", "false"):
+            return (tok,)
+        if tok in (")", "]", "&", "|", "->", "U"):
+            raise CTLSyntaxError(f"Unexpected token {tok!r}")
+        return ("ap", tok.strip('"'))
+
+
+def parse_ctl(text):
+    """Parse a CTL string into a nested-tuple formula."""
+    return _Parser(text).parse()
+
+
+def to_core(f):
+    """Rewrite derived operators into not / and / or / EX / EU / EG."""
+    op = f[0]
+    if op in ("true", "false", "ap"):
+        return f
+    if op == "not":
+        return ("not", to_core(f[1]))
+    if op in ("and", "or"):
+        return (op, to_core(f[1]), to_core(f[2]))
+    if op == "EX":
+        return ("EX", to_core(f[1]))
+    if op == "AX":
+        return ("not", ("EX", ("not", to_core(f[1]))))
+    if op == "EF":
+        return ("EU", ("true",), to_core(f[1]))
+    if op == "AF":
+        return ("not", ("EG", ("not", to_core(f[1]))))
+    if op == "EG":
+        return ("EG", to_core(f[1]))
+    if op == "AG":
+        return ("not", ("EU", ("true",), ("not", to_core(f[1]))))
+    if op == "EU":
+        return ("EU", to_core(f[1]), to_core(f[2]))
+    if op == "AU":
+        # A[f U g] = !(E[!g U (!f & !g)] | EG !g)
+        a, b = to_core(f[1]), to_core(f[2])
+        nb = ("not", b)
+        return ("not", ("or", ("EU", nb, ("and", ("not", a), nb)), ("EG", nb)))
+    raise CTLSyntaxError(f"Unknown operator {op!r}")
+
+
+class CTLChecker:
+    """
+    Checks many formulas against one net. Reach, the dead markings and the
+    satisfying set of every (core) sub-formula are cached, so properties
+    sharing sub-formulas or fixed points only pay for them once.
+    """
+
+    def __init__(self, net=None, solver=None):
+        from src.bdd_deadlock import _BDDSolver
+        if solver is None:
+            solver = _BDDSolver(net)
+        self.s = solver
+        self.bdd = solver.bdd
+        with get_profiler().span("ctl.reachable"):
+            self.reach = solver.reachable()
+        self.initial = solver.initial_node()
+        self.dead = self._and(self.reach, self._not(solver.pre_image(self.bdd.true)))
+        self.cache = {}
+
+    def _and(self, a, b):
+        return self.bdd.apply("and", a, b)
+
+    def _or(self, a, b):
+        return self.bdd.apply("or", a, b)
+
+    def _not(self, a):
+        return self.bdd.apply("not", a)
+
+    def _ex(self, X):
+        return self._and(self.s.pre_image(X), self.reach)
+
+    def sat(self, formula):
+        """BDD of reachable markings satisfying `formula` (string or tuple)."""
+        if isinstance(formula, str):
+            formula = parse_ctl(formula)
+        return self._sat(to_core(formula))
+
+    def _sat(self, f):
+        hit = self.cache.get(f)
+        if hit is not None:
+            return hit
+
+        op = f[0]
+        if op == "true":
+            res = self.reach
+        elif op == "false":
+            res = self.bdd.false
+        elif op == "ap":
+            if f[1] not in self.s.vars:
+                raise CTLSyntaxError(f"Unknown place {f[1]!r}")
+            res = self._and(self.reach, self.bdd.var(self.s.vars[f[1]]))
+        elif op == "not":
+            res = self._and(self.reach, self._not(self._sat(f[1])))
+        elif op == "and":
+            res = self._and(self._sat(f[1]), self._sat(f[2]))
+        elif op == "or":
+            res = self._or(self._sat(f[1]), self._sat(f[2]))
+        elif op == "EX":
+            res = self._ex(self._sat(f[1]))
+        elif op == "EU":
+            # least fixed point  Z = g | (f & EX Z)
+            a, Z = self._sat(f[1]), self._sat(f[2])
+            while True:
+                nZ = self._or(Z, self._and(a, self._ex(Z)))
+                if nZ == Z:
+                    break
+                Z = nZ
+            res = Z
+        elif op == "EG":
+            # greatest fixed point  Z = f & (EX Z | dead)
+            a = self._sat(f[1])
+            Z = a
+            while True:
+                nZ = self._and(a, self._or(self._ex(Z), self.dead))
+                if nZ == Z:
+                    break
+                Z = nZ
+            res = Z
+        else:
+            raise CTLSyntaxError(f"Unknown operator {op!r}")
+
+        self.cache[f] = res
+        return res
+
+    def _pick(self, node):
+        care = set(self.s.vars.values())
+        for assign in self.bdd.pick_iter(node, care_vars=care):
+            return {p: int(assign.get(self.s.vars[p], False)) for p in self.s.places}
+        return None
+
+    def check(self, formula):
+        """
+        Returns {"formula", "holds", "num_sat_states", "witness", "runtime_sec"}.
+        holds is evaluated at the initial marking. For top-level EF g that
+        holds, witness is a reachable marking satisfying g; for AG g that
+        fails, it is a reachable marking violating g. Otherwise None.
+        """
+        start = time.time()
+        text = formula if isinstance(formula, str) else repr(formula)
+        f = parse_ctl(formula) if isinstance(formula, str) else formula
+        with get_profiler().span("ctl.check", formula=text):
+            S = self.sat(f)
+            holds = self._and(self.initial, self._not(S)) == self.bdd.false
+            witness = None
+            if f[0] == "EF" and holds:
+                witness = self._pick(self.sat(f[1]))
+            elif f[0] == "AG" and not holds:
+                witness = self._pick(self._and(self.reach, self._not(self.sat(f[1]))))
+        return {
+            "formula": text,
+            "holds": holds,
+            "num_sat_states": int(S.count(len(self.s.places))),
+            "witness": witness,
+            "runtime_sec": time.time() - start,
+        }
+
+    def check_all(self, formulas):
+        return [self.check(f) for f in formulas]
+
+
+def check_ctl(net, formulas):
+    """Convenience wrapper: one checker (one Reach computation) for all formulas."""
+    return CTLChecker(net).check_all(formulas)
@@ -0,0 +1,140 @@
+# exploration.py
+# Resource budgets, checkpoint/resume support and the transition dependency
+# index shared by the explicit explorers (bfs.py, bdd_deadlock.explicit_bfs_deadlocks).
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from src.profiling import _rss_bytes
+
+# expensive checks (clock, RSS) only every N expanded states
+CHECK_INTERVAL = 256
+
+
+class Budget:
+    """
+    Limits for one exploration. Any of them may be None (= unlimited).
+        max_states        stop once this many distinct markings were discovered
+        max_depth         do not expand markings at this BFS depth
+        max_seconds       wall-clock limit (time spent in earlier, resumed runs is not counted)
+        max_memory_bytes  resident set size limit
+    """
+
+    def __init__(self, max_states=None, max_depth=None, max_seconds=None, max_memory_bytes=None):
+        self.max_states = max_states
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self._deadline = None
+        self._tick = 0
+
+    def start(self):
+        self._deadline = time.monotonic() + self.max_seconds if self.max_seconds is not None else None
+        self._tick = 0
+        return self
+
+    def exceeded(self, num_states):
+        """Reason string when the exploration must stop, else None."""
+        if self.max_states is not None and num_states >= self.max_states:
+            return "max_states"
+        self._tick += 1
+        if self._tick % CHECK_INTERVAL:
+            return None
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            return "max_seconds"
+        if self.max_memory_bytes is not None:
+            rss = _rss_bytes()
+            if rss is not None and rss >= self.max_memory_bytes:
+                return "max_memory"
+        return None
+
+    def depth_blocked(self, depth):
+        return self.max_depth is not None and depth >= self.max_depth
+
+
+def net_fingerprint(net):
+    """Stable hash of places / transitions / arcs / m0, to refuse resuming on another net."""
+    data = {
+        "places": [(p["id"], p.get("m0", 0)) for p in net["places"]],
+        "transitions": [t["id"] for t in net["transitions"]],
+        "arcs": sorted((a["src"], a["target"], a.get("weight", 1)) for a in net["arcs"]),
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Checkpointer:
+    """
+    Periodically pickles the explorer state to `path` (written to a temp
+    file then renamed, so a crash mid-write keeps the previous checkpoint).
+    """
+
+    def __init__(self, path, every_seconds=60.0, every_states=None):
+        self.path = str(path)
+        self.every_seconds = every_seconds
+        self.every_states = every_states
+        self._last_time = time.monotonic()
+        self._last_states = 0
+        self.num_saved = 0
+
+    def due(self, num_states):
+        if self.every_states is not None and num_states - self._last_states >= self.every_states:
+            return True
+        return self.every_seconds is not None and time.monotonic() - self._last_time >= self.every_seconds
+
+    def save(self, engine, net, payload, num_states):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"engine": engine, "fingerprint": net_fingerprint(net), "state": payload},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        self._last_time = time.monotonic()
+        self._last_states = num_states
+        self.num_saved += 1
+
+    def load(self, engine, net):
+        """Saved state for `engine`, or None if there is no checkpoint file."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("engine") != engine:
+            raise ValueError(f"Checkpoint {self.path} belongs to {data.get('engine')!r}, not {engine!r}")
+        if data.get("fingerprint") != net_fingerprint(net):
+            raise ValueError(f"Checkpoint {self.path} was written for a different net")
+        return data["state"]
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def dependency_index(pre, post):
+    """
+    pre[i] / post[i]: {place: weight} of transition i.
+    Returns affected[i] = (tuple, frozenset) of the transitions (indices, sorted)
+    whose enabling can change when i fires: the consumers of every place whose
+    token count i actually changes (self-loop places with equal weights don't count).
+    """
+    consumers = {}
+    for ti, inputs in enumerate(pre):
+        for p in inputs:
+            consumers.setdefault(p, set()).add(ti)
+    affected = []
+    for ti in range(len(pre)):
+        changed = [p for p in set(pre[ti]) | set(post[ti]) if post[ti].get(p, 0) != pre[ti].get(p, 0)]
+        aff = set()
+        for p in changed:
+            aff |= consumers.get(p, set())
+        affected.append((tuple(sorted(aff)), frozenset(aff)))
+    return affected
+
+
+def carry_enabled(enabled, affected, is_enabled):
+    """Enabled set of a successor: keep unaffected transitions, re-test only the affected ones."""
+    aff, aff_set = affected
+    out = [u for u in enabled if u not in aff_set]
+    out.extend(u for u in aff if is_enabled(u))
+    out.sort()
+    return tuple(out)
@@ -1,6 +1,9 @@
 # ilp_deadlock.py
+import json
+import os
 import time
 import pulp
+from src.profiling import get_profiler
 
 def build_pre_post(net):
     places = [p["id"] for p in net["places"]]
@@ -22,27 +25,7 @@ def build_pre_post(net):
     return places, transitions, pre, post
 
 
-def solve_deadlock_ilp(net, max_firing_bound=None):
-    """
-    net: dict từ parser.parse_pnml + xử lý trong main.py
-    Return:
-        {
-          "status": str,
-          "deadlock_marking": dict | None,
-          "runtime_sec": float,
-          "num_vars": int,
-          "num_constraints": int
-        }
-    """
-    places, transitions, pre, post = build_pre_post(net)
-
-    # Bound firing amount:
-    if max_firing_bound is None:
-        max_firing_bound = len(places)
-
-    # --- ILP Problem ---
-    prob = pulp.LpProblem("Deadlock_Detection", pulp.LpMinimize)
-
+def _model_vars(places, transitions, max_firing_bound):
     # Variable for arking m_p
     m = {
         p: pulp.LpVariable(f"m_{p}", lowBound=0, upBound=1, cat="Binary")
@@ -54,6 +37,51 @@ def solve_deadlock_ilp(net, max_firing_bound=None):
         t: pulp.LpVariable(f"sigma_{t}", lowBound=0, upBound=max_firing_bound, cat="Integer")
         for t in transitions
     }
+    return m, sigma
+
+
+def _state_eq_row(p, transitions, pre, post, m, sigma, M0):
+    # State equation: m_p = M0_p + sum_t (post - pre)[p, t] * sigma_t
+    inflow = pulp.lpSum(post[t].get(p, 0) * sigma[t] for t in transitions)
+    outflow = pulp.lpSum(pre[t].get(p, 0) * sigma[t] for t in transitions)
+    row = m[p] == M0[p] + inflow - outflow
+    row.name = f"state_eq_{p}"
+    return row
+
+
+def _deadlock_row(t, pre, m):
+    # At least one input place of t is unmarked (None for transitions without inputs)
+    pre_places = list(pre[t].keys())
+    if not pre_places:
+        return None
+    row = pulp.lpSum(m[p] for p in pre_places) <= len(pre_places) - 1
+    row.name = f"deadlock_{t}"
+    return row
+
+
+def _row_name(name):
+    # constraint name as pulp stores it (illegal characters replaced)
+    return pulp.LpConstraint(name=name).name
+
+
+def _marking_var_names(m):
+    # {place_id: name of its m_ variable}, as pulp stores it (same sanitiser as rows)
+    return {p: v.name for p, v in m.items()}
+
+
+def build_deadlock_model(net, max_firing_bound=None):
+    """
+    The deadlock ILP of `net`: (unsolved pulp.LpProblem, {place_id: marking variable name}).
+    """
+    places, transitions, pre, post = build_pre_post(net)
+
+    # Bound firing amount:
+    if max_firing_bound is None:
+        max_firing_bound = len(places)
+
+    # --- ILP Problem ---
+    prob = pulp.LpProblem("Deadlock_Detection", pulp.LpMinimize)
+    m, sigma = _model_vars(places, transitions, max_firing_bound)
 
     # To minimize total firing attempts
     prob += pulp.lpSum(sigma[t] for t in transitions)
@@ -63,27 +91,121 @@ def solve_deadlock_ilp(net, max_firing_bound=None):
 
     # State equation constraints
     for p in places:
-        inflow = pulp.lpSum(post[t].get(p, 0) * sigma[t] for t in transitions)
-        outflow = pulp.lpSum(pre[t].get(p, 0) * sigma[t] for t in transitions)
-
-        prob += (
-            m[p] == M0[p] + inflow - outflow,
-            f"state_eq_{p}"
-        )
+        prob += _state_eq_row(p, transitions, pre, post, m, sigma, M0)
 
     # Deadlock constraints that ensure at least one input place of each transition is unmarked
     for t in transitions:
-        pre_places = list(pre[t].keys())
-        if not pre_places:
-            continue
-        prob += (
-            pulp.lpSum(m[p] for p in pre_places) <= len(pre_places) - 1,
-            f"deadlock_{t}"
-        )
+        row = _deadlock_row(t, pre, m)
+        if row is not None:
+            prob += row
+    return prob, _marking_var_names(m)
+
+
+def update_deadlock_model(saved, net, max_firing_bound=None):
+    """
+    saved: {"net": net_signature, "model": LpProblem.toDict()} of an earlier version.
+    Rebuilds only the rows of places / transitions touched by the edit
+    (incremental.diff_nets) and keeps every other row as saved; rows, variables
+    and objective come out in the order build_deadlock_model would use, so the
+    solver sees the same model as after a fresh build.
+    Returns (prob, {place_id: marking variable name}, {"rows_rebuilt": int, "rows_reused": int}).
+    """
+    import dataclasses
+    from src.incremental import diff_nets
+
+    places, transitions, pre, post = build_pre_post(net)
+    if max_firing_bound is None:
+        max_firing_bound = len(places)
+    diff = diff_nets(saved["net"], net)
+    dirty_p, dirty_t = set(diff["dirty_places"]), set(diff["dirty_transitions"])
+
+    model = dict(saved["model"])
+    old_rows = {c["name"]: c for c in model["constraints"]}
+    m, sigma = _model_vars(places, transitions, max_firing_bound)
+    M0 = {p["id"]: p["m0"] for p in net["places"]}
+
+    rows, rebuilt = [], 0
+    for p in places:
+        name = _row_name(f"state_eq_{p}")
+        if p in dirty_p or name not in old_rows:
+            rows.append(dataclasses.asdict(_state_eq_row(p, transitions, pre, post, m, sigma, M0).toDataclass()))
+            rebuilt += 1
+        else:
+            rows.append(old_rows[name])
+    for t in transitions:
+        name = _row_name(f"deadlock_{t}")
+        if t in dirty_t or (name not in old_rows and pre[t]):
+            row = _deadlock_row(t, pre, m)
+            if row is not None:
+                rows.append(dataclasses.asdict(row.toDataclass()))
+                rebuilt += 1
+        elif name in old_rows:
+            rows.append(old_rows[name])
+
+    # variables (bounds follow max_firing_bound) and objective are O(|P| + |T|)
+    variables = sorted(list(m.values()) + list(sigma.values()), key=lambda v: v.name)
+    model["variables"] = [dataclasses.asdict(v.toDataclass()) for v in variables]
+    model["objective"] = dict(model["objective"],
+                              coefficients=[{"name": sigma[t].name, "value": 1} for t in transitions])
+    model["constraints"] = rows
+    _, prob = pulp.LpProblem.fromDict(model)
+    return prob, _marking_var_names(m), {"rows_rebuilt": rebuilt, "rows_reused": len(rows) - rebuilt}
+
+
+def save_deadlock_model(path, prob, net, var_of):
+    from src.incremental import net_signature
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"format": "pn-ilp", "version": 1, "net": net_signature(net), "var_of": var_of,
+                   "model": prob.toDict()}, f, separators=(",", ":"))
+
+
+def load_deadlock_model(path):
+    """Saved model dict, or None if `path` does not hold one."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != "pn-ilp" or data.get("version") != 1:
+        return None
+    # files written before the mapping was stored: derive it the way pulp names variables
+    if "var_of" not in data:
+        data["var_of"] = {p["id"]: _row_name(f"m_{p['id']}") for p in data["net"]["places"]}
+    return data
+
+
+def solve_deadlock_ilp(net, max_firing_bound=None, solver_msg=True, model_path=None):
+    """
+    net: dict từ parser.parse_pnml + xử lý trong main.py
+    solver_msg: False silences the CBC log (it writes straight to the terminal)
+    model_path: keep the model in this file between runs. If it holds the model
+        of an earlier version of the net, only the edited rows are rebuilt
+        (update_deadlock_model); the model of this net is then saved there.
+    Return:
+        {
+          "status": str,
+          "deadlock_marking": dict | None,
+          "runtime_sec": float,
+          "num_vars": int,
+          "num_constraints": int,
+          "model": {"rows_rebuilt": int, "rows_reused": int}   # only with model_path
+        }
+    """
+    prof = get_profiler()
+    saved = load_deadlock_model(model_path) if model_path else None
+    with prof.span("ilp.build", incremental=saved is not None):
+        if saved is not None:
+            prob, var_of, model_info = update_deadlock_model(saved, net, max_firing_bound)
+        else:
+            prob, var_of = build_deadlock_model(net, max_firing_bound)
+            model_info = {"rows_rebuilt": prob.numConstraints(), "rows_reused": 0}
+    if model_path:
+        with prof.span("ilp.save_model"):
+            save_deadlock_model(model_path, prob, net, var_of)
 
     # --- Solve ILP ---
     start = time.time()
-    status = prob.solve()        
+    with prof.span("ilp.solve", num_vars=prob.numVariables()):
+        status = prob.solve(pulp.PULP_CBC_CMD(msg=solver_msg))
     end = time.time()
 
     status_str = pulp.LpStatus[status]
@@ -93,14 +215,17 @@ def solve_deadlock_ilp(net, max_firing_bound=None):
         "deadlock_marking": None,
         "runtime_sec": end - start,
         "num_vars": len(prob.variables()),
-        "num_constraints": len(prob.constraints),
+        "num_constraints": prob.numConstraints(),
     }
+    if model_path:
+        result["model"] = model_info
 
     if status_str not in ("Optimal", "Feasible"):
         return result
 
-    # Get marking
-    marking = {p: int(round(m[p].value())) for p in places}
+    # Get marking (a loaded model has its own variable objects: look them up by name)
+    values = {v.name: v.value() for v in prob.variables()}
+    marking = {p: int(round(values[name])) for p, name in var_of.items()}
     result["deadlock_marking"] = marking
 
     return result
@@ -0,0 +1,115 @@
+# incremental.py
+# Re-analysis of an edited net from results saved for an earlier version.
+#
+# Saved artifacts (Reach BDD dumps, the ILP model) carry the net they were
+# computed for (net_signature), and diff_nets compares it with the current one:
+#   "identical"  same places, m0, transitions and arcs
+#   "extension"  only new transitions with their arcs, plus new places that are
+#                empty in M0 and only touch new transitions. Old transitions
+#                behave exactly as before, so every old reachable marking (new
+#                places at 0) is still reachable and a fixed point can restart
+#                from the old Reach set.
+#   "other"      anything else (removed nodes, edited arcs of old transitions,
+#                changed m0): fixed points start again from M0.
+# Whatever the kind, the ILP model only rebuilds the rows of dirty places and
+# transitions (see ilp_deadlock.solve_deadlock_ilp).
+import os
+
+
+def net_signature(net):
+    """The part of a net the analyses depend on, small enough to store next to a result."""
+    return {
+        "places": [{"id": p["id"], "m0": int(p.get("m0", 0))} for p in net["places"]],
+        "transitions": [{"id": t["id"]} for t in net["transitions"]],
+        "arcs": [{"src": a["src"], "target": a["target"], "weight": a.get("weight", 1)} for a in net["arcs"]],
+    }
+
+
+def diff_nets(old, new):
+    """
+    old / new: nets (or net_signature dicts).
+    Returns:
+        {
+          "kind": "identical" | "extension" | "other",
+          "places_added": [...], "places_removed": [...], "m0_changed": [...],
+          "transitions_added": [...], "transitions_removed": [...],
+          "arcs_added": [[src, target], ...], "arcs_removed": [...], "weights_changed": [...],
+          "dirty_places": [...],       # state-equation rows to rebuild (new net order)
+          "dirty_transitions": [...]   # preset (deadlock) rows to rebuild (new net order)
+        }
+    """
+    old_m0 = {p["id"]: int(p.get("m0", 0)) for p in old["places"]}
+    new_m0 = {p["id"]: int(p.get("m0", 0)) for p in new["places"]}
+    old_t = [t["id"] for t in old["transitions"]]
+    new_t = [t["id"] for t in new["transitions"]]
+    old_arcs = {(a["src"], a["target"]): a.get("weight", 1) for a in old["arcs"]}
+    new_arcs = {(a["src"], a["target"]): a.get("weight", 1) for a in new["arcs"]}
+
+    places_added = [p for p in new_m0 if p not in old_m0]
+    old_t_set, new_t_set = set(old_t), set(new_t)
+    transitions_added = [t for t in new_t if t not in old_t_set]
+    arcs_added = [k for k in new_arcs if k not in old_arcs]
+    arcs_removed = [k for k in old_arcs if k not in new_arcs]
+    weights_changed = [k for k in new_arcs if k in old_arcs and new_arcs[k] != old_arcs[k]]
+    out = {
+        "places_added": places_added,
+        "places_removed": [p for p in old_m0 if p not in new_m0],
+        "m0_changed": [p for p in new_m0 if p in old_m0 and new_m0[p] != old_m0[p]],
+        "transitions_added": transitions_added,
+        "transitions_removed": [t for t in old_t if t not in new_t_set],
+        "arcs_added": [list(k) for k in arcs_added],
+        "arcs_removed": [list(k) for k in arcs_removed],
+        "weights_changed": [list(k) for k in weights_changed],
+    }
+
+    # rows whose coefficients or constant change
+    dirty_p, dirty_t = set(places_added) | set(out["m0_changed"]), set(transitions_added)
+    for src, tgt in arcs_added + arcs_removed + weights_changed:
+        if src in new_m0 or src in old_m0:
+            dirty_p.add(src)
+            dirty_t.add(tgt)   # input arc: the preset of tgt changed
+        else:
+            dirty_p.add(tgt)
+    out["dirty_places"] = [p for p in new_m0 if p in dirty_p]
+    out["dirty_transitions"] = [t for t in new_t if t in dirty_t]
+
+    added_t = set(transitions_added)
+    empty_new_places = all(new_m0[p] == 0 for p in places_added)
+    if not any(out[k] for k in out if k.endswith(("_added", "_removed", "_changed"))):
+        out["kind"] = "identical"
+    elif (not out["places_removed"] and not out["transitions_removed"] and not out["m0_changed"]
+          and not arcs_removed and not weights_changed and empty_new_places
+          and all(src in added_t or tgt in added_t for src, tgt in arcs_added)):
+        out["kind"] = "extension"
+    else:
+        out["kind"] = "other"
+    return out
+
+
+def restart_set(bdd, path, net, var_of):
+    """
+    Reach set saved at `path` (bdd_store dump carrying meta "net" and "var_of")
+    rebuilt in `bdd` as a starting set for the fixed point of `net`, with
+    places added since then forced to 0. None when there is no usable dump or
+    the edit is not "identical" / "extension".
+    var_of: {place: BDD variable of the current marking} of the caller.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    from src.bdd_store import load_bdds
+    found = {}
+
+    def accept(meta):
+        if "net" not in meta:
+            return False
+        found["diff"] = diff_nets(meta["net"], net)
+        return (found["diff"]["kind"] in ("identical", "extension")
+                and all(var_of.get(p) == v for p, v in meta.get("var_of", {}).items()))
+
+    _, roots, _ = load_bdds(path, bdd=bdd, accept=accept)
+    if roots is None or "reach" not in roots:
+        return None
+    S = roots["reach"]
+    for p in found["diff"]["places_added"]:
+        S = bdd.apply("and", S, bdd.apply("not", bdd.var(var_of[p])))
+    return S
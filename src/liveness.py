@@ -0,0 +1,290 @@
+# liveness.py
+# Transition liveness and terminal-SCC (livelock / deadlock) analysis.
+#
+# Levels reported per transition:
+#   "dead"       never fires from any reachable marking          (L0)
+#   "quasi-live" fires from some reachable marking, not live     (L1)
+#   "live"       can still fire eventually from every reachable
+#                marking, i.e. labels an edge inside every
+#                terminal SCC                                    (L4)
+#   "unknown"    labels an edge inside every terminal SCC found, but
+#                the symbolic enumeration stopped before finding
+#                them all (max_terminal_sccs)
+#
+# Terminal SCC kinds:
+#   "deadlock"   a single marking with no successor
+#   "livelock"   a closed cycle that is not the only terminal SCC, or from
+#                which some transition that fires on a cycle elsewhere in
+#                the state space can never fire again
+#   "home"       the only terminal SCC, keeping every transition that fires
+#                on some cycle enabled forever (one-shot transitions such
+#                as a start step leading into it do not count)
+import time
+from src.profiling import get_profiler
+
+
+# 1) EXPLICIT MODE (reachability graph from bfs.py)
+
+def strongly_connected_components(graph):
+    """
+    Iterative Tarjan over a ReachabilityGraph.
+    Returns (comp, num_comps) with comp[i] the SCC id of state i. Ids come
+    out in reverse topological order (successor SCCs get smaller ids).
+    """
+    n = graph.num_states
+    offsets = memoryview(graph.offsets)
+    targets = memoryview(graph.targets)
+
+    index = [-1] * n
+    low = [0] * n
+    comp = [-1] * n
+    on_stack = [False] * n
+    stack = []
+    counter = 0
+    num_comps = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work_v = [root]
+        work_e = [offsets[root]]
+
+        while work_v:
+            v = work_v[-1]
+            e = work_e[-1]
+            if e < offsets[v + 1]:
+                work_e[-1] = e + 1
+                w = targets[e]
+                if index[w] < 0:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work_v.append(w)
+                    work_e.append(offsets[w])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work_v.pop()
+            work_e.pop()
+            if work_v:
+                u = work_v[-1]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = num_comps
+                    if w == v:
+                        break
+                num_comps += 1
+
+    return comp, num_comps
+
+
+def _classify(transition_ids, fired, terminal_info, truncated=False, recurrent=()):
+    """
+    Shared by explicit and symbolic modes.
+    truncated: terminal_info misses some terminal SCCs, so "live" cannot be decided.
+    recurrent: transitions labelling an edge inside some SCC (i.e. firing on a
+        cycle); only those outside the terminal SCC matter.
+    """
+    quasi = {t for t, f in zip(transition_ids, fired) if f}
+    levels = {}
+    for t in transition_ids:
+        if t not in quasi:
+            levels[t] = "dead"
+        elif all(t in info["transitions"] for info in terminal_info):
+            levels[t] = "unknown" if truncated else "live"
+        else:
+            levels[t] = "quasi-live"
+
+    several = truncated or len(terminal_info) > 1
+    for info in terminal_info:
+        if info["kind"] is None:
+            lost = any(t not in info["transitions"] for t in recurrent)
+            info["kind"] = "livelock" if several or lost else "home"
+        info["transitions"] = sorted(info["transitions"])
+    return levels
+
+
+def analyze_liveness(graph, markings=None):
+    """
+    One linear pass over a ReachabilityGraph (bfs_reachable_markings_with_depth(..., build_graph=True)).
+    markings: optional list from the same BFS, used to report a representative marking per terminal SCC.
+    """
+    start = time.time()
+    prof = get_profiler()
+    with prof.span("liveness.scc"):
+        comp, num_comps = strongly_connected_components(graph)
+
+    offsets = memoryview(graph.offsets)
+    targets = memoryview(graph.targets)
+    trans = memoryview(graph.transitions)
+    T = len(graph.transition_ids)
+
+    terminal = [True] * num_comps
+    size = [0] * num_comps
+    rep = [-1] * num_comps
+    internal_edges = [0] * num_comps
+    fired = [False] * T
+    recurrent = [False] * T
+    with prof.span("liveness.edges"):
+        for u in range(graph.num_states):
+            cu = comp[u]
+            size[cu] += 1
+            if rep[cu] < 0:
+                rep[cu] = u
+            for e in range(offsets[u], offsets[u + 1]):
+                fired[trans[e]] = True
+                if comp[targets[e]] != cu:
+                    terminal[cu] = False
+                else:
+                    internal_edges[cu] += 1
+                    recurrent[trans[e]] = True
+
+        # all edges of a terminal SCC stay inside it
+        in_terminal = {}
+        for u in range(graph.num_states):
+            cu = comp[u]
+            if terminal[cu]:
+                labels = in_terminal.setdefault(cu, set())
+                for e in range(offsets[u], offsets[u + 1]):
+                    labels.add(graph.transition_ids[trans[e]])
+
+    terminal_info = []
+    for c in sorted(in_terminal):
+        info = {
+            "kind": "deadlock" if internal_edges[c] == 0 else None,
+            "size": size[c],
+            "representative_state": rep[c],
+            "transitions": in_terminal[c],
+        }
+        if markings is not None:
+            info["representative_marking"] = markings[rep[c]]
+        terminal_info.append(info)
+
+    recurrent = [t for t, r in zip(graph.transition_ids, recurrent) if r]
+    levels = _classify(graph.transition_ids, fired, terminal_info, recurrent=recurrent)
+    return {
+        "mode": "EXPLICIT",
+        "num_states": graph.num_states,
+        "num_edges": graph.num_edges,
+        "num_sccs": num_comps,
+        "terminal_sccs": terminal_info,
+        "terminal_sccs_truncated": False,
+        "transitions": levels,
+        "has_deadlock": any(i["kind"] == "deadlock" for i in terminal_info),
+        "has_livelock": any(i["kind"] == "livelock" for i in terminal_info),
+        # reversible <=> M0 can always be reached again <=> one terminal SCC, containing M0
+        "reversible": len(terminal_info) == 1 and graph.num_states > 0 and terminal[comp[0]],
+        "runtime_sec": time.time() - start,
+    }
+
+
+def explicit_liveness(net):
+    from src.bfs import bfs_reachable_markings_with_depth
+    res = bfs_reachable_markings_with_depth(net, build_graph=True)
+    return analyze_liveness(res["graph"], res["markings"])
+
+
+# 2) SYMBOLIC MODE (1-safe nets, BDD Reach set)
+
+def symbolic_liveness(net, solver=None, max_terminal_sccs=1000):
+    """
+    Same report from the BDD Reach set, without an explicit graph.
+    Terminal (bottom) SCCs are peeled off one at a time: pick s in the
+    remaining set R, F = post*(s); if F ⊆ pre*(s), F is a terminal SCC.
+    Either way no state of pre*(s) \\ F lies in another terminal SCC,
+    so R := R \\ pre*(s).
+    max_terminal_sccs: stop peeling after this many terminal SCCs. The result
+    then has terminal_sccs_truncated=True, transitions in every SCC found are
+    "unknown" rather than "live", and has_livelock is a lower bound (True is
+    certain, False only means no livelock among the SCCs found).
+    """
+    from src.bdd_deadlock import _BDDSolver
+    start = time.time()
+    prof = get_profiler()
+    s = solver if solver is not None else _BDDSolver(net)
+    bdd = s.bdd
+    n_places = len(s.places)
+
+    with prof.span("liveness_bdd.reachable"):
+        Reach = s.reachable()
+
+    def forward(X):
+        R = X
+        while True:
+            new = bdd.apply("and", s.image(R), bdd.apply("not", R))
+            if new == bdd.false:
+                return R
+            R = bdd.apply("or", R, new)
+
+    def backward(X):
+        R = X
+        while True:
+            new = bdd.apply("and", bdd.apply("and", s.pre_image(R), Reach), bdd.apply("not", R))
+            if new == bdd.false:
+                return R
+            R = bdd.apply("or", R, new)
+
+    fired = [bdd.apply("and", Reach, s.enabled_t[t]) != bdd.false for t in s.transitions]
+    can_move = s.pre_image(bdd.true)
+    care = set(s.vars.values())
+
+    terminal_info = []
+    remaining = Reach
+    with prof.span("liveness_bdd.bottom_sccs"):
+        while remaining != bdd.false and len(terminal_info) < max_terminal_sccs:
+            pick = next(bdd.pick_iter(remaining, care_vars=care))
+            state = bdd.cube({v: bool(pick.get(v, False)) for v in care})
+            F = forward(state)
+            B = backward(state)
+            if bdd.apply("and", F, bdd.apply("not", B)) == bdd.false:
+                moves = bdd.apply("and", F, can_move) != bdd.false
+                terminal_info.append({
+                    "kind": None if moves else "deadlock",
+                    "size": int(F.count(n_places)),
+                    "representative_marking": {p: int(pick.get(s.vars[p], False)) for p in s.places},
+                    "transitions": {t for t in s.transitions
+                                    if bdd.apply("and", F, s.enabled_t[t]) != bdd.false},
+                })
+            remaining = bdd.apply("and", remaining, bdd.apply("not", B))
+
+    def on_cycle(t):
+        # greatest fixed point: states from which t can fire infinitely often
+        Z = Reach
+        while True:
+            Z_next = backward(bdd.apply("and", s.pre_image(Z, [t]), Reach))
+            if Z_next == Z:
+                return Z != bdd.false
+            Z = Z_next
+
+    truncated = remaining != bdd.false
+    recurrent = []
+    if not truncated and len(terminal_info) == 1 and terminal_info[0]["kind"] is None:
+        # only a transition missing from the single terminal SCC can make it a livelock
+        with prof.span("liveness_bdd.recurrent"):
+            outside = [t for t, f in zip(s.transitions, fired)
+                       if f and t not in terminal_info[0]["transitions"]]
+            recurrent = next(([t] for t in outside if on_cycle(t)), [])
+    levels = _classify(s.transitions, fired, terminal_info, truncated, recurrent)
+    init = s.initial_node()
+    return {
+        "mode": "BDD",
+        "num_states": int(Reach.count(n_places)),
+        "num_sccs": None,
+        "terminal_sccs": terminal_info,
+        "terminal_sccs_truncated": truncated,
+        "transitions": levels,
+        "has_deadlock": bdd.apply("and", Reach, bdd.apply("not", can_move)) != bdd.false,
+        "has_livelock": any(i["kind"] == "livelock" for i in terminal_info),
+        "reversible": backward(init) == Reach,
+        "runtime_sec": time.time() - start,
+    }
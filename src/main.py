@@ -1,36 +1,209 @@
+import os
 import sys
+import io
 import json
 import csv
 import time
+import argparse
+import contextlib
 from src.parser import parse_pnml
-from rich import print_json
-from rich.console import Console
 from pathlib import Path
 
-from src.transition import enabled, fire
-from src.bfs import bfs_reachable_markings_with_depth
-from src.bdd_reachability import run_symbolic_reachability
-from src.ilp_deadlock import solve_deadlock_ilp
-from src.bdd_deadlock import solve_deadlock_bdd
-from src.reachable_marking_optimization import optimize_over_reachable
+from src.profiling import enable_profiling, disable_profiling, get_profiler
+
+# Heavy engines (rich, dd, pympler, pulp) are imported inside the stage that
+# needs them, so `--stages parse,bfs` never pays for loading them.
+STAGES = ["parse", "simulate", "bfs", "opt", "bdd", "deadlock-bdd", "deadlock-ilp", "liveness", "liveness-bdd", "ctl",
+          "query", "query-bdd", "bitstate"]
+STAGE_DEPENDS = {"opt": ["bfs"], "liveness": ["bfs"], "query": ["bfs"]}
+# approximate / alternative engines, and analyses that recompute the state space
+# (liveness needs the full graph, liveness-bdd a third Reach), only run when named in --stages
+OPT_IN_STAGES = {"bitstate", "liveness", "liveness-bdd"}
+# why consumers of the explicit reachable set stand down under symmetry reduction
+SYMMETRY_SKIP = "the BFS holds one marking per symmetry orbit; pass --symmetry-expand for the full reachable set"
+
+class Output:
+    """Console wrapper: rich when interactive, silent in --quiet mode."""
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.console = None
+        if not quiet:
+            from rich.console import Console
+            self.console = Console()
+
+    def print(self, *args):
+        if self.console is not None:
+            self.console.print(*args)
+
+    def engine_output(self):
+        # engines print progress with plain print(); keep stdout clean for JSON
+        if self.quiet:
+            return contextlib.redirect_stdout(io.StringIO())
+        return contextlib.nullcontext()
+
+def emit_json(obj):
+    """Print one compact JSON line for --quiet; exit quietly if the reader has gone away."""
+    try:
+        print(json.dumps(obj, separators=(",", ":")), flush=True)
+    except BrokenPipeError:
+        # e.g. `| head -1`: point stdout at devnull so the interpreter's final flush stays silent
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
 
-console = Console()
+def parse_stages(text):
+    stages = [s.strip() for s in text.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    selected = set(stages) | {"parse"}
+    for s in list(selected):
+        selected.update(STAGE_DEPENDS.get(s, []))
+    return selected
+
+def parse_assignment(text):
+    name, sep, value = text.rpartition("=")
+    try:
+        if not sep or not name:
+            raise ValueError
+        return name, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected TRANSITION=NUMBER, got {text!r}")
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Petri net analysis pipeline")
+    ap.add_argument("pnml", nargs="+", help="PNML file(s) to analyze")
+    ap.add_argument("--stages", type=parse_stages, default=set(STAGES) - OPT_IN_STAGES,
+                    help=f"comma-separated subset of: {','.join(STAGES)} "
+                         f"(default: all but {','.join(sorted(OPT_IN_STAGES))}; parse always runs)")
+    ap.add_argument("-q", "--quiet", action="store_true",
+                    help="no console rendering; print one JSON stats line per input on stdout")
+    ap.add_argument("--reach-format", choices=["csv", "rbin", "both"], default="csv",
+                    help="reachable set output: text CSV, compact binary .rbin, or both")
+    ap.add_argument("--save-bdd", action="store_true",
+                    help="dump Reach/frontier (bdd) and Reach/dead (deadlock-bdd) BDDs to <name>_*_bdd.json")
+    ap.add_argument("--save-graph", action="store_true",
+                    help="record reachability graph edges during BFS and save them as CSR arrays to <name>_graph.npz")
+    ap.add_argument("--ctl", action="append", default=[], metavar="FORMULA",
+                    help="CTL property to check (repeatable), e.g. 'AG(Line1_Buf -> AF Collector)'")
+    ap.add_argument("--ctl-file", help="file with one CTL property per line (# comments allowed)")
+    ap.add_argument("--query", action="append", default=[], metavar="PREDICATE",
+                    help="state predicate to evaluate (repeatable), e.g. 'Line1_QC & Line2_QC' or 'enabled(T_Collect)'")
+    ap.add_argument("--query-file", help="file with one predicate per line (# comments allowed)")
+    ap.add_argument("--max-states", type=int, metavar="N",
+                    help="stop explicit exploration (bfs, explicit deadlock search) after N markings")
+    ap.add_argument("--max-depth", type=int, metavar="D",
+                    help="do not expand markings at BFS depth D")
+    ap.add_argument("--time-limit", type=float, metavar="SEC",
+                    help="wall-clock limit per explicit exploration")
+    ap.add_argument("--max-memory", type=float, metavar="MB",
+                    help="stop explicit exploration once the process RSS exceeds MB")
+    ap.add_argument("--checkpoint-every", type=float, metavar="SEC",
+                    help="checkpoint explicit explorations to <name>_bfs.ckpt / <name>_deadlock.ckpt every SEC seconds")
+    ap.add_argument("--resume", action="store_true",
+                    help="continue explicit explorations from existing checkpoints")
+    ap.add_argument("--symmetry", action="store_true",
+                    help="detect replicated components from numbered ids (Line1_*, Line2_*, ...) and store one "
+                         "marking per orbit in bfs / explicit deadlock search")
+    ap.add_argument("--symmetry-group", action="append", default=[], metavar="REGEX[,REGEX...]",
+                    type=lambda text: [p.strip() for p in text.split(",") if p.strip()],
+                    help="declared replica family (repeatable): regexes whose first group is the replica number, "
+                         r"e.g. 'Line(\d+)_.*,T(\d+)_.*'; implies --symmetry")
+    ap.add_argument("--symmetry-expand", action="store_true",
+                    help="expand reduced BFS results back to all concrete markings before writing them")
+    ap.add_argument("--walks", type=int, default=0, metavar="N",
+                    help="simulate stage: also run N random walks as NumPy batches (default 0: "
+                         "only fire each enabled transition of M0 once)")
+    ap.add_argument("--walk-steps", type=int, default=1000, metavar="N",
+                    help="simulate stage: maximum firings per walk")
+    ap.add_argument("--seed", type=int, help="simulate stage: RNG seed (reproducible walks)")
+    ap.add_argument("--sim-processes", type=int, default=1, metavar="N",
+                    help="simulate stage: split the walks across N worker processes")
+    ap.add_argument("--sim-weight", type=parse_assignment, action="append", default=[], metavar="T=W",
+                    help="simulate stage: relative choice weight of transition T (repeatable, default 1)")
+    ap.add_argument("--sim-priority", type=parse_assignment, action="append", default=[], metavar="T=P",
+                    help="simulate stage: only enabled transitions of highest priority may fire (default 0)")
+    ap.add_argument("--bitstate-store", choices=["bitstate", "hashcompact"], default="bitstate",
+                    help="visited set of the bitstate stage: k-hash bit array or 64-bit state hashes")
+    ap.add_argument("--bitstate-bits", type=int, default=27, metavar="LOG2",
+                    help="bit array size 2^LOG2 for --bitstate-store bitstate (default 27 = 16 MiB)")
+    ap.add_argument("--bitstate-hashes", type=int, default=3, metavar="K",
+                    help="bit positions per marking for --bitstate-store bitstate")
+    ap.add_argument("--bitstate-queue", type=int, default=1 << 20, metavar="N",
+                    help="most markings held in the bitstate BFS queue; further successors are dropped "
+                         "and the run is reported incomplete (default 1048576)")
+    ap.add_argument("--bitstate-traces", action="store_true",
+                    help="keep a 6-byte parent pointer per stored marking so bitstate deadlocks come with "
+                         "a replayed firing sequence")
+    ap.add_argument("--incremental", action="store_true",
+                    help="reuse results saved by an earlier run on an edited version of the same file: bdd / "
+                         "deadlock-bdd restart from the saved Reach set when only transitions were added, "
+                         "deadlock-ilp rebuilds only the edited rows of <name>_ilp_model.json (implies --save-bdd)")
+    ap.add_argument("--show-net", action="store_true",
+                    help="pretty-print the parsed net (can be huge for large nets)")
+    ap.add_argument("--profile", action="store_true",
+                    help="record per-stage spans/counters and write <name>_trace.json (Chrome trace format)")
+    ap.add_argument("--tracemalloc", action="store_true",
+                    help="with --profile, also trace Python allocations (slows allocation-heavy stages "
+                         "several times over; the default samples RSS only)")
+    return ap.parse_args(argv)
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python3 src/main.py <pnml_file>")
+        print("Usage: python3 src/main.py [--stages parse,bfs,...] [--quiet] [--profile] <pnml_file> ...")
         sys.exit(1)
-   
-    for pnml_path in sys.argv[1:]:
+    args = parse_args(sys.argv[1:])
+    stages = args.stages
+    ctl_formulas = list(args.ctl)
+    if args.ctl_file:
+        with open(args.ctl_file, encoding="utf-8") as f:
+            ctl_formulas += [l.strip() for l in f if l.strip() and not l.lstrip().startswith("#")]
+    queries = list(args.query)
+    if args.query_file:
+        with open(args.query_file, encoding="utf-8") as f:
+            queries += [l.strip() for l in f if l.strip() and not l.lstrip().startswith("#")]
+    out = Output(quiet=args.quiet)
+    failed = False
+
+    def make_budget():
+        if all(v is None for v in (args.max_states, args.max_depth, args.time_limit, args.max_memory)):
+            return None
+        from src.exploration import Budget
+        return Budget(max_states=args.max_states, max_depth=args.max_depth, max_seconds=args.time_limit,
+                      max_memory_bytes=int(args.max_memory * 1024 * 1024) if args.max_memory else None)
+
+    def make_checkpointer(path):
+        if args.checkpoint_every is None and not args.resume:
+            return None
+        from src.exploration import Checkpointer
+        return Checkpointer(path, every_seconds=args.checkpoint_every)
+
+    for pnml_path in args.pnml:
         pnml_file = Path(pnml_path)
         base_name = pnml_file.stem
         output_json = pnml_file.with_name(f"{base_name}_net.json")
         output_csv = pnml_file.with_name(f"{base_name}_reachability.csv")
+        output_rbin = pnml_file.with_name(f"{base_name}_reachability.rbin")
         output_stats = pnml_file.with_name(f"{base_name}_stats.json")
-        
-        console.print(f"\n[bold green]Processing:[/bold green] {pnml_file}")
+        output_trace = pnml_file.with_name(f"{base_name}_trace.json")
+        output_reach_bdd = pnml_file.with_name(f"{base_name}_reach_bdd.json")
+        output_dead_bdd = pnml_file.with_name(f"{base_name}_deadlock_bdd.json")
+        output_graph = pnml_file.with_name(f"{base_name}_graph.npz")
+        output_bfs_ckpt = pnml_file.with_name(f"{base_name}_bfs.ckpt")
+        output_dead_ckpt = pnml_file.with_name(f"{base_name}_deadlock.ckpt")
+        output_ilp_model = pnml_file.with_name(f"{base_name}_ilp_model.json")
+        # the saved BDDs are the starting point of the next incremental run
+        save_bdd = args.save_bdd or args.incremental
+
+        if args.profile:
+            enable_profiling(trace_memory=args.tracemalloc)
+        prof = get_profiler()
+
+        out.print(f"\n[bold green]Processing:[/bold green] {pnml_file}")
         try:
-            result = parse_pnml(str(pnml_file))
+            with prof.span("parse"), out.engine_output():
+                result = parse_pnml(str(pnml_file))
 
             # --- RENAME 'ins' → 'weight' ---
             for arc in result["arcs"]:
@@ -46,189 +219,517 @@ def main():
                     place["m0"] = place.get("m0", 0)
             result["M0"] = [p["m0"] for p in result["places"]]
 
-            print_json(data=result)
-            with open(output_json, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
-            console.print(f"[bold blue]Exported Petri net to:[/bold blue] {output_json}")
-
-            # --- Simulate fire ---
-            marking = {p["id"]: p["m0"] for p in result["places"]}
-            for t in result["transitions"]:
-                transition = t["id"]
-                if enabled(result["transitions"], result["places"], result["arcs"], marking, transition):
-                    print(f"Transition {transition} is enabled.")
-                    new_marking = fire(result["transitions"], result["places"], result["arcs"], marking, transition)
-                    print("New marking after firing:", new_marking)
-                else:
-                    print(f"Transition {transition} is not enabled.")
-
-            # --- BFS với đo thời gian, depth, số trạng thái ---
-            console.print("\n[bold yellow]Running BFS to find all reachable markings...[/bold yellow]")
-            start_time = time.time()
+            if args.show_net and not args.quiet:
+                from rich import print_json
+                print_json(data=result)
 
-            # Gọi BFS với depth tracking
-            reachable_with_depth = bfs_reachable_markings_with_depth(result)
-            reachable_markings = reachable_with_depth["markings"]  # list dict
-            depth_map = reachable_with_depth["depth"]              # dict: marking_str -> depth
+            # --- Incremental: what changed since the previous run on this file ---
+            net_diff = None
+            if args.incremental and output_json.exists():
+                from src.incremental import diff_nets
+                with open(output_json, encoding="utf-8") as f:
+                    net_diff = diff_nets(json.load(f), result)
+                changes = {k: len(v) for k, v in net_diff.items() if k != "kind" and not k.startswith("dirty_")}
+                out.print(f"[bold blue]Changes since the previous run:[/bold blue] {net_diff['kind']} "
+                          f"({', '.join(f'{k}={v}' for k, v in changes.items() if v) or 'none'})")
 
-            end_time = time.time()
-            bfs_time = end_time - start_time
-            num_states = len(reachable_markings)
+            with open(output_json, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            out.print(f"[bold blue]Exported Petri net to:[/bold blue] {output_json}")
 
-            # --- Optimization over reachable markings ---
-            console.print("\n[bold yellow]Running optimization over reachable markings (Task 5)...[/bold yellow]")
-
-            weights = {p["id"]: 1 for p in result["places"]}
-            for p in result["places"]:
-                pid = p["id"].lower()
-                #print(pid)
-                if "collector" in pid or "end" in pid or "qc" in pid:
-                    weights[p["id"]] = 5
-                else:
-                    weights[p["id"]] = 1
-
-            opt_result = optimize_over_reachable(result, reachable_markings, weights)
-
-            console.print(f"[bold white]Optimization status:[/bold white] {opt_result['status']}")
-            if opt_result["status"] == "OPTIMAL":
-                console.print(f"  • Best objective value: {opt_result['best_value']}")
-                console.print(f"  • Best marking:")
-                console.print(f"    {opt_result['best_marking']}")
-                console.print(f"  • Optimization runtime: {opt_result['runtime_sec']:.6f}s")
-            else:
-                console.print("[bold red]No reachable state found for optimization.[/bold red]")
-
-
-            # --- Lưu CSV: trạng thái + depth ---
-            with open(output_csv, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["State_ID", "Depth"] + [p["id"] for p in result["places"]])
-                for i, mark in enumerate(reachable_markings):
-                    state_id = f"S{i}"
-                    depth = depth_map.get(json.dumps(mark, sort_keys=True), 0)
-                    row = [state_id, depth] + [mark.get(p["id"], 0) for p in result["places"]]
-                    writer.writerow(row)
-            console.print(f"[bold cyan]Saved reachability graph to:[/bold cyan] {output_csv}")
-
-            # --- Lưu stats JSON (dùng cho so sánh BDD) ---
             stats = {
                 "file": str(pnml_file),
                 "num_places": len(result["places"]),
                 "num_transitions": len(result["transitions"]),
                 "num_arcs": len(result["arcs"]),
                 "initial_marking": result["M0"],
-                "bfs": {
+            }
+            if net_diff is not None:
+                stats["incremental"] = {"kind": net_diff["kind"], **changes}
+
+            # --- Symmetry (replicated components) ---
+            symmetry = None
+            reduced = False   # BFS markings are orbit representatives, not the reachable set
+            if args.symmetry or args.symmetry_group:
+                from src.symmetry import Symmetry
+                with prof.span("symmetry"):
+                    symmetry = Symmetry.detect(result, patterns=args.symmetry_group or None)
+                stats["symmetry"] = symmetry.describe()
+                if symmetry:
+                    for fam in stats["symmetry"]:
+                        out.print(f"[bold blue]Symmetry:[/bold blue] {fam['replicas']} replicas ({fam['kind']}) "
+                                  f"of {', '.join(fam['templates'])}")
+                else:
+                    out.print("[bold blue]Symmetry:[/bold blue] no replicated components found")
+                    symmetry = None
+
+            # --- Simulate fire ---
+            if "simulate" in stages:
+                from src.transition import enabled, fire
+                marking = {p["id"]: p["m0"] for p in result["places"]}
+                with prof.span("simulate_fire"):
+                    for t in result["transitions"]:
+                        transition = t["id"]
+                        if enabled(result["transitions"], result["places"], result["arcs"], marking, transition):
+                            out.print(f"Transition {transition} is enabled.")
+                            new_marking = fire(result["transitions"], result["places"], result["arcs"], marking, transition)
+                            out.print("New marking after firing:", new_marking)
+                        else:
+                            out.print(f"Transition {transition} is not enabled.")
+
+            # --- Random walks (opt-in: --walks N) ---
+            if "simulate" in stages and args.walks > 0:
+                from src.simulation import simulate_random_walks
+                out.print(f"\n[bold yellow]Running {args.walks} random walks (≤ {args.walk_steps} steps)...[/bold yellow]")
+                with prof.span("simulate_walks"):
+                    walks = simulate_random_walks(result, num_walks=args.walks, max_steps=args.walk_steps,
+                                                  seed=args.seed, weights=dict(args.sim_weight) or None,
+                                                  priorities=dict(args.sim_priority) or None,
+                                                  processes=args.sim_processes, max_deadlocks=5)
+
+                out.print(f"  • deadlock hits: {walks['deadlock_hits']} / {walks['num_walks']} walks "
+                          f"({len(walks['deadlocks'])} distinct dead markings)")
+                out.print(f"  • walk length: mean {walks['mean_length']:.1f}, max {walks['max_length']}")
+                out.print(f"  • runtime: {walks['runtime_sec']:.6f}s")
+                for d in walks["deadlocks"]:
+                    out.print(f"    deadlock after {d['steps']} steps ({d['hits']} hits): {d['marking']}")
+                    out.print(f"      trace: {' -> '.join(d['trace']) or '(initial marking)'}")
+
+                stats["simulate"] = {k: walks[k] for k in (
+                    "num_walks", "max_steps", "seed", "deadlock_hits", "deadlock_rate", "deadlocks",
+                    "mean_length", "max_length", "occupancy", "firing_counts")}
+                stats["simulate"]["longest"] = [{k: v for k, v in w.items() if k != "trace"} for w in walks["longest"]]
+                stats["simulate"]["runtime_sec"] = round(walks["runtime_sec"], 6)
+
+            # --- BFS với đo thời gian, depth, số trạng thái ---
+            if "bfs" in stages:
+                from src.bfs import bfs_reachable_markings_with_depth
+                out.print("\n[bold yellow]Running BFS to find all reachable markings...[/bold yellow]")
+                start_time = time.time()
+
+                # Gọi BFS với depth tracking
+                with prof.span("bfs") as span:
+                    # the reduced (quotient) state space has no per-transition edge labels
+                    build_graph = (args.save_graph or "liveness" in stages) and symmetry is None
+                    reachable_with_depth = bfs_reachable_markings_with_depth(
+                        result, build_graph=build_graph, budget=make_budget(),
+                        checkpoint=make_checkpointer(output_bfs_ckpt), resume=args.resume,
+                        symmetry=symmetry)
+                    reachable_markings = reachable_with_depth["markings"]  # list dict
+                    depths = reachable_with_depth["depths"]                # depth of reachable_markings[i]
+                    if symmetry is not None and args.symmetry_expand:
+                        from src.symmetry import expand_markings
+                        reachable_markings, depths = expand_markings(reachable_markings, depths, symmetry)
+
+                    reduced = symmetry is not None and not args.symmetry_expand
+
+                    end_time = time.time()
+                    bfs_time = end_time - start_time
+                    num_states = len(reachable_markings)
+                    if symmetry is not None:
+                        num_states = reachable_with_depth["num_concrete_states"]
+                    span.set(states=num_states)
+
+                # representatives are not the reachable set: do not write them as if they were
+                if reduced:
+                    stats.setdefault("skipped", {})["reachability_files"] = SYMMETRY_SKIP
+                    out.print(f"[bold red]Reachable-set files not written: {SYMMETRY_SKIP}.[/bold red]")
+
+                # --- Lưu CSV: trạng thái + depth ---
+                if args.reach_format in ("csv", "both") and not reduced:
+                    with prof.span("write_csv"), open(output_csv, "w", newline="", encoding="utf-8") as f:
+                        writer = csv.writer(f)
+                        writer.writerow(["State_ID", "Depth"] + [p["id"] for p in result["places"]])
+                        for i, (mark, depth) in enumerate(zip(reachable_markings, depths)):
+                            state_id = f"S{i}"
+                            row = [state_id, depth] + [mark.get(p["id"], 0) for p in result["places"]]
+                            writer.writerow(row)
+                    out.print(f"[bold cyan]Saved reachability graph to:[/bold cyan] {output_csv}")
+
+                # --- Binary .rbin (bit-packed rows + depth column) ---
+                if args.reach_format in ("rbin", "both") and not reduced:
+                    from src.reachability_store import markings_to_arrays, write_reachability
+                    with prof.span("write_rbin"):
+                        place_ids = [p["id"] for p in result["places"]]
+                        states_arr, depth_arr = markings_to_arrays(place_ids, reachable_markings, depths)
+                        write_reachability(output_rbin, place_ids, states_arr, depth_arr)
+                    out.print(f"[bold cyan]Saved binary reachable set to:[/bold cyan] {output_rbin}")
+
+                stats["bfs"] = {
                     "num_reachable_states": num_states,
                     "execution_time_sec": round(bfs_time, 6),
-                    "max_depth": max(depth_map.values()) if depth_map else 0
+                    "max_depth": max(depths, default=0),
+                    "complete": reachable_with_depth["complete"],
                 }
-            }
+                if symmetry is not None:
+                    stats["bfs"]["num_orbits"] = len(reachable_with_depth["markings"])
+                    stats["bfs"]["num_concrete_states"] = reachable_with_depth["num_concrete_states"]
+                    stats["bfs"]["expanded"] = args.symmetry_expand
+                    out.print(f"  • {len(reachable_with_depth['markings'])} orbits stand for "
+                              f"{reachable_with_depth['num_concrete_states']} concrete markings")
+                    if args.save_graph:
+                        out.print("[bold red]--save-graph is not available with symmetry reduction.[/bold red]")
+                if not reachable_with_depth["complete"]:
+                    stats["bfs"]["stop_reason"] = reachable_with_depth["stop_reason"]
+                    out.print(f"[bold red]BFS stopped early ({reachable_with_depth['stop_reason']}); "
+                              f"results below cover a partial state space.[/bold red]")
+                    if args.checkpoint_every is not None or args.resume:
+                        out.print(f"[bold cyan]Checkpoint saved to:[/bold cyan] {output_bfs_ckpt}")
+
+                if build_graph:
+                    graph = reachable_with_depth["graph"]
+                    stats["bfs"]["num_edges"] = graph.num_edges
+                    stats["bfs"]["graph_bytes"] = graph.nbytes()
+                if build_graph and args.save_graph:
+                    with prof.span("write_graph"):
+                        graph.save(output_graph)
+                    out.print(f"[bold cyan]Saved reachability graph edges to:[/bold cyan] {output_graph}")
+
+            # --- Optimization over reachable markings ---
+            if "opt" in stages and reduced:
+                stats.setdefault("skipped", {})["opt"] = SYMMETRY_SKIP
+                out.print(f"\n[bold red]Optimization skipped: {SYMMETRY_SKIP}.[/bold red]")
+            elif "opt" in stages:
+                from src.reachable_marking_optimization import optimize_over_reachable
+                out.print("\n[bold yellow]Running optimization over reachable markings (Task 5)...[/bold yellow]")
+
+                weights = {p["id"]: 1 for p in result["places"]}
+                for p in result["places"]:
+                    pid = p["id"].lower()
+                    #print(pid)
+                    if "collector" in pid or "end" in pid or "qc" in pid:
+                        weights[p["id"]] = 5
+                    else:
+                        weights[p["id"]] = 1
+
+                with prof.span("optimization"):
+                    opt_result = optimize_over_reachable(result, reachable_markings, weights)
+
+                out.print(f"[bold white]Optimization status:[/bold white] {opt_result['status']}")
+                if opt_result["status"] == "OPTIMAL":
+                    out.print(f"  • Best objective value: {opt_result['best_value']}")
+                    out.print(f"  • Best marking:")
+                    out.print(f"    {opt_result['best_marking']}")
+                    out.print(f"  • Optimization runtime: {opt_result['runtime_sec']:.6f}s")
+                else:
+                    out.print("[bold red]No reachable state found for optimization.[/bold red]")
+
+                stats["opt"] = {
+                    "status": opt_result["status"],
+                    "objective_weights": weights,
+                    "best_value": opt_result["best_value"],
+                    "best_marking": opt_result["best_marking"],
+                    "runtime_sec": round(opt_result["runtime_sec"], 6),
+                    "num_states": opt_result["num_states"]
+                }
+
             # --- Run BDD symbolic reachability after BFS ---
-            console.print("\n[bold yellow]Running BDD symbolic reachability...[/bold yellow]")
-            start_bdd = time.time()
-            #total_bdd, bdd_mem = run_symbolic_reachability(result, str(pnml_file))
-            bdd_result = run_symbolic_reachability(result, str(pnml_file), csv_file=str(output_csv))
-            end_bdd = time.time()
-            bdd_time = end_bdd - start_bdd
-
-                        # --- BDD-based Deadlock detection ---
-            console.print("\n[bold yellow]Running BDD-based deadlock detection...[/bold yellow]")
-
-            bdd_deadlock = solve_deadlock_bdd(result, sample_limit=5)
-
-            console.print(f"[bold white]BDD-deadlock status:[/bold white] {bdd_deadlock['status']}")
-            console.print(f"  • mode: {bdd_deadlock['mode']}")
-            console.print(f"  • runtime: {bdd_deadlock['runtime_sec']:.6f}s")
-            console.print(f"  • reachable states (est): {bdd_deadlock['reachable_states_est']}")
-            console.print(f"  • BDD nodes (if BDD mode): {bdd_deadlock['bdd_nodes']}")
-
-            if bdd_deadlock["deadlock_markings"]:
-                console.print("[bold green]Some deadlock markings (BDD):[/bold green]")
-                for m in bdd_deadlock["deadlock_markings"]:
-                    console.print(f"    {m}")
-            else:
-                console.print("[bold cyan]No deadlock reachable (BDD / explicit mode).[/bold cyan]")
-
-        
+            if "bdd" in stages:
+                from src.bdd_reachability import run_symbolic_reachability
+                out.print("\n[bold yellow]Running BDD symbolic reachability...[/bold yellow]")
+                # explicit-vs-BDD memory comparison only when this run produced the states file
+                reach_path, reach_format = None, "csv"
+                if "bfs" in stages and not reduced:
+                    reach_format = "rbin" if args.reach_format == "rbin" else "csv"
+                    reach_path = str(output_rbin if reach_format == "rbin" else output_csv)
+                with prof.span("bdd_reachability"), out.engine_output():
+                    bdd_result = run_symbolic_reachability(result, str(pnml_file),
+                                                           reach_path=reach_path, reach_format=reach_format,
+                                                           save_bdd=output_reach_bdd if save_bdd else None,
+                                                           start_from=output_reach_bdd if args.incremental else None)
+
+                stats["bdd"] = {
+                    "num_reachable_states": bdd_result["bdd"]["num_reachable_states"],
+                    "bdd_memory_bytes": bdd_result["bdd"]["bdd_memory_bytes"],
+                    "execution_time_sec": bdd_result["bdd"]["execution_time_sec"],
+                    "bdd_nodes": bdd_result["bdd"]["bdd_nodes"],
+                    "manager_nodes": bdd_result["bdd"]["manager_nodes"]
+                }
+                if args.incremental:
+                    stats["bdd"]["restarted"] = bdd_result["bdd"]["restarted"]
+                    if bdd_result["bdd"]["restarted"]:
+                        out.print("  • fixed point restarted from the saved Reach set")
+                if save_bdd:
+                    stats["bdd"]["saved_to"] = str(output_reach_bdd)
+                    out.print(f"[bold cyan]Saved Reach BDD to:[/bold cyan] {output_reach_bdd}")
+
+            # --- BDD-based Deadlock detection ---
+            if "deadlock-bdd" in stages:
+                from src.bdd_deadlock import solve_deadlock_bdd
+                out.print("\n[bold yellow]Running BDD-based deadlock detection...[/bold yellow]")
+
+                with prof.span("bdd_deadlock"), out.engine_output():
+                    bdd_deadlock = solve_deadlock_bdd(result, sample_limit=5,
+                                                      save_path=output_dead_bdd if save_bdd else None,
+                                                      budget=make_budget(),
+                                                      checkpoint=make_checkpointer(output_dead_ckpt),
+                                                      resume=args.resume, symmetry=symmetry,
+                                                      start_from=output_dead_bdd if args.incremental else None)
+
+                out.print(f"[bold white]BDD-deadlock status:[/bold white] {bdd_deadlock['status']}")
+                out.print(f"  • mode: {bdd_deadlock['mode']}")
+                out.print(f"  • runtime: {bdd_deadlock['runtime_sec']:.6f}s")
+                out.print(f"  • reachable states (est): {bdd_deadlock['reachable_states_est']}")
+                out.print(f"  • BDD nodes (if BDD mode): {bdd_deadlock['bdd_nodes']}")
+
+                if bdd_deadlock["deadlock_markings"]:
+                    out.print("[bold green]Some deadlock markings (BDD):[/bold green]")
+                    for m in bdd_deadlock["deadlock_markings"]:
+                        out.print(f"    {m}")
+                else:
+                    out.print("[bold cyan]No deadlock reachable (BDD / explicit mode).[/bold cyan]")
+
+                stats["bdd_deadlock"] = {
+                    "status": bdd_deadlock["status"],
+                    "mode": bdd_deadlock["mode"],
+                    "runtime_sec": round(bdd_deadlock["runtime_sec"], 6),
+                    "num_deadlocks_listed": bdd_deadlock["num_deadlocks_listed"],
+                    "reachable_states_est": bdd_deadlock["reachable_states_est"],
+                    "bdd_nodes": bdd_deadlock["bdd_nodes"],
+                    "complete": bdd_deadlock["complete"],
+                }
+                if bdd_deadlock["fallback"] is not None:
+                    stats["bdd_deadlock"]["fallback"] = bdd_deadlock["fallback"]
+                    out.print(f"[bold red]BDD mode failed ({bdd_deadlock['fallback']}); "
+                              f"used the explicit search instead.[/bold red]")
+                if args.incremental:
+                    stats["bdd_deadlock"]["restarted"] = bdd_deadlock["restarted"]
+                    if bdd_deadlock["restarted"]:
+                        out.print("  • fixed point restarted from the saved Reach set")
+                if bdd_deadlock["num_orbits"] is not None:
+                    # explicit search stored orbits; counts and listed markings are concrete
+                    stats["bdd_deadlock"]["num_orbits"] = bdd_deadlock["num_orbits"]
+                if not bdd_deadlock["complete"]:
+                    stats["bdd_deadlock"]["stop_reason"] = bdd_deadlock["stop_reason"]
+                    out.print(f"  • stopped early: {bdd_deadlock['stop_reason']}")
+                if save_bdd and bdd_deadlock["mode"] == "BDD":
+                    stats["bdd_deadlock"]["saved_to"] = str(output_dead_bdd)
+                    out.print(f"[bold cyan]Saved Reach/dead-state BDDs to:[/bold cyan] {output_dead_bdd}")
+
+            # --- Bitstate / hash-compaction exploration ---
+            if "bitstate" in stages:
+                from src.bitstate import approximate_bfs
+                out.print(f"\n[bold yellow]Running approximate exploration ({args.bitstate_store})...[/bold yellow]")
+                with prof.span("bitstate"):
+                    approx = approximate_bfs(result, store=args.bitstate_store, num_bits=1 << args.bitstate_bits,
+                                             k=args.bitstate_hashes, deadlock_limit=5,
+                                             keep_traces=args.bitstate_traces, max_queue=args.bitstate_queue,
+                                             budget=make_budget())
+
+                out.print(f"  • states stored: {approx['num_states']} (lower bound)")
+                out.print(f"  • estimated coverage: {approx['estimated_coverage']:.6f}, "
+                          f"P(omission): {approx['omission_probability']:.3g}")
+                out.print(f"  • memory (bytes): {approx['memory']['total_bytes']} total, "
+                          f"{approx['memory']['visited_set_bytes']} visited set, "
+                          f"{approx['memory']['queue_peak_bytes']} queue peak, {approx['memory']['trace_bytes']} traces")
+                if approx["queue_dropped"]:
+                    out.print(f"[bold red]  • queue full: {approx['queue_dropped']} successors dropped "
+                              f"(raise --bitstate-queue)[/bold red]")
+                out.print(f"  • runtime: {approx['runtime_sec']:.6f}s")
+                for d in approx["deadlocks"]:
+                    out.print(f"    deadlock at depth {d['depth']}: {d['marking']}")
+                    if d["trace"] is not None:
+                        out.print(f"      trace: {' -> '.join(d['trace']) or '(initial marking)'}")
+
+                stats["bitstate"] = {
+                    "num_states": approx["num_states"],
+                    "max_depth": approx["max_depth"],
+                    "expected_omissions": approx["expected_omissions"],
+                    "omission_probability": approx["omission_probability"],
+                    "estimated_coverage": approx["estimated_coverage"],
+                    "num_deadlocks_listed": len(approx["deadlocks"]),
+                    "deadlocks": approx["deadlocks"],
+                    "complete": approx["complete"],
+                    "stop_reason": approx["stop_reason"],
+                    "queue_dropped": approx["queue_dropped"],
+                    "visited_set": approx["visited_set"],
+                    "memory": approx["memory"],
+                    "runtime_sec": round(approx["runtime_sec"], 6),
+                }
+
             # --- ILP Deadlock detection ---
-            console.print("\n[bold yellow]Running ILP deadlock detection...[/bold yellow]")
-
-            # Bound sigma_t with max depth from BFS
-            max_depth = stats["bfs"]["max_depth"]
-
-            ilp_result = solve_deadlock_ilp(result, max_firing_bound=max_depth)
-
-            console.print(f"[bold white]ILP status:[/bold white] {ilp_result['status']}")
-            if ilp_result["deadlock_marking"] is not None:
-                console.print(f"[bold green]Deadlock marking (ILP):[/bold green] {ilp_result['deadlock_marking']}")
-            else:
-                console.print("[bold red]No deadlock found by ILP (or model infeasible).[/bold red]")
-
-            console.print(f"  • ILP runtime: {ilp_result['runtime_sec']:.6f}s")
-            console.print(f"  • #vars: {ilp_result['num_vars']}")
-            console.print(f"  • #constraints: {ilp_result['num_constraints']}")
-
-            # Write into stats.json
-            stats["ilp"] = {
-                "status": ilp_result["status"],
-                "deadlock_marking": ilp_result["deadlock_marking"],
-                "runtime_sec": round(ilp_result["runtime_sec"], 6),
-                "num_vars": ilp_result["num_vars"],
-                "num_constraints": ilp_result["num_constraints"]
-            }
+            if "deadlock-ilp" in stages:
+                from src.ilp_deadlock import solve_deadlock_ilp
+                out.print("\n[bold yellow]Running ILP deadlock detection...[/bold yellow]")
 
-             # Write BDD deadlock stats
-            stats["bdd_deadlock"] = {
-            "status": bdd_deadlock["status"],
-            "mode": bdd_deadlock["mode"],
-            "runtime_sec": round(bdd_deadlock["runtime_sec"], 6),
-            "num_deadlocks_listed": bdd_deadlock["num_deadlocks_listed"],
-            "reachable_states_est": bdd_deadlock["reachable_states_est"],
-            "bdd_nodes": bdd_deadlock["bdd_nodes"],
-            }
+                # Bound sigma_t with max depth from BFS (solver default |P| if BFS was skipped)
+                max_depth = stats["bfs"]["max_depth"] if "bfs" in stats else None
 
-            stats["opt"] = {
-                "status": opt_result["status"],
-                "objective_weights": weights,
-                "best_value": opt_result["best_value"],
-                "best_marking": opt_result["best_marking"],
-                "runtime_sec": round(opt_result["runtime_sec"], 6),
-                "num_states": opt_result["num_states"]
-            }
+                with prof.span("ilp_deadlock"), out.engine_output():
+                    ilp_result = solve_deadlock_ilp(result, max_firing_bound=max_depth, solver_msg=not args.quiet,
+                                                    model_path=output_ilp_model if args.incremental else None)
 
+                out.print(f"[bold white]ILP status:[/bold white] {ilp_result['status']}")
+                if ilp_result["deadlock_marking"] is not None:
+                    out.print(f"[bold green]Deadlock marking (ILP):[/bold green] {ilp_result['deadlock_marking']}")
+                else:
+                    out.print("[bold red]No deadlock found by ILP (or model infeasible).[/bold red]")
+
+                out.print(f"  • ILP runtime: {ilp_result['runtime_sec']:.6f}s")
+                out.print(f"  • #vars: {ilp_result['num_vars']}")
+                out.print(f"  • #constraints: {ilp_result['num_constraints']}")
+                if "model" in ilp_result:
+                    out.print(f"  • rows rebuilt / reused: {ilp_result['model']['rows_rebuilt']} / "
+                              f"{ilp_result['model']['rows_reused']}")
+
+                stats["ilp"] = {
+                    "status": ilp_result["status"],
+                    "deadlock_marking": ilp_result["deadlock_marking"],
+                    "runtime_sec": round(ilp_result["runtime_sec"], 6),
+                    "num_vars": ilp_result["num_vars"],
+                    "num_constraints": ilp_result["num_constraints"]
+                }
+                if "model" in ilp_result:
+                    stats["ilp"]["model"] = ilp_result["model"]
+
+            # --- Liveness / terminal SCCs ---
+            for stage, mode in (("liveness", "explicit"), ("liveness-bdd", "bdd")):
+                if stage not in stages:
+                    continue
+                if mode == "explicit" and "graph" not in reachable_with_depth:
+                    stats.setdefault("skipped", {})[stage] = "no reachability graph under symmetry reduction"
+                    out.print("\n[bold red]Explicit liveness needs the full reachability graph; "
+                              "skipped under symmetry reduction (use liveness-bdd).[/bold red]")
+                    continue
+                from src.liveness import analyze_liveness, symbolic_liveness
+                out.print(f"\n[bold yellow]Running liveness analysis ({mode})...[/bold yellow]")
+                with prof.span(stage):
+                    if mode == "explicit":
+                        live = analyze_liveness(reachable_with_depth["graph"], reachable_markings)
+                    else:
+                        live = symbolic_liveness(result)
+
+                levels = live["transitions"]
+                out.print(f"  • live: {[t for t, l in levels.items() if l == 'live']}")
+                out.print(f"  • quasi-live only: {[t for t, l in levels.items() if l == 'quasi-live']}")
+                out.print(f"  • dead: {[t for t, l in levels.items() if l == 'dead']}")
+                if live["terminal_sccs_truncated"]:
+                    out.print(f"  • unknown (in every terminal SCC found): "
+                              f"{[t for t, l in levels.items() if l == 'unknown']}")
+                    out.print("  [bold red]• terminal SCC enumeration truncated: only the SCCs below were found, "
+                              "livelock is a lower bound[/bold red]")
+                out.print(f"  • terminal SCCs: {[(c['kind'], c['size']) for c in live['terminal_sccs']]}")
+                out.print(f"  • livelock: {live['has_livelock']}, deadlock: {live['has_deadlock']}, "
+                          f"reversible: {live['reversible']}")
+                out.print(f"  • runtime: {live['runtime_sec']:.6f}s")
+
+                stats[stage.replace("-", "_")] = {
+                    "transitions": levels,
+                    "terminal_sccs": [{k: v for k, v in c.items() if k != "representative_marking"}
+                                      for c in live["terminal_sccs"]],
+                    "has_deadlock": live["has_deadlock"],
+                    "has_livelock": live["has_livelock"],
+                    "reversible": live["reversible"],
+                    "num_sccs": live["num_sccs"],
+                    "terminal_sccs_truncated": live["terminal_sccs_truncated"],
+                    "runtime_sec": round(live["runtime_sec"], 6),
+                }
+                if mode == "explicit" and not reachable_with_depth["complete"]:
+                    # unexpanded markings look like deadlocks in a truncated graph
+                    stats[stage.replace("-", "_")]["partial"] = True
+                if live["terminal_sccs_truncated"]:
+                    stats[stage.replace("-", "_")]["partial"] = True
+
+            # --- CTL properties (one Reach / cache shared by all formulas) ---
+            if "ctl" in stages and ctl_formulas:
+                from src.ctl import check_ctl
+                out.print("\n[bold yellow]Checking CTL properties...[/bold yellow]")
+                try:
+                    with prof.span("ctl"):
+                        ctl_results = check_ctl(result, ctl_formulas)
+                except ValueError as e:
+                    # formulas are shared by all inputs: a place this net lacks, or a non-safe net
+                    stats["ctl"] = {"error": str(e)}
+                    out.print(f"[bold red]CTL check failed:[/bold red] {e}")
+                else:
+                    for r in ctl_results:
+                        verdict = "[bold green]holds[/bold green]" if r["holds"] else "[bold red]fails[/bold red]"
+                        out.print(f"  • {r['formula']}: {verdict} ({r['runtime_sec']:.6f}s)")
+                        if r["witness"] is not None:
+                            out.print(f"    witness: {r['witness']}")
+                    stats["ctl"] = [{k: (round(v, 6) if k == "runtime_sec" else v) for k, v in r.items()}
+                                    for r in ctl_results]
+
+            # --- Batch state queries (one pass / one BDD conjunction each) ---
+            for stage, mode in (("query", "explicit"), ("query-bdd", "bdd")):
+                if stage not in stages or not queries:
+                    continue
+                if mode == "explicit" and reduced:
+                    stats.setdefault("skipped", {})[stage] = SYMMETRY_SKIP
+                    out.print(f"\n[bold red]Explicit queries skipped: {SYMMETRY_SKIP} (or use query-bdd).[/bold red]")
+                    continue
+                from src.queries import QueryEngine, SymbolicQueryEngine
+                out.print(f"\n[bold yellow]Evaluating {len(queries)} state queries ({mode})...[/bold yellow]")
+                try:
+                    with prof.span(stage):
+                        if mode == "explicit" and args.reach_format == "rbin":
+                            engine = QueryEngine.from_rbin(output_rbin, result)
+                        elif mode == "explicit":
+                            engine = QueryEngine.from_markings([p["id"] for p in result["places"]],
+                                                               reachable_markings, result)
+                        else:
+                            engine = SymbolicQueryEngine.from_net(result)
+                        q_results = engine.evaluate(queries)
+                except ValueError as e:
+                    # queries are shared by all inputs: a place this net lacks, or a non-safe net
+                    stats[stage.replace("-", "_")] = {"error": str(e)}
+                    out.print(f"[bold red]Queries failed:[/bold red] {e}")
+                    continue
+                # a bounded BFS only answers for the markings it found
+                partial = mode == "explicit" and not reachable_with_depth["complete"]
+                if partial:
+                    out.print("  [bold red]• BFS stopped early: answers cover a partial state space[/bold red]")
+                for r in q_results:
+                    out.print(f"  • {r['query']}: reachable={r['exists']} invariant={r['invariant']} "
+                              f"states={r['count']}")
+                    if r["exists"] and not r["invariant"]:
+                        out.print(f"    witness: {r['witness']}")
+                    if partial:
+                        r["partial"] = True
+                stats[stage.replace("-", "_")] = [{k: (round(v, 6) if k == "runtime_sec" else v)
+                                                   for k, v in r.items()} for r in q_results]
+
+            if prof.enabled:
+                stats["profile"] = prof.summary()
+                prof.export_chrome_trace(output_trace)
+                out.print(f"[bold magenta]Saved profiling trace to:[/bold magenta] {output_trace}")
+
+            # --- Save stats JSON ---
             with open(output_stats, "w", encoding="utf-8") as f:
                 json.dump(stats, f, indent=2)
-            console.print(f"[bold magenta]Updated statistics (with ILP) to:[/bold magenta] {output_stats}")
-
-            # --- Add BDD results to stats ---
-            stats["bdd"] = {
-                "num_reachable_states": bdd_result["bdd"]["num_reachable_states"],
-                "bdd_memory_bytes": bdd_result["bdd"]["bdd_memory_bytes"],
-                "execution_time_sec": bdd_result["bdd"]["execution_time_sec"],
-                "bdd_nodes": bdd_result["bdd"]["bdd_nodes"]
-            }
+            out.print(f"[bold magenta]Saved statistics to:[/bold magenta] {output_stats}")
 
-            # --- Save stats JSON after BDD ---
-            with open(output_stats, "w", encoding="utf-8") as f:
-                json.dump(stats, f, indent=2)
-            console.print(f"[bold magenta]Saved statistics to:[/bold magenta] {output_stats}")
+            if args.quiet:
+                emit_json(stats)
 
             # --- In tóm tắt ---
-            console.print(f"\n[bold white]Summary:[/bold white]")
-            console.print(f"  • Reachable states (BFS): {num_states}")
-            console.print(f"  • BFS time: {bfs_time:.6f}s")
-            console.print(f"  • Max depth: {stats['bfs']['max_depth']}")
-            console.print(f"  • Reachable states (BDD): {bdd_result['bdd']['num_reachable_states']}")
-            console.print(f"  • BDD memory (bytes): {bdd_result['bdd']['bdd_memory_bytes']}")
-            console.print(f"  • BDD nodes: {bdd_result['bdd']['bdd_nodes']}")
-            console.print(f"  • BDD time: {bdd_result['bdd']['execution_time_sec']:.6f}s")
-            console.print(f"  • Optimization status: {opt_result['status']}")
-            if opt_result["status"] == "OPTIMAL":
-                console.print(f"  • Best objective value: {opt_result['best_value']}")
+            out.print(f"\n[bold white]Summary:[/bold white]")
+            if "bfs" in stats:
+                out.print(f"  • Reachable states (BFS): {stats['bfs']['num_reachable_states']}")
+                out.print(f"  • BFS time: {stats['bfs']['execution_time_sec']:.6f}s")
+                out.print(f"  • Max depth: {stats['bfs']['max_depth']}")
+            if "bdd" in stats:
+                out.print(f"  • Reachable states (BDD): {stats['bdd']['num_reachable_states']}")
+                if stats["bdd"]["bdd_memory_bytes"] is not None:
+                    out.print(f"  • BDD memory (bytes): {stats['bdd']['bdd_memory_bytes']}")
+                out.print(f"  • BDD nodes: {stats['bdd']['bdd_nodes']} (manager: {stats['bdd']['manager_nodes']})")
+                out.print(f"  • BDD time: {stats['bdd']['execution_time_sec']:.6f}s")
+            if "opt" in stats:
+                out.print(f"  • Optimization status: {stats['opt']['status']}")
+                if stats["opt"]["status"] == "OPTIMAL":
+                    out.print(f"  • Best objective value: {stats['opt']['best_value']}")
 
         except Exception as e:
-            console.print(f"[bold red]Error processing {pnml_file}:[/bold red] {e}")
+            failed = True
+            out.print(f"[bold red]Error processing {pnml_file}:[/bold red] {e}")
+            if args.quiet:
+                emit_json({"file": str(pnml_file), "error": str(e)})
             continue
+        finally:
+            disable_profiling()
+
+    if failed and args.quiet:
+        sys.exit(2)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
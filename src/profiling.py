@@ -0,0 +1,179 @@
+# profiling.py
+import json
+import os
+import time
+import tracemalloc
+
+
+def _rss_bytes():
+    """Current resident set size in bytes (None if not available on this OS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+# 1) NO-OP PROFILER (default)
+# Every call is a constant-time no-op so instrumented code pays ~nothing.
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullProfiler:
+    enabled = False
+
+    def span(self, name, **args):
+        return _NULL_SPAN
+
+    def counter(self, name, **values):
+        pass
+
+    def sample_memory(self):
+        pass
+
+    def summary(self):
+        return None
+
+
+# 2) RECORDING PROFILER
+
+class _Span:
+    def __init__(self, prof, name, args):
+        self.prof = prof
+        self.name = name
+        self.args = dict(args)
+
+    def set(self, **args):
+        """Attach extra values (state counts, nodes...) to the span."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.prof._record_edge("B", self.name, self.start)
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.prof._record_edge("E", self.name, end, self.args)
+        self.prof._add_total(self.name, end - self.start)
+        self.prof.sample_memory()
+        return False
+
+
+class Profiler:
+    """
+    Collects named spans, counters and memory samples.
+    Spans are written as B/E event pairs (args on the E event); timestamps
+    are in microseconds relative to the profiler start, so the trace can be
+    loaded as-is in chrome://tracing or Perfetto.
+    trace_memory: also sample tracemalloc. Off by default: tracing every
+    allocation slows allocation-heavy stages several times over.
+    """
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.events = []
+        self.totals = {}          # span name -> {"count", "total_sec"}
+        self.peak_rss = None
+        self.peak_traced = None
+        self._pid = os.getpid()
+        self._t0 = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _ts(self, t):
+        return (t - self._t0) * 1e6
+
+    def _record_edge(self, ph, name, t, args=None):
+        event = {"name": name, "ph": ph, "ts": self._ts(t), "pid": self._pid, "tid": 0}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def _add_total(self, name, sec):
+        agg = self.totals.setdefault(name, {"count": 0, "total_sec": 0.0})
+        agg["count"] += 1
+        agg["total_sec"] += sec
+
+    def span(self, name, **args):
+        return _Span(self, name, args)
+
+    def counter(self, name, **values):
+        self.events.append({
+            "name": name,
+            "ph": "C",
+            "ts": self._ts(time.perf_counter()),
+            "pid": self._pid,
+            "args": values,
+        })
+
+    def sample_memory(self):
+        values = {}
+        rss = _rss_bytes()
+        if rss is not None:
+            values["rss_bytes"] = rss
+            self.peak_rss = rss if self.peak_rss is None else max(self.peak_rss, rss)
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            values["traced_bytes"] = current
+            self.peak_traced = peak if self.peak_traced is None else max(self.peak_traced, peak)
+        if values:
+            self.counter("memory", **values)
+
+    def summary(self):
+        return {
+            "spans": {k: {"count": v["count"], "total_sec": round(v["total_sec"], 6)}
+                      for k, v in self.totals.items()},
+            "peak_rss_bytes": self.peak_rss,
+            "peak_traced_bytes": self.peak_traced,
+        }
+
+    def export_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": self.events,
+                "displayTimeUnit": "ms",
+                "otherData": self.summary(),
+            }, f)
+
+    def close(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+# PUBLIC API
+_active = NullProfiler()
+
+def get_profiler():
+    return _active
+
+def enable_profiling(trace_memory=False):
+    global _active
+    _active = Profiler(trace_memory=trace_memory)
+    return _active
+
+def disable_profiling():
+    global _active
+    if isinstance(_active, Profiler):
+        _active.close()
+    _active = NullProfiler()
@@ -0,0 +1,306 @@
+# queries.py
+# Batch state-predicate queries against one computed state space.
+#
+# Query syntax:
+#   place            token count >= 1
+#   place OP k       OP in  >= > <= < == !=   (k integer)
+#   enabled(t)       every input place of t holds at least the arc weight
+#   !q | q & q | q | q | (q)
+# e.g.  "Line1_QC & Line2_QC",  "Collector >= 1",  "!(p1 <= 0 | enabled(t3))"
+#
+# Every query reports whether some reachable marking satisfies it ("exists",
+# with a witness) and whether all do ("invariant", with a counterexample).
+import re
+import time
+from src.profiling import get_profiler
+
+_TOKEN = re.compile(r'\s*(>=|<=|==|!=|[<>()!&|]|-?\d+|"[^"]*"|[A-Za-z_][\w.]*)')
+_CMP = (">=", ">", "<=", "<", "==", "!=")
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m:
+            raise QuerySyntaxError(f"Unexpected character at {pos}: {text[pos:pos + 10]!r}")
+        tokens.append(m.group(1))
+        pos = m.end()
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.i = 0
+
+    def peek(self, k=0):
+        j = self.i + k
+        return self.tokens[j] if j < len(self.tokens) else None
+
+    def take(self, expected=None):
+        tok = self.peek()
+        if tok is None or (expected is not None and tok != expected):
+            raise QuerySyntaxError(f"Expected {expected or 'a token'}, got {tok!r}")
+        self.i += 1
+        return tok
+
+    def parse(self):
+        q = self.disjunction()
+        if self.peek() is not None:
+            raise QuerySyntaxError(f"Unexpected token {self.peek()!r}")
+        return q
+
+    def disjunction(self):
+        q = self.conjunction()
+        while self.peek() == "|":
+            self.take()
+            q = ("or", q, self.conjunction())
+        return q
+
+    def conjunction(self):
+        q = self.unary()
+        while self.peek() == "&":
+            self.take()
+            q = ("and", q, self.unary())
+        return q
+
+    def unary(self):
+        tok = self.peek()
+        if tok == "!":
+            self.take()
+            return ("not", self.unary())
+        if tok == "(":
+            self.take()
+            q = self.disjunction()
+            self.take(")")
+            return q
+        if tok == "enabled" and self.peek(1) == "(":
+            self.take()
+            self.take("(")
+            t = self.take().strip('"')
+            self.take(")")
+            return ("enabled", t)
+        name = self.take()
+        if name in _CMP or name in (")", "&", "|"):
+            raise QuerySyntaxError(f"Unexpected token {name!r}")
+        name = name.strip('"')
+        if self.peek() in _CMP:
+            op = self.take()
+            k = self.take()
+            try:
+                k = int(k)
+            except ValueError:
+                raise QuerySyntaxError(f"Expected an integer after {op!r}, got {k!r}")
+            return ("cmp", name, op, k)
+        return ("cmp", name, ">=", 1)
+
+
+def parse_query(text):
+    """Parse a query string into a nested-tuple predicate."""
+    return _Parser(text).parse()
+
+
+def _as_predicate(q):
+    return parse_query(q) if isinstance(q, str) else q
+
+
+def _pre_sets(net):
+    places = {p["id"] for p in net["places"]}
+    pre = {t["id"]: {} for t in net["transitions"]}
+    for arc in net["arcs"]:
+        if arc["src"] in places and arc["target"] in pre:
+            pre[arc["target"]][arc["src"]] = arc.get("weight", 1)
+    return pre
+
+
+# 1) EXPLICIT MODE (vectorized over a state matrix)
+
+class QueryEngine:
+    """
+    states: (n_states x n_places) integer matrix, row i = marking i.
+    Atomic comparisons are cached, so shared atoms across queries cost one
+    column scan.
+    """
+
+    def __init__(self, places, states, net=None):
+        import numpy as np
+        self.np = np
+        self.places = list(places)
+        self.col = {p: j for j, p in enumerate(self.places)}
+        self.states = np.asarray(states)
+        self.pre = _pre_sets(net) if net is not None else None
+        self.cache = {}
+
+    @classmethod
+    def from_markings(cls, places, markings, net=None):
+        """markings: BFS output, dicts holding every place."""
+        from src.reachability_store import markings_to_arrays
+        states, _ = markings_to_arrays(places, markings)
+        return cls(places, states, net)
+
+    @classmethod
+    def from_rbin(cls, path, net=None):
+        from src.reachability_store import open_reachability
+        rf = open_reachability(path)
+        return cls(rf.places, rf.states(), net)
+
+    def _mask(self, q):
+        hit = self.cache.get(q)
+        if hit is not None:
+            return hit
+        np = self.np
+        op = q[0]
+        if op == "cmp":
+            _, place, cmp, k = q
+            if place not in self.col:
+                raise QuerySyntaxError(f"Unknown place {place!r}")
+            column = self.states[:, self.col[place]]
+            res = {">=": np.greater_equal, ">": np.greater, "<=": np.less_equal,
+                   "<": np.less, "==": np.equal, "!=": np.not_equal}[cmp](column, k)
+        elif op == "enabled":
+            if self.pre is None:
+                raise QuerySyntaxError("enabled(...) needs the net (QueryEngine(..., net=net))")
+            if q[1] not in self.pre:
+                raise QuerySyntaxError(f"Unknown transition {q[1]!r}")
+            res = np.ones(len(self.states), dtype=bool)
+            for p, w in self.pre[q[1]].items():
+                res &= self._mask(("cmp", p, ">=", w))
+        elif op == "not":
+            res = ~self._mask(q[1])
+        elif op == "and":
+            res = self._mask(q[1]) & self._mask(q[2])
+        elif op == "or":
+            res = self._mask(q[1]) | self._mask(q[2])
+        else:
+            raise QuerySyntaxError(f"Unknown operator {op!r}")
+        self.cache[q] = res
+        return res
+
+    def _marking(self, i):
+        return {p: int(v) for p, v in zip(self.places, self.states[i])}
+
+    def evaluate(self, queries):
+        prof = get_profiler()
+        results = []
+        for q in queries:
+            start = time.time()
+            with prof.span("query.explicit"):
+                mask = self._mask(_as_predicate(q))
+                count = int(mask.sum())
+                hit = int(mask.argmax()) if count else None
+                miss = int((~mask).argmax()) if count < len(mask) else None
+            results.append({
+                "query": q if isinstance(q, str) else repr(q),
+                "count": count,
+                "exists": count > 0,
+                "invariant": count == len(mask),
+                "witness": self._marking(hit) if hit is not None else None,
+                "counterexample": self._marking(miss) if miss is not None else None,
+                "runtime_sec": time.time() - start,
+            })
+        return results
+
+
+# 2) SYMBOLIC MODE (1-safe nets, BDD Reach set)
+
+class SymbolicQueryEngine:
+    """One BDD conjunction with Reach per query; atoms are cached as BDDs."""
+
+    def __init__(self, bdd, reach, places, var_of, pre=None):
+        self.bdd = bdd
+        self.reach = reach
+        self.places = list(places)
+        self.var_of = var_of
+        self.pre = pre
+        self.cache = {}
+
+    @classmethod
+    def from_net(cls, net):
+        from src.bdd_deadlock import _BDDSolver
+        s = _BDDSolver(net)
+        with get_profiler().span("query_bdd.reachable"):
+            reach = s.reachable()
+        return cls(s.bdd, reach, s.places, s.vars, _pre_sets(net))
+
+    @classmethod
+    def from_saved(cls, path, net=None):
+        """Reuse a Reach BDD written with --save-bdd (see bdd_store)."""
+        from src.bdd_store import load_bdds
+        bdd, roots, meta = load_bdds(path)
+        return cls(bdd, roots["reach"], meta["places"], meta["var_of"],
+                   _pre_sets(net) if net is not None else None)
+
+    def _cmp(self, place, cmp, k):
+        if place not in self.var_of:
+            raise QuerySyntaxError(f"Unknown place {place!r}")
+        x = self.bdd.var(self.var_of[place])
+        nx = self.bdd.apply("not", x)
+        # token count is 0 (nx) or 1 (x) in a safe net
+        ok0 = {">=": 0 >= k, ">": 0 > k, "<=": 0 <= k, "<": 0 < k, "==": k == 0, "!=": k != 0}[cmp]
+        ok1 = {">=": 1 >= k, ">": 1 > k, "<=": 1 <= k, "<": 1 < k, "==": k == 1, "!=": k != 1}[cmp]
+        if ok0 and ok1:
+            return self.bdd.true
+        if ok1:
+            return x
+        if ok0:
+            return nx
+        return self.bdd.false
+
+    def _node(self, q):
+        hit = self.cache.get(q)
+        if hit is not None:
+            return hit
+        op = q[0]
+        if op == "cmp":
+            res = self._cmp(*q[1:])
+        elif op == "enabled":
+            if self.pre is None:
+                raise QuerySyntaxError("enabled(...) needs the net")
+            if q[1] not in self.pre:
+                raise QuerySyntaxError(f"Unknown transition {q[1]!r}")
+            res = self.bdd.true
+            for p, w in self.pre[q[1]].items():
+                res = self.bdd.apply("and", res, self._cmp(p, ">=", w))
+        elif op == "not":
+            res = self.bdd.apply("not", self._node(q[1]))
+        elif op in ("and", "or"):
+            res = self.bdd.apply(op, self._node(q[1]), self._node(q[2]))
+        else:
+            raise QuerySyntaxError(f"Unknown operator {op!r}")
+        self.cache[q] = res
+        return res
+
+    def _pick(self, node):
+        care = {self.var_of[p] for p in self.places}
+        for assign in self.bdd.pick_iter(node, care_vars=care):
+            return {p: int(assign.get(self.var_of[p], False)) for p in self.places}
+        return None
+
+    def evaluate(self, queries):
+        prof = get_profiler()
+        n = len(self.places)
+        results = []
+        for q in queries:
+            start = time.time()
+            with prof.span("query.bdd"):
+                node = self._node(_as_predicate(q))
+                sat = self.bdd.apply("and", self.reach, node)
+                viol = self.bdd.apply("and", self.reach, self.bdd.apply("not", node))
+            results.append({
+                "query": q if isinstance(q, str) else repr(q),
+                "count": int(sat.count(n)),
+                "exists": sat != self.bdd.false,
+                "invariant": viol == self.bdd.false,
+                "witness": self._pick(sat),
+                "counterexample": self._pick(viol),
+                "runtime_sec": time.time() - start,
+            })
+        return results
@@ -0,0 +1,103 @@
+# reachability_graph.py
+# Reachability graph in compressed-sparse-row form:
+#   offsets[i] .. offsets[i+1]  -> outgoing edges of state i
+#   targets[e]                  -> successor state index
+#   transitions[e]              -> index into net["transitions"]
+# Arrays are stdlib `array` while building (no numpy needed for BFS) and are
+# exposed as numpy arrays on demand: 4 bytes per target plus 2 (or 4 when
+# |T| > 65535) per transition index. A stdlib array cannot grow while a numpy
+# view of it exists, so the views are zero-copy only once finalize() has ended
+# construction; before that as_numpy() returns copies.
+from array import array
+
+
+class ReachabilityGraph:
+    def __init__(self, transition_ids, offsets=None, targets=None, transitions=None):
+        self.transition_ids = list(transition_ids)
+        t_code = "H" if len(self.transition_ids) <= 0xFFFF else "I"
+        self.offsets = offsets if offsets is not None else array("Q", [0])
+        self.targets = targets if targets is not None else array("I")
+        self.transitions = transitions if transitions is not None else array(t_code)
+        # numpy arrays (load, reverse) cannot grow anyway
+        self.closed = not isinstance(self.offsets, array)
+
+    # ---- building (used by bfs.py; states must be closed in index order) ----
+    def add_edge(self, target, transition_index):
+        self._check_open()
+        self.targets.append(target)
+        self.transitions.append(transition_index)
+
+    def close_state(self):
+        """Finish the edge list of the next state."""
+        self._check_open()
+        self.offsets.append(len(self.targets))
+
+    def finalize(self):
+        """End construction: no more edges or states, as_numpy() returns zero-copy views."""
+        self.closed = True
+
+    def _check_open(self):
+        if self.closed:
+            raise RuntimeError("ReachabilityGraph is finalized; it cannot take more edges or states")
+
+    # ---- queries ----
+    @property
+    def num_states(self):
+        return len(self.offsets) - 1
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def successors(self, i):
+        """[(target_state, transition_index), ...] for state i."""
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        return list(zip(self.targets[lo:hi].tolist(), self.transitions[lo:hi].tolist()))
+
+    def out_degree(self, i):
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.offsets, self.targets, self.transitions))
+
+    # ---- numpy views ----
+    def as_numpy(self):
+        """
+        (offsets uint64, targets uint32, transitions uint16/uint32). They share memory
+        with the graph once it is finalized and are copies while it is still open.
+        """
+        import numpy as np
+        def view(a, dtype):
+            if isinstance(a, np.ndarray):
+                return a
+            if not len(a):
+                return np.zeros(0, dtype=dtype)
+            v = np.frombuffer(a, dtype=dtype)
+            return v if self.closed else v.copy()
+        t_dtype = np.uint16 if self.transitions.itemsize == 2 else np.uint32
+        return view(self.offsets, np.uint64), view(self.targets, np.uint32), view(self.transitions, t_dtype)
+
+    def reverse(self):
+        """Transposed graph (predecessor lists) as a new ReachabilityGraph of numpy arrays."""
+        import numpy as np
+        offsets, targets, transitions = self.as_numpy()
+        n = self.num_states
+        sources = np.repeat(np.arange(n, dtype=np.uint32), np.diff(offsets).astype(np.int64))
+        order = np.argsort(targets, kind="stable")
+        rev_offsets = np.zeros(n + 1, dtype=np.uint64)
+        np.cumsum(np.bincount(targets, minlength=n), out=rev_offsets[1:])
+        return ReachabilityGraph(self.transition_ids, rev_offsets, sources[order], transitions[order])
+
+    # ---- persistence ----
+    def save(self, path):
+        import numpy as np
+        offsets, targets, transitions = self.as_numpy()
+        np.savez(path, offsets=offsets, targets=targets, transitions=transitions,
+                 transition_ids=np.array(self.transition_ids, dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        with np.load(path) as data:
+            return cls([str(t) for t in data["transition_ids"]],
+                       data["offsets"], data["targets"], data["transitions"])
@@ -0,0 +1,185 @@
+# reachability_store.py
+# Compact binary format for reachable markings (*.rbin), replacing the
+# text CSV for large state spaces.
+#
+# Layout (little endian):
+#   magic     b"PNRS"
+#   version   uint16
+#   flags     uint16   (bit 0: rows are bit-packed, 1 bit per place)
+#   n_places  uint32
+#   n_states  uint64
+#   hdr_len   uint32   length of the JSON header {"places": [...]}
+#   header    JSON, padded with spaces to an 8-byte boundary
+#   depth     uint32[n_states]
+#   rows      uint8[n_states, row_bytes]  (row_bytes = ceil(P/8) if packed else P)
+import csv
+import itertools
+import json
+import operator
+import struct
+
+import numpy as np
+
+MAGIC = b"PNRS"
+VERSION = 1
+FLAG_PACKED = 1
+_FIXED = struct.Struct("<4sHHIQI")
+
+
+def _align8(n):
+    return (n + 7) // 8 * 8
+
+
+def markings_to_arrays(places, markings, depths=None):
+    """
+    BFS output (list of dicts with every place + aligned depth list) -> (states int64 2D, depth uint32).
+    depth is None when no depths are given.
+    """
+    n, P = len(markings), len(places)
+    if P == 1:
+        row = lambda m: (m[places[0]],)   # itemgetter of one key returns a scalar
+    else:
+        row = operator.itemgetter(*places) if P else (lambda m: ())
+    states = np.fromiter(itertools.chain.from_iterable(map(row, markings)), dtype=np.int64, count=n * P)
+    depth = np.fromiter(depths, dtype=np.uint32, count=n) if depths is not None else None
+    return states.reshape(n, P), depth
+
+
+def write_reachability(path, places, states, depth, packed=None):
+    """
+    Write states (n_states x n_places, token counts) and their BFS depth.
+    packed=None picks bit-packing automatically when every token count is 0/1.
+    """
+    states = np.asarray(states)
+    depth = np.asarray(depth, dtype=np.uint32)
+    n_states = states.shape[0]
+    if states.ndim != 2 or states.shape[1] != len(places):
+        raise ValueError(f"states must have shape (n, {len(places)}), got {states.shape}")
+    if depth.shape != (n_states,):
+        raise ValueError("depth must have one entry per state")
+
+    max_tokens = int(states.max()) if states.size else 0
+    if states.size and int(states.min()) < 0:
+        raise ValueError("Negative token count in states")
+    if max_tokens > 255:
+        raise ValueError(f"Token count {max_tokens} does not fit in uint8 rows")
+    if packed is None:
+        packed = max_tokens <= 1
+    elif packed and max_tokens > 1:
+        raise ValueError("Bit-packed rows require a safe (0/1) state set")
+
+    rows = states.astype(np.uint8, copy=False)
+    if packed:
+        rows = np.packbits(rows, axis=1)
+
+    header = json.dumps({"places": list(places)}).encode("utf-8")
+    header += b" " * (_align8(_FIXED.size + len(header)) - _FIXED.size - len(header))
+    flags = FLAG_PACKED if packed else 0
+
+    with open(path, "wb") as f:
+        f.write(_FIXED.pack(MAGIC, VERSION, flags, len(places), n_states, len(header)))
+        f.write(header)
+        f.write(depth.astype("<u4", copy=False).tobytes())
+        f.write(np.ascontiguousarray(rows).tobytes())
+
+
+class ReachabilityFile:
+    """
+    Memory-mapped view over an .rbin file. Nothing is read until accessed:
+    `depth` and `rows` are np.memmap views straight onto the file.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            fixed = f.read(_FIXED.size)
+            if len(fixed) < _FIXED.size:
+                raise ValueError(f"Truncated reachability file: {self.path}")
+            magic, version, flags, n_places, n_states, hdr_len = _FIXED.unpack(fixed)
+            if magic != MAGIC:
+                raise ValueError(f"Not a reachability file (bad magic): {self.path}")
+            if version != VERSION:
+                raise ValueError(f"Unsupported reachability file version {version}")
+            header = json.loads(f.read(hdr_len).decode("utf-8"))
+
+        self.places = header["places"]
+        if len(self.places) != n_places:
+            raise ValueError("Header place list does not match n_places")
+        self.num_states = n_states
+        self.packed = bool(flags & FLAG_PACKED)
+        self.row_bytes = (n_places + 7) // 8 if self.packed else n_places
+
+        depth_off = _FIXED.size + hdr_len
+        rows_off = depth_off + 4 * n_states
+        if n_states:
+            self.depth = np.memmap(self.path, dtype="<u4", mode="r", offset=depth_off, shape=(n_states,))
+            self.rows = np.memmap(self.path, dtype=np.uint8, mode="r", offset=rows_off,
+                                  shape=(n_states, self.row_bytes))
+        else:
+            self.depth = np.zeros(0, dtype="<u4")
+            self.rows = np.zeros((0, self.row_bytes), dtype=np.uint8)
+
+    def __len__(self):
+        return self.num_states
+
+    def states(self, start=0, stop=None):
+        """Token matrix for rows [start, stop). Zero-copy unless the file is bit-packed."""
+        block = self.rows[start:stop]
+        if not self.packed:
+            return block
+        return np.unpackbits(block, axis=1, count=len(self.places))
+
+    def iter_blocks(self, block_size=1 << 20):
+        """Yield (start, states, depth) chunks, keeping memory bounded for huge files."""
+        for start in range(0, self.num_states, block_size):
+            stop = min(start + block_size, self.num_states)
+            yield start, self.states(start, stop), self.depth[start:stop]
+
+    def marking(self, i):
+        row = self.states(i, i + 1)[0]
+        return {p: int(v) for p, v in zip(self.places, row)}
+
+    @property
+    def nbytes(self):
+        return self.depth.nbytes + self.rows.nbytes
+
+
+def open_reachability(path):
+    return ReachabilityFile(path)
+
+
+def rbin_to_csv(rbin_path, csv_path, block_size=1 << 20):
+    """Convert to the historical `State_ID, Depth, <places>` CSV."""
+    rf = ReachabilityFile(rbin_path)
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["State_ID", "Depth"] + rf.places)
+        for start, block, depth in rf.iter_blocks(block_size):
+            writer.writerows(
+                [f"S{start + i}", int(d)] + row
+                for i, (d, row) in enumerate(zip(depth.tolist(), block.tolist()))
+            )
+
+
+def csv_to_rbin(csv_path, rbin_path, packed=None):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None or header[:2] != ["State_ID", "Depth"]:
+            raise ValueError(f"CSV header not found in {csv_path}")
+        places = header[2:]
+        rows = [r for r in reader if r]
+    data = np.array([r[1:] for r in rows], dtype=np.int64).reshape(len(rows), len(places) + 1)
+    write_reachability(rbin_path, places, data[:, 1:], data[:, 0], packed=packed)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 3:
+        print("Usage: python -m src.reachability_store <in.rbin|in.csv> <out.csv|out.rbin>")
+        sys.exit(1)
+    src_path, dst_path = sys.argv[1:]
+    if src_path.endswith(".rbin"):
+        rbin_to_csv(src_path, dst_path)
+    else:
+        csv_to_rbin(src_path, dst_path)
@@ -0,0 +1,318 @@
+# simulation.py
+# Batched random-walk simulation of the token game.
+#
+# W independent walks start at M0 and advance in lockstep: each step computes
+# the enabled transitions of all W markings at once (NumPy, one pass over the
+# input arcs), picks one per walk at random and applies the incidence row.
+# A walk ends when it reaches a dead marking or after max_steps firings.
+#
+# Choice rule per walk: among enabled transitions with the highest priority
+# (all 0 by default), pick t with probability proportional to weight[t]
+# (all 1 by default).
+#
+# Firing sequences are not stored while simulating. The batches holding the
+# reported walks (deadlocks, longest walks) are re-run with the same seed,
+# recording only those walks.
+import time
+from src.profiling import get_profiler
+
+# use dense preset matrices for enabling tests up to |P| * |T| entries (4 bytes each)
+DENSE_LIMIT = 1 << 22
+# walks per batch; each batch has its own seed, so results depend on (seed, num_walks)
+# and not on how many processes share the batches
+CHUNK_WALKS = 1024
+
+
+def _net_arrays(net, weights=None, priorities=None):
+    import numpy as np
+    places = [p["id"] for p in net["places"]]
+    transitions = [t["id"] for t in net["transitions"]]
+    col = {p: i for i, p in enumerate(places)}
+    row = {t: i for i, t in enumerate(transitions)}
+    P, T = len(places), len(transitions)
+
+    C = np.zeros((T, P), dtype=np.int64)
+    in_t, in_p, in_w = [], [], []
+    for arc in net["arcs"]:
+        w = arc.get("weight", 1)
+        if arc["src"] in col and arc["target"] in row:
+            t, p = row[arc["target"]], col[arc["src"]]
+            C[t, p] -= w
+            in_t.append(t)
+            in_p.append(p)
+            in_w.append(w)
+        elif arc["src"] in row and arc["target"] in col:
+            C[row[arc["src"]], col[arc["target"]]] += w
+
+    order = np.argsort(np.array(in_t, dtype=np.int64), kind="stable")
+    in_t = np.array(in_t, dtype=np.int64)[order]
+    in_p = np.array(in_p, dtype=np.int64)[order]
+    in_w = np.array(in_w, dtype=np.int64)[order]
+    # transitions with input arcs, and where their arcs start in the sorted arc list
+    guarded, starts = np.unique(in_t, return_index=True)
+
+    # small enough nets: one dense 0/1 preset matrix per distinct arc weight, so that
+    # "number of unsatisfied input arcs" is a float32 matrix product (BLAS)
+    pre_masks = None
+    if P * T <= DENSE_LIMIT:
+        pre_masks = []
+        for w in np.unique(in_w).tolist():
+            mask = np.zeros((P, T), dtype=np.float32)
+            sel = in_w == w
+            mask[in_p[sel], in_t[sel]] = 1.0
+            pre_masks.append((w, mask))
+
+    def per_transition(values, default, name):
+        arr = np.full(T, default, dtype=np.float32)
+        for t, v in (values or {}).items():
+            if t not in row:
+                raise ValueError(f"Unknown transition {t!r} in {name}")
+            arr[row[t]] = v
+        return arr
+
+    if weights and any(v <= 0 for v in weights.values()):
+        raise ValueError("Transition weights must be positive")
+
+    return {
+        "places": places,
+        "transitions": transitions,
+        "M0": np.array([int(p.get("m0", 0)) for p in net["places"]], dtype=np.int64),
+        "C": C,
+        "in_p": in_p,
+        "in_w": in_w,
+        "guarded": guarded,
+        "starts": starts,
+        "pre_masks": pre_masks,
+        "weights": per_transition(weights, 1.0, "weights"),
+        "priorities": per_transition(priorities, 0.0, "priorities"),
+    }
+
+
+def _enabled(M, arrays):
+    """(W x T) bool matrix of enabled transitions for the W markings in M."""
+    import numpy as np
+    W, T = M.shape[0], arrays["C"].shape[0]
+    if arrays["pre_masks"] is not None:
+        missing = np.zeros((W, T), dtype=np.float32)
+        for w, mask in arrays["pre_masks"]:
+            missing += (M < w).astype(np.float32) @ mask
+        return missing == 0
+    en = np.ones((W, T), dtype=bool)
+    if len(arrays["in_p"]):
+        short = (M[:, arrays["in_p"]] < arrays["in_w"]).astype(np.int32)
+        en[:, arrays["guarded"]] = np.add.reduceat(short, arrays["starts"], axis=1) == 0
+    return en
+
+
+def _run_chunk(arrays, num_walks, max_steps, seed, record=None):
+    """
+    Simulate one batch; returns raw aggregates (merged by simulate_random_walks).
+    record: walk ids (within the batch) whose firing sequences are kept, as the
+    columns of "trace" (max_steps x len(record), -1 after the walk ended).
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    T, P = arrays["C"].shape
+    weights, prio = arrays["weights"], arrays["priorities"]
+    single_priority = bool(np.all(prio == prio[0])) if T else True
+
+    M = np.tile(arrays["M0"], (num_walks, 1))
+    length = np.zeros(num_walks, dtype=np.int64)
+    dead = np.zeros(num_walks, dtype=bool)
+    # markings of the walks still running are kept compacted in Ma (rows = walk ids in `active`)
+    active = np.arange(num_walks)
+    Ma = M.copy()
+    trace = None
+    if record is not None:
+        trace = np.full((max_steps, len(record)), -1, dtype=np.int32)
+        slot = np.full(num_walks, -1, dtype=np.int64)
+        slot[record] = np.arange(len(record))
+
+    token_sum = np.zeros(P, dtype=np.float64)
+    marked_sum = np.zeros(P, dtype=np.int64)
+    token_max = arrays["M0"].copy()
+    fire_count = np.zeros(T, dtype=np.int64)
+    observed = 0
+
+    for step in range(max_steps):
+        if not len(active):
+            break
+        token_sum += Ma.sum(axis=0)
+        marked_sum += (Ma > 0).sum(axis=0)
+        observed += len(active)
+
+        en = _enabled(Ma, arrays)
+        if not single_priority:
+            best = np.where(en, prio, -np.inf).max(axis=1)
+            en &= prio == best[:, None]
+        cum = np.cumsum(en * weights, axis=1)
+        total = cum[:, -1] if T else np.zeros(len(active))
+
+        stuck = total <= 0
+        if stuck.any():
+            dead[active[stuck]] = True
+            M[active[stuck]] = Ma[stuck]
+            keep = ~stuck
+            active, Ma, cum, total = active[keep], Ma[keep], cum[keep], total[keep]
+            if not len(active):
+                break
+
+        u = rng.random(len(active)) * total
+        chosen = (cum <= u[:, None]).sum(axis=1)
+        Ma += arrays["C"][chosen]
+        np.maximum(token_max, Ma.max(axis=0), out=token_max)
+        fire_count += np.bincount(chosen, minlength=T)
+        length[active] += 1
+        if trace is not None:
+            s = slot[active]
+            kept = s >= 0
+            trace[step, s[kept]] = chosen[kept]
+
+    if len(active):
+        # markings reached after the last step count towards occupancy, and may be dead too
+        M[active] = Ma
+        token_sum += Ma.sum(axis=0)
+        marked_sum += (Ma > 0).sum(axis=0)
+        observed += len(active)
+        dead[active[~_enabled(Ma, arrays).any(axis=1)]] = True
+
+    return {
+        "M": M, "length": length, "dead": dead, "trace": trace,
+        "token_sum": token_sum, "marked_sum": marked_sum, "token_max": token_max,
+        "fire_count": fire_count, "observed": observed,
+    }
+
+
+# arrays of the net being simulated, sent once to each worker process
+_worker_arrays = None
+
+
+def _init_worker(arrays):
+    global _worker_arrays
+    _worker_arrays = arrays
+
+
+def _chunk_worker(args):
+    num_walks, max_steps, seed, record = args
+    return _run_chunk(_worker_arrays, num_walks, max_steps, seed, record)
+
+
+def simulate_random_walks(net, num_walks=1000, max_steps=1000, seed=None, weights=None,
+                          priorities=None, processes=1, max_deadlocks=10, keep_longest=5,
+                          keep_traces=False):
+    """
+    weights / priorities: optional {transition_id: number}.
+    The walks run in batches of CHUNK_WALKS; processes > 1 spreads the batches
+    over worker processes. Results are reproducible for a fixed (seed, num_walks),
+    whatever the number of processes.
+    keep_traces: store the firing sequence of every walk (max_steps x num_walks
+    int32) instead of re-running the batches of the reported walks.
+    Returns:
+        {
+          "num_walks": int, "max_steps": int, "seed": int | None,
+          "deadlock_hits": int,                     # walks that ended in a dead marking
+          "deadlock_rate": float,
+          "deadlocks": [{"marking", "steps", "hits", "trace"}, ...],   # distinct dead markings
+          "mean_length": float, "max_length": int,
+          "longest": [{"steps", "deadlock", "trace"}, ...],
+          "occupancy": {place: {"mean_tokens", "max_tokens", "marked_fraction"}},
+          "firing_counts": {transition: int},
+          "runtime_sec": float
+        }
+    """
+    import numpy as np
+    start = time.time()
+    prof = get_profiler()
+    arrays = _net_arrays(net, weights, priorities)
+    places, transitions = arrays["places"], arrays["transitions"]
+
+    n_chunks = max(1, -(-num_walks // CHUNK_WALKS))
+    sizes = [num_walks // n_chunks + (i < num_walks % n_chunks) for i in range(n_chunks)]
+    offsets = np.cumsum([0] + sizes)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    processes = max(1, min(processes, n_chunks))
+
+    pool = None
+    if processes > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(arrays,))
+
+    def run(jobs):
+        # jobs: [(batch index, record), ...]
+        if pool is None:
+            return [_run_chunk(arrays, sizes[i], max_steps, seeds[i], record) for i, record in jobs]
+        return list(pool.map(_chunk_worker, [(sizes[i], max_steps, seeds[i], record) for i, record in jobs]))
+
+    try:
+        with prof.span("simulate.walks", walks=num_walks, processes=processes):
+            chunks = run([(i, np.arange(sizes[i]) if keep_traces else None) for i in range(n_chunks)])
+
+        M = np.concatenate([c["M"] for c in chunks])
+        length = np.concatenate([c["length"] for c in chunks])
+        dead = np.concatenate([c["dead"] for c in chunks])
+        observed = sum(c["observed"] for c in chunks)
+        token_sum = sum(c["token_sum"] for c in chunks)
+        marked_sum = sum(c["marked_sum"] for c in chunks)
+        token_max = np.max([c["token_max"] for c in chunks], axis=0)
+        fire_count = sum(c["fire_count"] for c in chunks)
+
+        # distinct dead markings, each with its shortest walk
+        found = {}
+        for w in np.flatnonzero(dead).tolist():
+            key = tuple(M[w].tolist())
+            hit = found.get(key)
+            if hit is None:
+                found[key] = {"walk": w, "hits": 1}
+            else:
+                hit["hits"] += 1
+                if length[w] < length[hit["walk"]]:
+                    hit["walk"] = w
+        reported = sorted(found.items(), key=lambda kv: -kv[1]["hits"])[:max_deadlocks]
+        longest_walks = np.argsort(-length, kind="stable")[:keep_longest].tolist()
+
+        # firing sequences of the reported walks, by batch
+        wanted = {}
+        for w in sorted({hit["walk"] for _, hit in reported} | set(longest_walks)):
+            i = int(np.searchsorted(offsets, w, side="right")) - 1
+            wanted.setdefault(i, []).append(w - int(offsets[i]))
+        if keep_traces:
+            replayed = [chunks[i] for i in wanted]
+        else:
+            with prof.span("simulate.replay", walks=sum(map(len, wanted.values())), batches=len(wanted)):
+                replayed = run([(i, np.array(local)) for i, local in wanted.items()])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    traces = {}
+    for (i, local), c in zip(wanted.items(), replayed):
+        for j, lw in enumerate(local):
+            # a replayed batch records only the wanted walks, in order
+            traces[int(offsets[i]) + lw] = c["trace"][:, lw if keep_traces else j]
+
+    def trace_of(w):
+        return [transitions[t] for t in traces[w][:length[w]].tolist()]
+
+    deadlocks = [{"marking": dict(zip(places, key)), "steps": int(length[hit["walk"]]),
+                  "hits": hit["hits"], "trace": trace_of(hit["walk"])} for key, hit in reported]
+    longest = [{"steps": int(length[w]), "deadlock": bool(dead[w]), "trace": trace_of(w)} for w in longest_walks]
+
+    if prof.enabled:
+        prof.counter("simulate.totals", firings=int(length.sum()), deadlock_hits=int(dead.sum()))
+    return {
+        "num_walks": num_walks,
+        "max_steps": max_steps,
+        "seed": seed,
+        "deadlock_hits": int(dead.sum()),
+        "deadlock_rate": float(dead.mean()) if num_walks else 0.0,
+        "deadlocks": deadlocks,
+        "mean_length": float(length.mean()) if num_walks else 0.0,
+        "max_length": int(length.max()) if num_walks else 0,
+        "longest": longest,
+        "occupancy": {p: {"mean_tokens": float(token_sum[i] / observed) if observed else 0.0,
+                          "max_tokens": int(token_max[i]),
+                          "marked_fraction": float(marked_sum[i] / observed) if observed else 0.0}
+                      for i, p in enumerate(places)},
+        "firing_counts": {t: int(c) for t, c in zip(transitions, fire_count)},
+        "runtime_sec": time.time() - start,
+    }
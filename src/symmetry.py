@@ -0,0 +1,221 @@
+# symmetry.py
+# Symmetry reduction for nets built from replicated components.
+#
+# A family is a list of k blocks (replicas). Each block maps a template
+# (the node id with its replica number replaced by "{}", e.g. "Line{}_Buf")
+# to a node id. Candidate families come from numbered ids (Line1_*, Line2_*,
+# T1_*, ...) or from declared regexes with one capture group for the replica
+# number. A family is only used if permuting its blocks is a net automorphism
+# (arcs, weights and initial marking preserved):
+#   "full"    every permutation of the blocks    (swap + rotation are automorphisms)
+#   "cyclic"  rotations only                     (e.g. dining philosophers)
+# Exploration then keeps one canonical marking per orbit: block sub-vectors
+# sorted ("full") or the smallest rotation ("cyclic").
+import math
+import re
+from collections import Counter
+from itertools import product
+
+_NUMBER = re.compile(r"\d+")
+
+
+def _numbered_template(node_id):
+    m = _NUMBER.search(node_id)
+    if not m:
+        return None
+    return node_id[:m.start()] + "{}" + node_id[m.end():], int(m.group())
+
+
+def _pattern_template(patterns):
+    regexes = [re.compile(p) for p in patterns]
+
+    def template(node_id):
+        for rx in regexes:
+            m = rx.fullmatch(node_id)
+            if m:
+                return node_id[:m.start(1)] + "{}" + node_id[m.end(1):], int(m.group(1))
+        return None
+    return template
+
+
+def _candidate_families(node_ids, template_of):
+    """Templates seen with the same set (>= 2) of replica numbers form one family."""
+    by_template = {}
+    for nid in node_ids:
+        hit = template_of(nid)
+        if hit is not None:
+            by_template.setdefault(hit[0], {})[hit[1]] = nid
+    families = {}
+    for tpl, members in by_template.items():
+        if len(members) >= 2:
+            families.setdefault(frozenset(members), []).append(tpl)
+    out = []
+    for indices, templates in families.items():
+        templates.sort()
+        out.append([{t: by_template[t][i] for t in templates} for i in sorted(indices)])
+    return out
+
+
+def _is_automorphism(net, blocks, sigma):
+    """Does moving block j onto block sigma[j] (all other nodes fixed) preserve the net?"""
+    pi = {}
+    for j, block in enumerate(blocks):
+        for tpl, nid in block.items():
+            pi[nid] = blocks[sigma[j]][tpl]
+    kind = {p["id"]: "p" for p in net["places"]}
+    kind.update({t["id"]: "t" for t in net["transitions"]})
+    m0 = {p["id"]: int(p.get("m0", 0)) for p in net["places"]}
+    if any(kind.get(a) != kind.get(b) or m0.get(a) != m0.get(b) for a, b in pi.items()):
+        return False
+    arcs = {(a["src"], a["target"]): a.get("weight", 1) for a in net["arcs"]}
+    return all(arcs.get((pi.get(s, s), pi.get(t, t))) == w for (s, t), w in arcs.items())
+
+
+class Symmetry:
+    def __init__(self, places, families):
+        """
+        places: place ids (marking tuple order).
+        families: [{"kind": "full" | "cyclic", "blocks": [{template: node_id}, ...]}, ...]
+        """
+        self.places = list(places)
+        self.families = families
+        col = {p: i for i, p in enumerate(self.places)}
+        # per family: block j -> place columns, aligned by template
+        self._cols = []
+        for fam in families:
+            templates = sorted(t for t, nid in fam["blocks"][0].items() if nid in col)
+            self._cols.append((fam["kind"], [[col[b[t]] for t in templates] for b in fam["blocks"]]))
+
+    def __bool__(self):
+        return bool(self.families)
+
+    @classmethod
+    def detect(cls, net, patterns=None):
+        """
+        patterns: None to use numbered ids, or a list of pattern groups, each a
+        list of regexes with one capture group (one family per group). Declared
+        groups that are not automorphisms raise ValueError; undeclared
+        candidates are silently dropped.
+        """
+        node_ids = [p["id"] for p in net["places"]] + [t["id"] for t in net["transitions"]]
+        if patterns is None:
+            candidates = [(None, fam) for fam in _candidate_families(node_ids, _numbered_template)]
+        else:
+            candidates = []
+            for group in patterns:
+                fams = _candidate_families(node_ids, _pattern_template(group))
+                if not fams:
+                    raise ValueError(f"Symmetry group {group} matches fewer than two replicas")
+                candidates.extend((group, fam) for fam in fams)
+
+        families, used = [], set()
+        for group, blocks in candidates:
+            k = len(blocks)
+            nodes = {nid for b in blocks for nid in b.values()}
+            rotate = [(j + 1) % k for j in range(k)]
+            swap = [1, 0] + list(range(2, k))
+            if nodes & used or len({len(b) for b in blocks}) != 1:
+                ok = None
+            elif _is_automorphism(net, blocks, rotate):
+                ok = "full" if k == 2 or _is_automorphism(net, blocks, swap) else "cyclic"
+            else:
+                ok = None
+            if ok is None:
+                if group is not None:
+                    raise ValueError(f"Symmetry group {group} is not a net automorphism")
+                continue
+            used |= nodes
+            families.append({"kind": ok, "blocks": blocks})
+        return cls([p["id"] for p in net["places"]], families)
+
+    # ---- orbits ----
+    def canonical(self, tpl):
+        """Canonical representative (tuple) of the orbit of marking tuple `tpl`."""
+        out = None
+        for kind, cols in self._cols:
+            subs = [tuple(tpl[c] for c in block) for block in cols]
+            if kind == "full":
+                best = sorted(subs)
+            else:
+                best = min(subs[r:] + subs[:r] for r in range(len(subs)))
+            if best != subs:
+                if out is None:
+                    out = list(tpl)
+                for block, sub in zip(cols, best):
+                    for c, v in zip(block, sub):
+                        out[c] = v
+        return tpl if out is None else tuple(out)
+
+    def orbit_size(self, tpl):
+        size = 1
+        for kind, cols in self._cols:
+            subs = [tuple(tpl[c] for c in block) for block in cols]
+            k = len(subs)
+            if kind == "full":
+                size *= math.factorial(k) // math.prod(math.factorial(m) for m in Counter(subs).values())
+            else:
+                period = next(r for r in range(1, k + 1) if subs[r:] + subs[:r] == subs)
+                size *= period
+        return size
+
+    def expand(self, tpl):
+        """All concrete marking tuples in the orbit of `tpl`."""
+        choices = []
+        for kind, cols in self._cols:
+            subs = [tuple(tpl[c] for c in block) for block in cols]
+            if kind == "full":
+                arrangements = _distinct_permutations(subs)
+            else:
+                arrangements = list(dict.fromkeys(tuple(subs[r:] + subs[:r]) for r in range(len(subs))))
+            choices.append((cols, arrangements))
+        for combo in product(*(arr for _, arr in choices)):
+            out = list(tpl)
+            for (cols, _), arrangement in zip(choices, combo):
+                for block, sub in zip(cols, arrangement):
+                    for c, v in zip(block, sub):
+                        out[c] = v
+            yield tuple(out)
+
+    # ---- dict markings (bfs.py) ----
+    def canonical_marking(self, mark):
+        tpl = tuple(mark.get(p, 0) for p in self.places)
+        c = self.canonical(tpl)
+        return mark if c is tpl else dict(zip(self.places, c))
+
+    def expand_marking(self, mark):
+        for tpl in self.expand(tuple(mark.get(p, 0) for p in self.places)):
+            yield dict(zip(self.places, tpl))
+
+    def describe(self):
+        return [{"kind": f["kind"], "replicas": len(f["blocks"]),
+                 "templates": sorted(f["blocks"][0])} for f in self.families]
+
+
+def _distinct_permutations(items):
+    counts = Counter(items)
+    keys = sorted(counts)
+    out, cur = [], []
+
+    def rec():
+        if len(cur) == len(items):
+            out.append(tuple(cur))
+            return
+        for key in keys:
+            if counts[key]:
+                counts[key] -= 1
+                cur.append(key)
+                rec()
+                cur.pop()
+                counts[key] += 1
+    rec()
+    return out
+
+
+def expand_markings(markings, depths, symmetry):
+    """Representative markings + their depths (aligned lists) from a reduced BFS -> all concrete ones."""
+    out, out_depths = [], []
+    for mark, d in zip(markings, depths):
+        for concrete in symmetry.expand_marking(mark):
+            out.append(concrete)
+            out_depths.append(d)
+    return out, out_depths
@@ -0,0 +1,72 @@
+# Brute-force reference semantics shared by the tests: every engine is checked
+# against these, so they stay as plain as possible (dict markings, arcs
+# re-read from the net, nothing cached or incremental).
+import json
+from collections import deque
+
+
+def marking_key(m):
+    return json.dumps(m, sort_keys=True)
+
+
+def pre_post(net):
+    """({t: {place: weight}}, {t: {place: weight}}) in net transition order."""
+    places = {p["id"] for p in net["places"]}
+    pre = {t["id"]: {} for t in net["transitions"]}
+    post = {t["id"]: {} for t in net["transitions"]}
+    for a in net["arcs"]:
+        if a["src"] in places:
+            pre[a["target"]][a["src"]] = a.get("weight", 1)
+        else:
+            post[a["src"]][a["target"]] = a.get("weight", 1)
+    return pre, post
+
+
+def is_enabled(m, inputs):
+    return all(m.get(p, 0) >= w for p, w in inputs.items())
+
+
+def fire(m, inputs, outputs):
+    m = dict(m)
+    for p, w in inputs.items():
+        m[p] -= w
+    for p, w in outputs.items():
+        m[p] = m.get(p, 0) + w
+    return m
+
+
+def successors(m, pre, post):
+    """[(transition index, next marking)] for every enabled transition; pre / post from pre_post."""
+    return [(ti, fire(m, pre[t], post[t])) for ti, t in enumerate(pre) if is_enabled(m, pre[t])]
+
+
+def is_dead(net, m):
+    return not any(is_enabled(m, inputs) for inputs in pre_post(net)[0].values())
+
+
+def replay(net, trace):
+    """Fire `trace` (transition ids) from M0, asserting each one is enabled; returns the final marking."""
+    pre, post = pre_post(net)
+    m = {p["id"]: p["m0"] for p in net["places"]}
+    for t in trace:
+        assert is_enabled(m, pre[t]), t
+        m = fire(m, pre[t], post[t])
+    return m
+
+
+def reference_bfs(net):
+    """(markings, depths) in BFS order, recomputing every enabled set from scratch."""
+    pre, post = pre_post(net)
+    m0 = {p["id"]: p["m0"] for p in net["places"]}
+    seen, markings, depths = {marking_key(m0)}, [m0], [0]
+    q = deque([(m0, 0)])
+    while q:
+        m, d = q.popleft()
+        for _, n in successors(m, pre, post):
+            key = marking_key(n)
+            if key not in seen:
+                seen.add(key)
+                markings.append(n)
+                depths.append(d + 1)
+                q.append((n, d + 1))
+    return markings, depths
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("dd")
+
+from benchmarks.generators import NetBuilder, dining_philosophers, production_lines, shared_resource, token_ring
+from src.bdd_deadlock import _BDDSolver
+from src.bdd_reachability import run_symbolic_reachability
+from src.bdd_store import marking_in
+from src.bfs import bfs_reachable_markings_with_depth
+from tests.conftest import marking_key, pre_post, successors
+
+
+def _self_loops():
+    # "check" reads p and "swap" reads q without consuming them; r / s stay complementary
+    b = NetBuilder()
+    b.place("p", m0=1)
+    b.place("q", m0=1)
+    b.place("r")
+    b.place("s", m0=1)
+    b.transition("check", ["p", "s"], ["p", "r"])
+    b.transition("swap", ["q", "r"], ["q", "s"])
+    b.transition("drop", ["p", "r"], [])
+    return b.build()
+
+
+NETS = [production_lines(2), dining_philosophers(3), token_ring(4), shared_resource(3), _self_loops()]
+IDS = ["production_lines", "dining_philosophers", "token_ring", "shared_resource", "self_loops"]
+
+
+def _encode(solver, m):
+    return solver.bdd.cube({solver.vars[p]: bool(v) for p, v in m.items()})
+
+
+def _decode(solver, node):
+    return {marking_key(m) for m in solver.sample(node, limit=2 ** len(solver.places))}
+
+
+@pytest.mark.parametrize("net", NETS, ids=IDS)
+def test_reach_matches_bfs(net):
+    markings = bfs_reachable_markings_with_depth(net)["markings"]
+    solver = _BDDSolver(net)
+    Reach = solver.reachable()
+    assert Reach.count(len(solver.places)) == len(markings)
+    assert all(marking_in(solver.bdd, Reach, m, solver.vars) for m in markings)
+    sym = run_symbolic_reachability(net, "net")["bdd"]
+    assert sym["num_reachable_states"] == len(markings)
+    assert sym["manager_nodes"] >= sym["bdd_nodes"]
+
+
+@pytest.mark.parametrize("net", NETS, ids=IDS)
+def test_image_and_pre_image_of_each_marking(net):
+    solver = _BDDSolver(net)
+    Reach = solver.reachable()
+    pre, post = pre_post(net)
+    reach = solver.sample(Reach, limit=2 ** len(solver.places))
+    succ = {marking_key(m): {marking_key(n) for _, n in successors(m, pre, post)} for m in reach}
+    for m in reach:
+        node = _encode(solver, m)
+        assert _decode(solver, solver.image(node)) == succ[marking_key(m)]
+        preds = solver.bdd.apply("and", solver.pre_image(node), Reach)
+        assert _decode(solver, preds) == {k for k, s in succ.items() if marking_key(m) in s}
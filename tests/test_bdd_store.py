@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("dd")
+
+from benchmarks.generators import dining_philosophers
+from src.bdd_deadlock import _BDDSolver
+from src.bdd_store import dump_bdds, load_bdds, marking_in
+from src.bfs import bfs_reachable_markings_with_depth
+
+
+def test_round_trip_into_fresh_manager(tmp_path):
+    from dd.autoref import BDD
+    bdd = BDD()
+    bdd.declare("x", "y", "z")
+    u = bdd.add_expr(r"(x /\ ~ y) \/ z")
+    roots = {"u": u, "not_u": ~u, "t": bdd.true, "f": bdd.false}
+    dump_bdds(tmp_path / "u.json", bdd, roots, meta={"note": "hi"})
+
+    bdd2, loaded, meta = load_bdds(tmp_path / "u.json")
+    assert meta == {"note": "hi"}
+    assert bdd2 is not bdd and bdd2.vars.keys() == bdd.vars.keys()
+    assert loaded["u"] == bdd2.add_expr(r"(x /\ ~ y) \/ z")
+    assert loaded["not_u"] == ~loaded["u"]
+    assert loaded["t"] == bdd2.true and loaded["f"] == bdd2.false
+
+
+def test_accept_rejects_without_building(tmp_path):
+    from dd.autoref import BDD
+    bdd = BDD()
+    bdd.declare("x")
+    dump_bdds(tmp_path / "x.json", bdd, {"x": bdd.var("x")}, meta={"engine": "a"})
+    _, roots, meta = load_bdds(tmp_path / "x.json", accept=lambda m: m["engine"] == "b")
+    assert roots is None and meta["engine"] == "a"
+
+
+def test_saved_reach_set_matches_bfs(tmp_path):
+    net = dining_philosophers(3)
+    solver = _BDDSolver(net)
+    Reach = solver.reachable()
+    solver.save(tmp_path / "reach.json", Reach, solver.bdd.false)
+
+    bdd, roots, meta = load_bdds(tmp_path / "reach.json")
+    markings = bfs_reachable_markings_with_depth(net)["markings"]
+    assert roots["reach"].count(len(meta["places"])) == len(markings)
+    assert all(marking_in(bdd, roots["reach"], m, meta["var_of"]) for m in markings)
+    assert not marking_in(bdd, roots["reach"], {p: 1 for p in meta["places"]}, meta["var_of"])
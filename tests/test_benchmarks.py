@@ -0,0 +1,43 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from benchmarks.run import compare, environment, main
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_baseline_from_another_environment_is_refused(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"environment": {**environment(), "host": "elsewhere"}, "results": {}}))
+    args = ["--baseline", str(path), "--net-dir", str(tmp_path), "--families", "token_ring", "--engines", "bfs"]
+    assert main(args) == 2
+    assert "host: elsewhere (baseline)" in capsys.readouterr().err
+    assert main(args + ["--quick", "--counts-only"]) == 0
+
+
+def test_counts_only_ignores_time_and_memory():
+    base = {"n/bfs": {"states": 4, "time_sec": 0.1, "peak_bytes": 100}}
+    rec = {"n/bfs": {"states": 4, "time_sec": 9.0, "peak_bytes": 10 ** 6}}
+    assert len(compare(rec, base, 0.25, 0.1, 0.05)) == 2
+    assert compare(rec, base, 0.25, 0.1, 0.05, counts_only=True) == []
+    rec["n/bfs"]["states"] = 5
+    assert compare(rec, base, 0.25, 0.1, 0.05, counts_only=True) == ["n/bfs: state count 5 != baseline 4"]
+
+
+def test_engine_dependencies_are_imported_before_timing():
+    pytest.importorskip("dd")
+    pytest.importorskip("pulp")
+    pytest.importorskip("pympler")
+    code = (
+        "import sys\n"
+        "from benchmarks.run import ENGINES, preload_engines\n"
+        "preload_engines(ENGINES)\n"
+        "print([m for m in ('dd.autoref', 'pulp', 'pympler') if m not in sys.modules])\n"
+    )
+    res = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert res.returncode == 0, res.stderr
+    assert res.stdout.strip() == "[]"
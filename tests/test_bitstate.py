@@ -0,0 +1,47 @@
+import sys
+
+import pytest
+
+from benchmarks.generators import NetBuilder, production_lines
+from src.bitstate import HashCompactSet, approximate_bfs, replay
+
+
+def test_hashcompact_counts_hash_objects():
+    s = HashCompactSet()
+    for i in range(1000):
+        s.add((i, 0))
+    assert s.nbytes() >= sys.getsizeof(s.hashes) + 1000 * sys.getsizeof(1 << 32)
+
+
+def test_queue_cap_marks_run_incomplete():
+    net = production_lines(4)
+    full = approximate_bfs(net, store="hashcompact", deadlock_limit=float("inf"))
+    capped = approximate_bfs(net, store="hashcompact", deadlock_limit=float("inf"), max_queue=20)
+    assert full["complete"] and full["num_states"] == 1297
+    assert not capped["complete"] and capped["stop_reason"] == "max_queue"
+    assert capped["queue_dropped"] > 0
+    assert capped["memory"]["queue_peak_bytes"] < full["memory"]["queue_peak_bytes"]
+
+
+@pytest.mark.parametrize("store", ["bitstate", "hashcompact"])
+def test_full_queue_does_not_drop_visited_successors(store):
+    # "stay" leads back to the marking just expanded while "go" fills the queue
+    b = NetBuilder()
+    b.place("a", m0=1)
+    b.place("b")
+    b.transition("go", ["a"], ["b"])
+    b.transition("stay", ["a"], ["a"])
+    b.transition("back", ["b"], ["a"])
+    res = approximate_bfs(b.build(), store=store, max_queue=1)
+    assert res["queue_dropped"] == 0
+    assert res["complete"] and res["stop_reason"] is None and res["num_states"] == 2
+
+
+def test_traces_are_opt_in():
+    net = production_lines(2)
+    plain = approximate_bfs(net)
+    traced = approximate_bfs(net, keep_traces=True)
+    assert plain["deadlocks"][0]["trace"] is None and plain["memory"]["trace_bytes"] == 0
+    d = traced["deadlocks"][0]
+    assert replay(net, d["trace"]) == d["marking"]
+    assert traced["memory"]["total_bytes"] == sum(v for k, v in traced["memory"].items() if k != "total_bytes")
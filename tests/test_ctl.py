@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("dd")
+
+from benchmarks.generators import NetBuilder
+from src.ctl import CTLChecker, CTLSyntaxError, parse_ctl
+
+
+@pytest.fixture(scope="module")
+def checker():
+    # p0 -a-> p1 -b-> p2 (dead), and p1 -c-> p0 back
+    b = NetBuilder()
+    b.place("p0", m0=1)
+    b.place("p1")
+    b.place("p2")
+    b.transition("a", ["p0"], ["p1"])
+    b.transition("b", ["p1"], ["p2"])
+    b.transition("c", ["p1"], ["p0"])
+    return CTLChecker(b.build())
+
+
+@pytest.mark.parametrize("formula, holds, num_sat", [
+    ("EX p1", True, 1),           # only p0 (a); p1 moves to p0 or p2
+    ("EX p2", False, 1),          # only p1 has a p2 successor
+    ("AX p1", True, 2),           # p0 (single successor) and p2 (dead: vacuous)
+    ("E[p0 U p2]", False, 1),     # every path to p2 passes p1
+    ("E[(p0 | p1) U p2]", True, 3),
+    ("EG (p0 | p1)", True, 2),    # the a/c cycle
+    ("EG p0", False, 0),
+    ("EG p2", False, 1),          # maximal path: holds at the dead marking
+    ("AF p2", False, 1),
+    ("AG (p2 -> AX false)", True, 3),
+])
+def test_temporal_operators(checker, formula, holds, num_sat):
+    r = checker.check(formula)
+    assert (r["holds"], r["num_sat_states"]) == (holds, num_sat), formula
+
+
+def test_witnesses(checker):
+    assert checker.check("EF p2")["witness"] == {"p0": 0, "p1": 0, "p2": 1}
+    assert checker.check("AG !p2")["witness"] == {"p0": 0, "p1": 0, "p2": 1}
+    assert checker.check("AG (p0 | p1 | p2)")["witness"] is None
+
+
+def test_syntax_error():
+    with pytest.raises(CTLSyntaxError):
+        parse_ctl("E[p0 U")
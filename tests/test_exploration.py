@@ -0,0 +1,169 @@
+import copy
+
+import pytest
+
+from benchmarks.generators import NetBuilder, dining_philosophers, production_lines, shared_resource
+from src.bdd_deadlock import build_pre_post, explicit_bfs_deadlocks
+from src.bfs import bfs_reachable_markings_with_depth
+from src.exploration import Budget, Checkpointer, carry_enabled, dependency_index
+from tests.conftest import fire, is_enabled, pre_post, reference_bfs
+
+
+def _weighted(net, weight, m0_scale):
+    """Same structure, every arc weight `weight`, initial tokens times `m0_scale`."""
+    net = copy.deepcopy(net)
+    for a in net["arcs"]:
+        a["weight"] = weight
+    for p in net["places"]:
+        p["m0"] *= m0_scale
+    net["M0"] = [p["m0"] for p in net["places"]]
+    return net
+
+
+def _hand_built():
+    # weights > 1, a read arc on R (t1, t3, t5 test it without changing it) and
+    # a self-loop on C with unequal weights (t4 changes C)
+    b = NetBuilder()
+    for pid, m0 in (("A", 4), ("B", 0), ("C", 0), ("R", 1), ("S", 0)):
+        b.place(pid, m0=m0)
+    arcs = {
+        "t1": ({"A": 2, "R": 1}, {"B": 1, "R": 1}),
+        "t2": ({"B": 1}, {"C": 2}),
+        "t3": ({"C": 2, "R": 1}, {"R": 1, "A": 1}),
+        "t4": ({"C": 3}, {"C": 1, "S": 1}),
+        "t5": ({"S": 1, "R": 1}, {"R": 1}),
+    }
+    for tid, (inputs, outputs) in arcs.items():
+        b.transition(tid, [], [])
+        for p, w in inputs.items():
+            b.arc(p, tid, w)
+        for p, w in outputs.items():
+            b.arc(tid, p, w)
+    return b.build()
+
+
+WEIGHTED_NETS = [
+    pytest.param(_weighted(production_lines(2), 2, 2), id="production_lines_2_x2"),
+    pytest.param(_weighted(dining_philosophers(3), 2, 3), id="dining_philosophers_3_w2_m3"),
+    pytest.param(_weighted(shared_resource(3), 1, 2), id="shared_resource_3_m2"),
+    pytest.param(_hand_built(), id="hand_built"),
+]
+
+
+def _pre_post(net):
+    pre, post = pre_post(net)
+    return list(pre.values()), list(post.values())
+
+
+def _full_enabled(m, pre):
+    return tuple(u for u, inputs in enumerate(pre) if is_enabled(m, inputs))
+
+
+@pytest.mark.parametrize("net", WEIGHTED_NETS)
+def test_carried_enabled_set_matches_full_recomputation(net):
+    pre, post = _pre_post(net)
+    affected = dependency_index(pre, post)
+    markings = bfs_reachable_markings_with_depth(net)["markings"]
+    assert len(markings) > 1
+    for m in markings:
+        enabled = _full_enabled(m, pre)
+        for ti in enabled:
+            n = fire(m, pre[ti], post[ti])
+            carried = carry_enabled(enabled, affected[ti], lambda u: is_enabled(n, pre[u]))
+            assert carried == _full_enabled(n, pre), (m, ti)
+
+
+def test_read_arcs_are_not_dependencies_unequal_self_loops_are():
+    pre, post = _pre_post(_hand_built())
+    affected = dependency_index(pre, post)
+    # consumers: A -> t1, B -> t2, C -> t3 t4, R -> t1 t3 t5, S -> t5; R never changes
+    assert [set(a[0]) for a in affected] == [{0, 1}, {1, 2, 3}, {0, 2, 3}, {2, 3, 4}, {4}]
+    assert all(a[1] == frozenset(a[0]) and list(a[0]) == sorted(a[0]) for a in affected)
+
+
+@pytest.mark.parametrize("net", WEIGHTED_NETS)
+def test_bfs_markings_and_depths_unchanged(net):
+    markings, depths = reference_bfs(net)
+    res = bfs_reachable_markings_with_depth(net)
+    assert res["complete"]
+    assert res["markings"] == markings
+    assert res["depths"] == depths
+
+
+# ---- budgets, checkpoints and resume ----
+
+@pytest.mark.parametrize("build_graph", [False, True])
+def test_bfs_resume_matches_fresh_run(tmp_path, build_graph):
+    net = production_lines(3)
+    fresh = bfs_reachable_markings_with_depth(net, build_graph=build_graph)
+    ckpt = Checkpointer(tmp_path / "bfs.ckpt", every_seconds=None)
+
+    part = bfs_reachable_markings_with_depth(net, build_graph=build_graph, budget=Budget(max_states=40),
+                                             checkpoint=ckpt)
+    assert not part["complete"] and part["stop_reason"] == "max_states"
+    assert 40 <= len(part["markings"]) < len(fresh["markings"])
+    assert part["markings"] == fresh["markings"][:len(part["markings"])]
+
+    done = bfs_reachable_markings_with_depth(net, build_graph=build_graph, checkpoint=Checkpointer(ckpt.path),
+                                             resume=True)
+    assert done["complete"]
+    assert done["markings"] == fresh["markings"]
+    assert done["depths"] == fresh["depths"]
+    assert done["depth"] == fresh["depth"]
+    if build_graph:
+        np = pytest.importorskip("numpy")
+        for a, b in zip(done["graph"].as_numpy(), fresh["graph"].as_numpy()):
+            assert np.array_equal(a, b)
+    assert not (tmp_path / "bfs.ckpt").exists()    # cleared once the run completes
+
+
+def test_explicit_deadlocks_resume_matches_fresh_run(tmp_path):
+    net = dining_philosophers(5)
+    _, _, pre, post = build_pre_post(net)
+    fresh = explicit_bfs_deadlocks(net, pre, post, limit=100)
+    ckpt = Checkpointer(tmp_path / "dl.ckpt", every_seconds=None)
+
+    part = explicit_bfs_deadlocks(net, pre, post, limit=100, budget=Budget(max_states=30), checkpoint=ckpt)
+    assert part[2] == {"complete": False, "stop_reason": "max_states", "num_orbits": None}
+    assert part[1] < fresh[1]
+
+    done = explicit_bfs_deadlocks(net, pre, post, limit=100, checkpoint=Checkpointer(ckpt.path), resume=True)
+    assert done[2]["complete"]
+    assert done[0] == fresh[0] and done[0]
+    assert done[1] == fresh[1]
+
+
+def test_checkpoint_from_another_net_is_rejected(tmp_path):
+    ckpt = Checkpointer(tmp_path / "bfs.ckpt", every_seconds=None)
+    bfs_reachable_markings_with_depth(production_lines(2), budget=Budget(max_states=5), checkpoint=ckpt)
+    assert ckpt.num_saved == 1
+    with pytest.raises(ValueError, match="different net"):
+        bfs_reachable_markings_with_depth(production_lines(3), checkpoint=ckpt, resume=True)
+    # a weight change is a different net too
+    other = _weighted(production_lines(2), 2, 2)
+    with pytest.raises(ValueError, match="different net"):
+        bfs_reachable_markings_with_depth(other, checkpoint=ckpt, resume=True)
+    # and the BFS checkpoint is not the deadlock explorer's
+    net = production_lines(2)
+    _, _, pre, post = build_pre_post(net)
+    with pytest.raises(ValueError, match="belongs to 'bfs'"):
+        explicit_bfs_deadlocks(net, pre, post, checkpoint=ckpt, resume=True)
+
+
+@pytest.mark.parametrize("max_depth", [1, 3, 5])
+def test_max_depth_includes_but_does_not_expand_the_last_level(max_depth):
+    net = production_lines(3)
+    fresh = bfs_reachable_markings_with_depth(net, build_graph=True)
+    res = bfs_reachable_markings_with_depth(net, build_graph=True, budget=Budget(max_depth=max_depth))
+    assert res["stop_reason"] == "max_depth"
+    n = sum(d <= max_depth for d in fresh["depths"])
+    assert res["markings"] == fresh["markings"][:n]
+    assert res["depths"] == fresh["depths"][:n]
+    assert max(res["depths"]) == max_depth
+    graph = res["graph"]
+    assert graph.num_states == n
+    for i, d in enumerate(res["depths"]):
+        if d < max_depth:
+            assert graph.successors(i) == fresh["graph"].successors(i)
+        else:
+            assert graph.out_degree(i) == 0
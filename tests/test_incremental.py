@@ -0,0 +1,124 @@
+import copy
+
+import pytest
+
+from benchmarks.generators import dining_philosophers, production_lines
+from src.incremental import diff_nets
+
+
+def _extension(net):
+    # new place + new transition draining the collector: old behaviour unchanged
+    net = copy.deepcopy(net)
+    net["places"].append({"id": "Shipped", "name": "Shipped", "m0": 0})
+    net["transitions"].append({"id": "T_Ship", "name": "T_Ship"})
+    net["arcs"] += [{"id": "s0", "src": "Collector", "target": "T_Ship", "weight": 1},
+                    {"id": "s1", "src": "T_Ship", "target": "Shipped", "weight": 1}]
+    return net
+
+
+def _other(net):
+    # line 2 loses its retry loop: an old transition disappears
+    net = copy.deepcopy(net)
+    net["transitions"] = [t for t in net["transitions"] if t["id"] != "T2_Retry"]
+    net["arcs"] = [a for a in net["arcs"] if "T2_Retry" not in (a["src"], a["target"])]
+    return net
+
+
+EDITS = [pytest.param("extension", _extension, id="extension"), pytest.param("other", _other, id="other")]
+
+
+@pytest.fixture
+def base():
+    return production_lines(2)
+
+
+@pytest.mark.parametrize("kind, edit", EDITS)
+def test_diff_kind(base, kind, edit):
+    assert diff_nets(base, base)["kind"] == "identical"
+    assert diff_nets(base, edit(base))["kind"] == kind
+
+
+@pytest.mark.parametrize("kind, edit", EDITS)
+def test_bdd_deadlock_restart_matches_fresh(tmp_path, base, kind, edit):
+    pytest.importorskip("dd")
+    from src.bdd_deadlock import solve_deadlock_bdd
+    saved = tmp_path / "reach.json"
+    solve_deadlock_bdd(base, save_path=str(saved))
+
+    edited = edit(base)
+    fresh = solve_deadlock_bdd(edited, sample_limit=100)
+    again = solve_deadlock_bdd(edited, sample_limit=100, start_from=str(saved))
+    assert again["restarted"] == (kind == "extension")
+    assert again["reachable_states_est"] == fresh["reachable_states_est"]
+    key = lambda m: sorted(m.items())
+    assert sorted(map(key, again["deadlock_markings"])) == sorted(map(key, fresh["deadlock_markings"]))
+
+
+def test_bdd_deadlock_does_not_hide_restart_errors(tmp_path, base, monkeypatch):
+    pytest.importorskip("dd")
+    from src import bdd_deadlock
+    broken = tmp_path / "reach.json"
+    broken.write_text("not a BDD dump")
+    with pytest.raises(ValueError):
+        bdd_deadlock.solve_deadlock_bdd(base, start_from=str(broken))
+
+    def out_of_memory(self, *args, **kwargs):
+        raise MemoryError("node table full")
+    monkeypatch.setattr(bdd_deadlock._BDDSolver, "solve", out_of_memory)
+    res = bdd_deadlock.solve_deadlock_bdd(base)
+    assert res["mode"] == "EXPLICIT" and res["fallback"] == "MemoryError: node table full"
+
+
+@pytest.mark.parametrize("kind, edit", EDITS)
+def test_bdd_reachability_restart_matches_fresh(tmp_path, base, kind, edit):
+    pytest.importorskip("dd")
+    from src.bdd_reachability import run_symbolic_reachability
+    saved = tmp_path / "reach.json"
+    run_symbolic_reachability(base, "base", save_bdd=str(saved))
+
+    edited = edit(base)
+    fresh = run_symbolic_reachability(edited, "fresh")["bdd"]
+    again = run_symbolic_reachability(edited, "again", start_from=str(saved))["bdd"]
+    assert again["restarted"] == (kind == "extension")
+    assert again["num_reachable_states"] == fresh["num_reachable_states"]
+
+
+@pytest.mark.parametrize("kind, edit", EDITS)
+def test_ilp_model_update_matches_fresh(tmp_path, base, kind, edit):
+    pytest.importorskip("pulp")
+    from src.ilp_deadlock import solve_deadlock_ilp
+    model = tmp_path / "model.json"
+    solve_deadlock_ilp(base, solver_msg=False, model_path=str(model))
+
+    edited = edit(base)
+    fresh = solve_deadlock_ilp(edited, solver_msg=False)
+    again = solve_deadlock_ilp(edited, solver_msg=False, model_path=str(model))
+    assert (again["status"], again["num_vars"], again["num_constraints"]) == \
+           (fresh["status"], fresh["num_vars"], fresh["num_constraints"])
+    assert again["deadlock_marking"] == fresh["deadlock_marking"]
+    assert 0 < again["model"]["rows_rebuilt"] < again["num_constraints"]
+
+
+def test_ilp_marking_uses_saved_variable_names(tmp_path):
+    pytest.importorskip("pulp")
+    import json
+    from src.ilp_deadlock import solve_deadlock_ilp
+    # place ids pulp has to sanitise ("-" and " " are illegal in its names)
+    net = copy.deepcopy(dining_philosophers(2))
+    rename = {p["id"]: p["id"].replace("_", "-") + " x" for p in net["places"]}
+    for p in net["places"]:
+        p["id"] = rename[p["id"]]
+    for a in net["arcs"]:
+        a["src"], a["target"] = rename.get(a["src"], a["src"]), rename.get(a["target"], a["target"])
+
+    model = tmp_path / "model.json"
+    first = solve_deadlock_ilp(net, solver_msg=False, model_path=str(model))
+    with open(model) as f:
+        var_of = json.load(f)["var_of"]
+    assert set(var_of) == set(rename.values())
+    assert all(" " not in name and "-" not in name for name in var_of.values())
+    again = solve_deadlock_ilp(net, solver_msg=False, model_path=str(model))
+    assert again["model"]["rows_rebuilt"] == 0
+    for res in (first, again):
+        assert res["status"] == "Optimal"
+        assert set(res["deadlock_marking"]) == set(rename.values())
@@ -0,0 +1,90 @@
+import pytest
+
+pytest.importorskip("dd")
+
+from benchmarks.generators import NetBuilder, dining_philosophers, production_lines, token_ring
+from src.liveness import explicit_liveness, symbolic_liveness
+
+
+def _livelock_net():
+    # after "leave" the net cycles through q0/q1 forever and "enter" can never fire again
+    b = NetBuilder()
+    b.place("p", m0=1)
+    b.place("q0")
+    b.place("q1")
+    b.transition("enter", ["p"], ["q0"])
+    b.transition("back", ["q0"], ["p"])
+    b.transition("leave", ["q0"], ["q1"])
+    b.transition("spin", ["q1"], ["q1"])
+    return b.build()
+
+
+def _start_into_cycle_net():
+    # "s" fires once, then a <-> b forever: one healthy terminal SCC
+    b = NetBuilder()
+    b.place("start", m0=1)
+    b.place("pa")
+    b.place("pb")
+    b.transition("s", ["start"], ["pa"])
+    b.transition("a", ["pa"], ["pb"])
+    b.transition("b", ["pb"], ["pa"])
+    return b.build()
+
+
+def _summary(r):
+    return {
+        "num_states": r["num_states"],
+        "transitions": r["transitions"],
+        "has_deadlock": r["has_deadlock"],
+        "has_livelock": r["has_livelock"],
+        "reversible": r["reversible"],
+        "terminal_sccs": sorted((i["kind"], i["size"], tuple(i["transitions"])) for i in r["terminal_sccs"]),
+    }
+
+
+@pytest.mark.parametrize("net", [
+    production_lines(2), dining_philosophers(3), token_ring(5), _livelock_net(), _start_into_cycle_net(),
+], ids=["production_lines", "dining_philosophers", "token_ring", "livelock", "start_into_cycle"])
+def test_explicit_and_symbolic_agree(net):
+    explicit, symbolic = explicit_liveness(net), symbolic_liveness(net)
+    assert _summary(explicit) == _summary(symbolic)
+
+
+def test_livelock_levels():
+    r = explicit_liveness(_livelock_net())
+    assert r["has_livelock"] and not r["has_deadlock"] and not r["reversible"]
+    assert r["transitions"] == {"enter": "quasi-live", "back": "quasi-live",
+                                "leave": "quasi-live", "spin": "live"}
+
+
+@pytest.mark.parametrize("liveness", [explicit_liveness, symbolic_liveness], ids=["explicit", "symbolic"])
+def test_one_shot_start_is_not_a_livelock(liveness):
+    r = liveness(_start_into_cycle_net())
+    assert not r["has_livelock"] and not r["has_deadlock"] and not r["reversible"]
+    assert [i["kind"] for i in r["terminal_sccs"]] == ["home"]
+    assert r["transitions"] == {"s": "quasi-live", "a": "live", "b": "live"}
+
+
+def test_truncated_enumeration_does_not_claim_live():
+    # two closed cycles reached by a first choice: nothing is live
+    b = NetBuilder()
+    for p in ("start", "a1", "a2", "b1", "b2"):
+        b.place(p, m0=1 if p == "start" else 0)
+    b.transition("go_a", ["start"], ["a1"])
+    b.transition("go_b", ["start"], ["b1"])
+    b.transition("a_fwd", ["a1"], ["a2"])
+    b.transition("a_back", ["a2"], ["a1"])
+    b.transition("b_fwd", ["b1"], ["b2"])
+    b.transition("b_back", ["b2"], ["b1"])
+    net = b.build()
+
+    full = symbolic_liveness(net)
+    assert not full["terminal_sccs_truncated"] and len(full["terminal_sccs"]) == 2
+    assert "live" not in full["transitions"].values()
+    assert [i["kind"] for i in full["terminal_sccs"]] == ["livelock", "livelock"]
+
+    cut = symbolic_liveness(net, max_terminal_sccs=1)
+    assert cut["terminal_sccs_truncated"] and len(cut["terminal_sccs"]) == 1
+    found = set(cut["terminal_sccs"][0]["transitions"])
+    assert {t for t, l in cut["transitions"].items() if l == "unknown"} == found
+    assert "live" not in cut["transitions"].values()
@@ -0,0 +1,95 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from benchmarks.generators import production_lines, write_pnml
+from src.main import OPT_IN_STAGES, STAGE_DEPENDS, STAGES, parse_args
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ["rich", "dd", "pulp", "pympler", "numpy"]
+
+
+@pytest.fixture
+def pnml(tmp_path):
+    path = tmp_path / "pl.pnml"
+    write_pnml(production_lines(2), path)
+    return path
+
+
+@pytest.mark.parametrize("stage", sorted(STAGE_DEPENDS))
+def test_stage_pulls_in_its_dependencies(stage):
+    stages = parse_args(["x.pnml", "--stages", stage]).stages
+    assert stages == {"parse", stage, *STAGE_DEPENDS[stage]}
+
+
+def test_opt_pulls_in_bfs_only():
+    assert parse_args(["x.pnml", "--stages", "opt"]).stages == {"parse", "opt", "bfs"}
+    assert parse_args(["x.pnml", "--stages", "bdd"]).stages == {"parse", "bdd"}
+
+
+def test_opt_in_stages_are_off_by_default():
+    assert {"bitstate", "liveness", "liveness-bdd"} <= OPT_IN_STAGES
+    assert parse_args(["x.pnml"]).stages == set(STAGES) - OPT_IN_STAGES
+    assert "liveness" in parse_args(["x.pnml", "--stages", "liveness"]).stages
+
+
+def test_unknown_stage_is_rejected():
+    with pytest.raises(SystemExit):
+        parse_args(["x.pnml", "--stages", "bfs,nope"])
+
+
+def test_parse_bfs_loads_no_heavy_engine(pnml):
+    code = (
+        "import sys\n"
+        "from src.main import main\n"
+        f"sys.argv = ['main', {str(pnml)!r}, '--stages', 'parse,bfs', '--quiet']\n"
+        "main()\n"
+        f"print(sorted(m for m in {HEAVY!r} if m in sys.modules), file=sys.stderr)\n"
+    )
+    res = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert res.returncode == 0, res.stderr
+    assert json.loads(res.stdout)["bfs"]["num_reachable_states"] > 0
+    assert res.stderr.strip().splitlines()[-1] == "[]"
+
+
+def test_quiet_exits_nonzero_on_closed_pipe(pnml):
+    proc = subprocess.Popen([sys.executable, "-m", "src.main", str(pnml), "--stages", "parse,bfs", "--quiet"],
+                            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    proc.stdout.close()   # reader goes away before the JSON line is written
+    _, err = proc.communicate()
+    assert proc.returncode == 1
+    assert "BrokenPipeError" not in err and "Traceback" not in err
+
+
+def _quiet_run(pnml, *args):
+    res = subprocess.run([sys.executable, "-m", "src.main", str(pnml), "--quiet", *args],
+                         cwd=ROOT, capture_output=True, text=True)
+    assert res.returncode == 0, res.stderr
+    return json.loads(res.stdout)
+
+
+def test_bad_ctl_formula_keeps_other_stats(pnml):
+    pytest.importorskip("dd")
+    stats = _quiet_run(pnml, "--stages", "parse,bfs,ctl", "--ctl", "EF nope")
+    assert "nope" in stats["ctl"]["error"]
+    assert stats["bfs"]["num_reachable_states"] > 0
+
+
+def test_bad_query_keeps_other_stats(pnml):
+    pytest.importorskip("numpy")
+    stats = _quiet_run(pnml, "--stages", "parse,bfs,query", "--query", "nope >= 1")
+    assert "nope" in stats["query"]["error"]
+    assert stats["bfs"]["num_reachable_states"] > 0
+
+
+def test_queries_on_a_bounded_bfs_are_partial(pnml):
+    pytest.importorskip("numpy")
+    query = f"{production_lines(2)['places'][0]['id']} >= 0"
+    full = _quiet_run(pnml, "--stages", "parse,bfs,query", "--query", query)
+    assert full["bfs"]["complete"] and "partial" not in full["query"][0]
+    cut = _quiet_run(pnml, "--stages", "parse,bfs,query", "--query", query, "--max-states", "3")
+    assert not cut["bfs"]["complete"]
+    assert cut["query"][0]["partial"] and cut["query"][0]["count"] < full["query"][0]["count"]
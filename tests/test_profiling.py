@@ -0,0 +1,59 @@
+import json
+
+from benchmarks.generators import production_lines
+from src.bfs import bfs_reachable_markings_with_depth
+from src.profiling import NullProfiler, Profiler, disable_profiling, enable_profiling, get_profiler
+
+
+def test_null_profiler_is_a_no_op():
+    prof = NullProfiler()
+    assert not prof.enabled
+    with prof.span("a", x=1) as span:
+        span.set(y=2)
+        with prof.span("b"):
+            pass
+    prof.counter("c", v=1)
+    prof.sample_memory()
+    assert prof.summary() is None
+    assert not hasattr(prof, "events")
+    assert isinstance(get_profiler(), NullProfiler)
+
+
+def test_chrome_trace_has_matching_begin_end_pairs(tmp_path):
+    prof = Profiler()
+    with prof.span("outer", n=1):
+        with prof.span("inner") as span:
+            span.set(states=3)
+        prof.counter("rate", states_per_sec=10.0)
+        with prof.span("inner"):
+            pass
+    path = tmp_path / "trace.json"
+    prof.export_chrome_trace(path)
+
+    with open(path) as f:
+        trace = json.load(f)
+    events = trace["traceEvents"]
+    stack = []
+    for e in events:
+        assert {"name", "ph", "ts", "pid"} <= e.keys()
+        if e["ph"] == "B":
+            stack.append(e)
+        elif e["ph"] == "E":
+            begin = stack.pop()
+            assert begin["name"] == e["name"] and begin["ts"] <= e["ts"]
+    assert stack == []
+    assert [e["name"] for e in events if e["ph"] == "B"] == ["outer", "inner", "inner"]
+    assert next(e for e in events if e["ph"] == "E" and e["name"] == "inner")["args"] == {"states": 3}
+    assert trace["otherData"]["spans"]["inner"]["count"] == 2
+    assert trace["otherData"]["peak_traced_bytes"] is None   # tracemalloc is opt-in
+
+
+def test_bfs_emits_rate_counters_per_level():
+    prof = enable_profiling()
+    try:
+        out = bfs_reachable_markings_with_depth(production_lines(2))
+    finally:
+        disable_profiling()
+    rates = [e["args"] for e in prof.events if e["name"] == "bfs.rate"]
+    assert [r["level"] for r in rates] == list(range(max(out["depths"]) + 1))
+    assert rates[-1]["states"] == len(out["markings"])
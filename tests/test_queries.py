@@ -0,0 +1,147 @@
+import operator
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.generators import production_lines
+from src.bfs import bfs_reachable_markings_with_depth
+from src.queries import QueryEngine, QuerySyntaxError, SymbolicQueryEngine, parse_query
+from src.reachability_store import markings_to_arrays, write_reachability
+from tests.conftest import is_enabled, pre_post
+
+OPS = {">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt, "==": operator.eq,
+       "!=": operator.ne}
+
+QUERIES = [
+    "Collector",
+    "Collector >= 1",
+    "Line1_QC > 0",
+    "Line1_Buf <= 0",
+    "Line2_Proc1 < 1",
+    "Line1_Reject == 1",
+    "Line2_In != 0",
+    "enabled(T_Collect)",
+    "enabled(T1_Retry) & !Line2_In",
+    "Line1_QC & Line2_QC",
+    "Line1_In | Line1_Buf | Line1_Proc1 | Line1_Proc2 | Line1_QC | Line1_Reject | Collector",
+    "!(Line1_Proc1 <= 0 | enabled(T2_A))",
+    "Collector & Line1_In",
+    "Line1_Proc2 >= 2",
+]
+
+
+def _holds(q, m, pre):
+    op = q[0]
+    if op == "cmp":
+        return OPS[q[2]](m[q[1]], q[3])
+    if op == "enabled":
+        return is_enabled(m, pre[q[1]])
+    if op == "not":
+        return not _holds(q[1], m, pre)
+    if op == "and":
+        return _holds(q[1], m, pre) and _holds(q[2], m, pre)
+    return _holds(q[1], m, pre) or _holds(q[2], m, pre)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("p", ("cmp", "p", ">=", 1)),
+    ("p >= 2", ("cmp", "p", ">=", 2)),
+    ("p > 0", ("cmp", "p", ">", 0)),
+    ("p <= 3", ("cmp", "p", "<=", 3)),
+    ("p < 1", ("cmp", "p", "<", 1)),
+    ("p == 0", ("cmp", "p", "==", 0)),
+    ("p != -1", ("cmp", "p", "!=", -1)),
+    ('"odd name" == 1', ("cmp", "odd name", "==", 1)),
+    ("enabled(t1)", ("enabled", "t1")),
+    ("!p", ("not", ("cmp", "p", ">=", 1))),
+    ("p & q", ("and", ("cmp", "p", ">=", 1), ("cmp", "q", ">=", 1))),
+    ("p | q", ("or", ("cmp", "p", ">=", 1), ("cmp", "q", ">=", 1))),
+    # ! binds tighter than &, & tighter than |
+    ("!p & q | r", ("or", ("and", ("not", ("cmp", "p", ">=", 1)), ("cmp", "q", ">=", 1)), ("cmp", "r", ">=", 1))),
+    ("!(p | enabled(t))", ("not", ("or", ("cmp", "p", ">=", 1), ("enabled", "t")))),
+])
+def test_parse(text, expected):
+    assert parse_query(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "p >=", "p & ", "(p", "p)", "p q", ">= 1", "p >= x", "p $ 1",
+                                  "enabled(t", "& p", "!"])
+def test_malformed_query_raises_syntax_error(text):
+    with pytest.raises(QuerySyntaxError):
+        parse_query(text)
+
+
+@pytest.fixture(scope="module")
+def net():
+    return production_lines(2)
+
+
+@pytest.fixture(scope="module")
+def reach(net):
+    return bfs_reachable_markings_with_depth(net)
+
+
+@pytest.fixture(scope="module")
+def pre(net):
+    return pre_post(net)[0]
+
+
+def _engines(net, reach, tmp_path):
+    places = [p["id"] for p in net["places"]]
+    engines = {"from_markings": QueryEngine.from_markings(places, reach["markings"], net)}
+    rbin = tmp_path / "reach.rbin"
+    write_reachability(rbin, places, *markings_to_arrays(places, reach["markings"], reach["depths"]))
+    engines["from_rbin"] = QueryEngine.from_rbin(rbin, net)
+    pytest.importorskip("dd")
+    from src.bdd_deadlock import solve_deadlock_bdd
+    engines["from_net"] = SymbolicQueryEngine.from_net(net)
+    saved = tmp_path / "dl_bdd.json"
+    solve_deadlock_bdd(net, save_path=str(saved))
+    engines["from_saved"] = SymbolicQueryEngine.from_saved(saved, net)
+    return engines
+
+
+def test_engines_agree(net, reach, tmp_path):
+    results = {name: e.evaluate(QUERIES) for name, e in _engines(net, reach, tmp_path).items()}
+    reference = results.pop("from_markings")
+    assert len(results) == 3
+    for name, res in results.items():
+        for r, ref in zip(res, reference):
+            assert (r["query"], r["count"], r["exists"], r["invariant"]) == \
+                   (ref["query"], ref["count"], ref["exists"], ref["invariant"]), name
+    by_query = {r["query"]: r for r in reference}
+    assert by_query["Collector"]["exists"] and not by_query["Collector"]["invariant"]
+    assert by_query["Line1_In | Line1_Buf | Line1_Proc1 | Line1_Proc2 | Line1_QC | Line1_Reject | Collector"][
+        "invariant"]
+    assert not by_query["Collector & Line1_In"]["exists"]
+    assert not by_query["Line1_Proc2 >= 2"]["exists"]
+
+
+def test_witnesses_and_counterexamples(net, reach, pre, tmp_path):
+    reachable = {tuple(sorted(m.items())) for m in reach["markings"]}
+    for name, engine in _engines(net, reach, tmp_path).items():
+        for text, r in zip(QUERIES, engine.evaluate(QUERIES)):
+            q = parse_query(text)
+            if r["exists"]:
+                assert tuple(sorted(r["witness"].items())) in reachable, (name, text)
+                assert _holds(q, r["witness"], pre), (name, text)
+            else:
+                assert r["witness"] is None and r["count"] == 0
+            if not r["invariant"]:
+                assert tuple(sorted(r["counterexample"].items())) in reachable, (name, text)
+                assert not _holds(q, r["counterexample"], pre), (name, text)
+            else:
+                assert r["counterexample"] is None
+            assert r["count"] == sum(_holds(q, m, pre) for m in reach["markings"])
+
+
+def test_unknown_names_raise_syntax_error(net, reach):
+    engine = QueryEngine.from_markings([p["id"] for p in net["places"]], reach["markings"])
+    with pytest.raises(QuerySyntaxError, match="Unknown place"):
+        engine.evaluate(["nowhere >= 1"])
+    with pytest.raises(QuerySyntaxError, match="needs the net"):
+        engine.evaluate(["enabled(T1_A)"])
+    with pytest.raises(QuerySyntaxError, match="Unknown transition"):
+        QueryEngine.from_markings([p["id"] for p in net["places"]], reach["markings"], net).evaluate(
+            ["enabled(nope)"])
@@ -0,0 +1,96 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.generators import dining_philosophers, production_lines, shared_resource
+from src.bfs import bfs_reachable_markings_with_depth
+from src.reachability_graph import ReachabilityGraph
+from tests.conftest import marking_key, pre_post, successors
+
+NETS = [pytest.param(production_lines(2), id="production_lines_2"),
+        pytest.param(dining_philosophers(3), id="dining_philosophers_3"),
+        pytest.param(shared_resource(3), id="shared_resource_3")]
+
+
+def _edges_by_firing(net, markings):
+    """(source, target, transition index) for every enabled transition, in net order."""
+    pre, post = pre_post(net)
+    index = {marking_key(m): i for i, m in enumerate(markings)}
+    return [(i, index[marking_key(n)], ti) for i, m in enumerate(markings) for ti, n in successors(m, pre, post)]
+
+
+def _edge_list(graph):
+    return [(i, t, ti) for i in range(graph.num_states) for t, ti in graph.successors(i)]
+
+
+@pytest.fixture(params=NETS)
+def explored(request):
+    net = request.param
+    res = bfs_reachable_markings_with_depth(net, build_graph=True)
+    return net, res["markings"], res["graph"]
+
+
+def test_csr_matches_edges_rebuilt_by_firing(explored):
+    net, markings, graph = explored
+    assert graph.num_states == len(markings)
+    assert graph.transition_ids == [t["id"] for t in net["transitions"]]
+    expected = _edges_by_firing(net, markings)
+    assert _edge_list(graph) == expected
+    offsets, targets, transitions = graph.as_numpy()
+    assert offsets[0] == 0 and offsets[-1] == len(expected)
+    assert np.all(np.diff(offsets.astype(np.int64)) >= 0)
+    assert targets.tolist() == [e[1] for e in expected]
+    assert transitions.tolist() == [e[2] for e in expected]
+
+
+def test_reverse_is_the_transpose(explored):
+    _, _, graph = explored
+    rev = graph.reverse()
+    assert rev.num_states == graph.num_states and rev.num_edges == graph.num_edges
+    forward = sorted(_edge_list(graph))
+    transposed = sorted((t, s, ti) for s, t, ti in _edge_list(rev))
+    assert transposed == forward
+    assert sorted(_edge_list(rev.reverse())) == forward
+
+
+def test_save_load_round_trip(explored, tmp_path):
+    _, _, graph = explored
+    path = tmp_path / "g.npz"
+    graph.save(path)
+    loaded = ReachabilityGraph.load(path)
+    assert loaded.transition_ids == graph.transition_ids
+    for a, b in zip(loaded.as_numpy(), graph.as_numpy()):
+        assert a.dtype == b.dtype
+        assert np.array_equal(a, b)
+    assert _edge_list(loaded) == _edge_list(graph)
+
+
+def test_as_numpy_returns_views(explored):
+    _, _, graph = explored
+    offsets, targets, transitions = graph.as_numpy()
+    for view, buf in zip((offsets, targets, transitions), (graph.offsets, graph.targets, graph.transitions)):
+        assert not view.flags.owndata
+        assert np.shares_memory(view, np.frombuffer(buf, dtype=view.dtype))
+    # writing through the view is visible in the stdlib array it wraps
+    old = graph.targets[0]
+    targets[0] = old + 1
+    assert graph.targets[0] == old + 1
+    targets[0] = old
+
+
+def test_as_numpy_copies_while_open_and_finalize_stops_growth():
+    graph = ReachabilityGraph(["t"])
+    graph.add_edge(0, 0)
+    targets = graph.as_numpy()[1]
+    assert targets.flags.owndata
+    for _ in range(100):   # a live view would make the array refuse to grow
+        graph.add_edge(0, 0)
+    graph.close_state()
+    assert targets.tolist() == [0] and graph.num_edges == 101
+
+    graph.finalize()
+    assert not graph.as_numpy()[1].flags.owndata
+    with pytest.raises(RuntimeError):
+        graph.add_edge(0, 0)
+    with pytest.raises(RuntimeError):
+        graph.close_state()
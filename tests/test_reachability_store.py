@@ -0,0 +1,45 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.generators import dining_philosophers
+from src.bfs import bfs_reachable_markings_with_depth
+from src.reachability_store import (csv_to_rbin, markings_to_arrays, open_reachability, rbin_to_csv,
+                                    write_reachability)
+
+
+def _arrays(net):
+    bfs = bfs_reachable_markings_with_depth(net)
+    places = [p["id"] for p in net["places"]]
+    states, depth = markings_to_arrays(places, bfs["markings"], bfs["depths"])
+    return places, bfs, states, depth
+
+
+def test_markings_to_arrays_matches_bfs():
+    net = dining_philosophers(3)
+    places, bfs, states, depth = _arrays(net)
+    for i in (0, len(bfs["markings"]) // 2, len(bfs["markings"]) - 1):
+        assert states[i].tolist() == [bfs["markings"][i][p] for p in places]
+        assert depth[i] == bfs["depths"][i]
+
+
+def test_packed_round_trip(tmp_path):
+    places, bfs, states, depth = _arrays(dining_philosophers(3))
+    write_reachability(tmp_path / "s.rbin", places, states, depth)
+    rf = open_reachability(tmp_path / "s.rbin")
+    assert rf.packed and rf.places == places and len(rf) == len(states)
+    assert np.array_equal(rf.states(), states) and np.array_equal(rf.depth, depth)
+    assert rf.marking(5) == bfs["markings"][5]
+
+
+def test_unpacked_round_trip_through_csv(tmp_path):
+    places = ["a", "b", "c"]
+    states = np.array([[0, 2, 1], [3, 0, 0], [255, 1, 7]])
+    depth = np.array([0, 1, 1])
+    write_reachability(tmp_path / "s.rbin", places, states, depth)
+    assert not open_reachability(tmp_path / "s.rbin").packed
+
+    rbin_to_csv(tmp_path / "s.rbin", tmp_path / "s.csv")
+    csv_to_rbin(tmp_path / "s.csv", tmp_path / "t.rbin")
+    rf = open_reachability(tmp_path / "t.rbin")
+    assert np.array_equal(rf.states(), states) and np.array_equal(rf.depth, depth)
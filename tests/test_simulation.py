@@ -0,0 +1,84 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from benchmarks.generators import NetBuilder, dining_philosophers
+from src.simulation import CHUNK_WALKS, simulate_random_walks
+from tests.conftest import is_dead, replay
+
+
+def _loop_then_die():
+    # A loops on itself until "die" fires; A -> B -> C, and C is the only dead marking
+    b = NetBuilder()
+    b.place("A", m0=1)
+    b.place("B")
+    b.place("C")
+    b.transition("loop", ["A"], ["A"])
+    b.transition("die", ["A"], ["B"])
+    b.transition("end", ["B"], ["C"])
+    return b.build()
+
+
+def _strip(res):
+    return {k: v for k, v in res.items() if k != "runtime_sec"}
+
+
+def test_same_seed_same_result():
+    net = dining_philosophers(4)
+    a = simulate_random_walks(net, num_walks=300, max_steps=200, seed=7)
+    b = simulate_random_walks(net, num_walks=300, max_steps=200, seed=7)
+    c = simulate_random_walks(net, num_walks=300, max_steps=200, seed=8)
+    assert _strip(a) == _strip(b)
+    assert _strip(a) != _strip(c)
+
+
+@pytest.mark.parametrize("net", [_loop_then_die(), dining_philosophers(4)], ids=["loop_then_die", "dining_4"])
+def test_deadlock_traces_replay_to_the_dead_marking(net):
+    res = simulate_random_walks(net, num_walks=200, max_steps=500, seed=1)
+    assert res["deadlock_hits"] > 0 and res["deadlocks"]
+    assert sum(d["hits"] for d in res["deadlocks"]) == res["deadlock_hits"]
+    for d in res["deadlocks"]:
+        assert len(d["trace"]) == d["steps"]
+        end = replay(net, d["trace"])
+        assert end == d["marking"]
+        assert is_dead(net, end)
+    for w in res["longest"]:
+        end = replay(net, w["trace"])
+        assert len(w["trace"]) == w["steps"]
+        assert is_dead(net, end) == w["deadlock"]
+
+
+def test_known_dead_marking_is_found():
+    res = simulate_random_walks(_loop_then_die(), num_walks=100, max_steps=1000, seed=3)
+    assert res["deadlock_hits"] == 100
+    assert [d["marking"] for d in res["deadlocks"]] == [{"A": 0, "B": 0, "C": 1}]
+    assert res["deadlocks"][0]["trace"][-2:] == ["die", "end"]
+
+
+def test_priorities_restrict_the_choice():
+    net = _loop_then_die()
+    free = simulate_random_walks(net, num_walks=200, max_steps=50, seed=2)
+    assert free["firing_counts"]["loop"] > 0
+    ranked = simulate_random_walks(net, num_walks=200, max_steps=50, seed=2, priorities={"die": 1})
+    assert ranked["firing_counts"] == {"loop": 0, "die": 200, "end": 200}
+    assert ranked["max_length"] == 2
+    assert all(d["trace"] == ["die", "end"] for d in ranked["deadlocks"])
+    # the loop never wins against a higher-priority alternative, whatever its weight
+    weighted = simulate_random_walks(net, num_walks=200, max_steps=50, seed=2, priorities={"die": 1},
+                                     weights={"loop": 1000})
+    assert weighted["firing_counts"]["loop"] == 0
+
+
+def test_replayed_traces_match_stored_ones():
+    net = dining_philosophers(5)
+    replayed = simulate_random_walks(net, num_walks=CHUNK_WALKS + 100, max_steps=300, seed=5)
+    stored = simulate_random_walks(net, num_walks=CHUNK_WALKS + 100, max_steps=300, seed=5, keep_traces=True)
+    assert _strip(replayed) == _strip(stored)
+
+
+def test_processes_do_not_change_results():
+    net = dining_philosophers(5)
+    n = 2 * CHUNK_WALKS + 10    # three batches
+    single = simulate_random_walks(net, num_walks=n, max_steps=300, seed=11)
+    multi = simulate_random_walks(net, num_walks=n, max_steps=300, seed=11, processes=3)
+    assert _strip(single) == _strip(multi)
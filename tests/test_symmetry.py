@@ -0,0 +1,37 @@
+from benchmarks.generators import dining_philosophers, production_lines
+from src.bdd_deadlock import build_pre_post, explicit_bfs_deadlocks
+from src.bfs import bfs_reachable_markings_with_depth
+from src.symmetry import Symmetry, expand_markings
+from tests.conftest import marking_key
+
+
+def _check(net, kind):
+    sym = Symmetry.detect(net)
+    assert [f["kind"] for f in sym.describe()] == [kind]
+
+    full = bfs_reachable_markings_with_depth(net)
+    reduced = bfs_reachable_markings_with_depth(net, symmetry=sym)
+    assert len(reduced["markings"]) < len(full["markings"])
+    assert reduced["num_concrete_states"] == len(full["markings"])
+
+    markings, depths = expand_markings(reduced["markings"], reduced["depths"], sym)
+    assert len(markings) == len(full["markings"])
+    assert {marking_key(m): d for m, d in zip(markings, depths)} == full["depth"]
+
+
+def test_production_lines_full_symmetry():
+    _check(production_lines(3), "full")
+
+
+def test_dining_philosophers_cyclic_symmetry():
+    _check(dining_philosophers(4), "cyclic")
+
+
+def test_explicit_deadlocks_are_concrete():
+    net = dining_philosophers(4)
+    _, _, pre, post = build_pre_post(net)
+    plain, n_plain, _ = explicit_bfs_deadlocks(net, pre, post, limit=100)
+    sym, n_sym, run = explicit_bfs_deadlocks(net, pre, post, limit=100, symmetry=Symmetry.detect(net))
+    assert n_sym == n_plain
+    assert run["num_orbits"] < n_plain
+    assert sorted(map(marking_key, sym)) == sorted(map(marking_key, plain))